@@ -0,0 +1,26 @@
+# bench_common.py
+# What bench_game.py, bench_vn.py and bench_server.py share: the result JSON
+# they write with --json, which `python bench_game.py compare` reads back.
+# Imports nothing from the game or the VN engine, so no bench pays for the
+# others' startup.
+import json
+import os
+import platform
+import subprocess
+import time
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def write_results(path, bench, results):
+    """Save one run's results with what is needed to tell runs apart later."""
+    with open(path, "w") as f:
+        json.dump({"bench": bench, "commit": git_commit(), "time": time.time(),
+                   "python": platform.python_version(), "results": results}, f, indent=2)
@@ -0,0 +1,750 @@
+# bench_game.py
+# Headless benchmarks for game.py. Run e.g.:
+#   python bench_game.py level --objects 100000
+#   python bench_game.py --json new.json hotpaths --sizes 1000 10000 100000
+#   python bench_game.py projectiles --rates 1000 5000
+#   python bench_game.py tiles --screens 200 1000
+#   python bench_game.py lighting --bullets 0 16 64
+#   python bench_game.py nav --enemies 100 300 --limits 1 4 8 0
+#   python bench_game.py compare old.json new.json
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import math
+import random
+import tempfile
+import time
+import tracemalloc
+
+import game
+from bench_common import write_results
+
+
+def timed(fn, repeat=3):
+    """Best wall time of fn() over repeat runs, plus its last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        t = time.perf_counter() - t0
+        best = t if best is None else min(best, t)
+    return best, result
+
+# ----- LEVEL LOADING -----
+def synthetic_records(objects, seed=1):
+    """Level records with roughly `objects` entities spread over a very wide level."""
+    rng = random.Random(seed)
+    width = max(game.WORLD_WIDTH, objects * 30)
+    h = game.WORLD_HEIGHT
+    rec = {kind: [] for kind in game.ENTITY_KINDS}
+    share = objects // 10
+    for _ in range(share * 4):
+        rec["platforms"].append([rng.randrange(width), rng.randint(300, h - 300), 150, 20])
+    for _ in range(share // 2):
+        x, y = rng.randrange(width), rng.randint(300, h - 300)
+        rec["moving_platforms"].append([x, y, 140, 20, 1.2, [[x, y], [x + 400, y - 100], [x + 800, y]]])
+    for _ in range(share // 2):
+        rec["slopes"].append([rng.randrange(width), h - 160, 300, 160, rng.choice(("left", "right"))])
+    for _ in range(max(1, share // 50)):
+        x = rng.randrange(width)
+        rec["terrains"].append([[px, h - 64 - 120 * math.sin(math.pi * (px - x) / 800) ** 2]
+                                for px in range(x, x + 801, 20)])
+    for _ in range(share // 2):
+        rec["ladders"].append([rng.randrange(width), h - 300, 40, 180])
+    for _ in range(share):
+        rec["enemies"].append([rng.randrange(width), h - 100, 36, 36, 40, 160, 1.1 + rng.random() * 0.4])
+    while sum(len(v) for v in rec.values()) < objects:
+        rec["coins"].append([rng.randrange(width), rng.randint(100, h - 200), 10])
+    return width, rec
+
+
+def synthetic_world(objects, seed=1):
+    width, rec = synthetic_records(objects, seed)
+    _, _, _, ents = game.unpack_level(game.pack_level(rec, width, game.WORLD_HEIGHT))
+    world = game.World(create_demo=False)
+    world.width = width
+    for kind in game.ENTITY_KINDS:
+        setattr(world, kind, ents[kind])
+    world.index_entities()
+    return world
+
+
+def bench_level(args):
+    width, rec = synthetic_records(args.objects)
+    count = sum(len(v) for v in rec.values())
+    tmp = tempfile.mkdtemp()
+    lvl_path = os.path.join(tmp, "bench.lvl")
+    json_path = os.path.join(tmp, "bench.json")
+    spawn = (120, game.WORLD_HEIGHT - 200)
+
+    def write_lvl():
+        with open(lvl_path, "wb") as f:
+            f.write(game.pack_level(rec, width, game.WORLD_HEIGHT, spawn))
+
+    def write_json():
+        with open(json_path, "w") as f:
+            json.dump(rec, f)
+
+    def load_json():
+        with open(json_path) as f:
+            data = json.load(f)
+        # the same per-object constructor loop create_demo_world uses
+        return [game.Platform(*r) for r in data["platforms"]] + \
+               [game.MovingPlatform(x, y, w, h, path=[tuple(p) for p in path], speed=s)
+                for x, y, w, h, s, path in data["moving_platforms"]] + \
+               [game.Slope(x, y, w, h, slope_type=t) for x, y, w, h, t in data["slopes"]] + \
+               [game.Ladder(*r) for r in data["ladders"]] + \
+               [game.Enemy(x, y, w, h, patrol=(pl, pr), speed=s) for x, y, w, h, pl, pr, s in data["enemies"]] + \
+               [game.Coin(x, y, radius=r) for x, y, r in data["coins"]]
+
+    results = {"objects": count}
+    results["save_lvl_s"], _ = timed(write_lvl)
+    results["save_json_s"], _ = timed(write_json)
+    results["load_lvl_s"], world = timed(lambda: game.load_level(lvl_path))
+    results["load_json_s"], _ = timed(load_json)
+    results["lvl_bytes"] = os.path.getsize(lvl_path)
+    results["json_bytes"] = os.path.getsize(json_path)
+    assert sum(len(getattr(world, k)) for k in game.ENTITY_KINDS) == count
+
+    print(f"level with {count} objects")
+    print(f"  binary  {results['lvl_bytes'] / 1e6:7.2f} MB  save {results['save_lvl_s'] * 1e3:8.1f} ms"
+          f"  load {results['load_lvl_s'] * 1e3:8.1f} ms")
+    print(f"  json    {results['json_bytes'] / 1e6:7.2f} MB  save {results['save_json_s'] * 1e3:8.1f} ms"
+          f"  load {results['load_json_s'] * 1e3:8.1f} ms")
+    return results
+
+
+# ----- MEMORY -----
+def entity_factories():
+    return {
+        "Platform": lambda i: game.Platform(i, 100, 150, 20),
+        "MovingPlatform": lambda i: game.MovingPlatform(i, 100, 140, 20, path=[(i, 100), (i + 400, 0)]),
+        "Slope": lambda i: game.Slope(i, 100, 300, 160, "right"),
+        "Ladder": lambda i: game.Ladder(i, 100, 40, 180),
+        "Enemy": lambda i: game.Enemy(i, 100),
+        "Particle": lambda i: game.Particle(i, 100, 1.0, -2.0, 500, (200, 170, 120)),
+        "Coin": lambda i: game.Coin(i, 100),
+        "Player": lambda i: game.Player(i, 100),
+    }
+
+
+def bytes_per_entity(factory, n):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [factory(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # subtract the list holding them
+    return (after - before) / n - 8, objs
+
+
+def frame_allocations(world, player, frames):
+    """Average peak transient bytes and retained bytes per simulated frame."""
+    inp = game.TickInput(game.HELD_BITS[game.pygame.K_d])
+    for _ in range(30):  # warm up caches and lists
+        world.update(16)
+        player.update(inp, 16, world)
+    tracemalloc.start()
+    transient = 0
+    start = tracemalloc.get_traced_memory()[0]
+    for i in range(frames):
+        if i % 20 == 0:
+            player.spawn_particles(player.rect.centerx, player.rect.bottom)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        world.update(16)
+        player.update(inp, 16, world)
+        transient += tracemalloc.get_traced_memory()[1] - base
+    retained = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return transient / frames, retained / frames
+
+
+def bench_memory(args):
+    results = {"bytes_per_entity": {}}
+    print(f"bytes per entity ({args.instances} instances each)")
+    for name, factory in entity_factories().items():
+        b, _ = bytes_per_entity(factory, args.instances)
+        results["bytes_per_entity"][name] = round(b, 1)
+        print(f"  {name:15s} {b:8.1f}")
+
+    world = synthetic_world(args.objects)
+    player = game.Player(120, game.WORLD_HEIGHT - 200)
+    transient, retained = frame_allocations(world, player, args.frames)
+    results["frame_transient_bytes"] = round(transient)
+    results["frame_retained_bytes"] = round(retained)
+    print(f"per frame over a {args.objects}-object world ({args.frames} frames)")
+    print(f"  transient peak {transient:10.0f} bytes")
+    print(f"  retained       {retained:10.0f} bytes")
+    return results
+
+
+# ----- HOT PATHS -----
+def scripted_input(tick):
+    """Deterministic input: run right, jump every second, dash now and then."""
+    held = game.HELD_BITS[game.pygame.K_d]
+    events = 0
+    if tick % 60 == 0:
+        events |= game.EV_JUMP
+    if tick % 240 == 120:
+        events |= game.EV_DASH
+    return game.TickInput(held, events)
+
+
+def make_game(objects):
+    random.seed(1)
+    g = game.Game()
+    g.world = synthetic_world(objects)
+    g.player = game.Player(*g.world.spawn_point)
+    g.cam = game.Camera(g.world.width, g.world.height)
+    g.view = game.Camera(g.world.width, g.world.height)
+    return g
+
+
+def hot_paths(g, surf):
+    """name -> fn(tick) for every hot path, all sharing one game."""
+    world = g.world
+    player = g.player
+    emitter = game.Player(*world.spawn_point)
+    half_res = game.RenderTarget(surf.get_size(), scale=0.5, auto=False)
+
+    def particles(tick):
+        # steady state of a few hundred live particles
+        if tick % 10 == 0:
+            emitter.spawn_particles(emitter.rect.centerx, emitter.rect.centery, count=60)
+        emitter.update(game.TickInput(), 16, world)
+        for p in emitter.particles:
+            p.draw(surf, g.cam)
+
+    def collide(tick):
+        player.collide_x(world)
+        player.collide_y(world)
+
+    return {
+        "player_update": lambda tick: player.update(scripted_input(tick), 16, world),
+        "collide_xy": collide,
+        "world_update": lambda tick: world.update(16, player.rect.center),
+        "world_update_all": lambda tick: world.update(16),
+        "world_draw": lambda tick: world.draw(surf, g.cam),
+        "pickup_test": lambda tick: world.pickups.collect(player.rect),
+        "particles": particles,
+        "game_step": lambda tick: g.step(scripted_input(tick), 16),
+        "game_draw": lambda tick: g.draw(surf),
+        "game_draw_half": lambda tick: g.draw(surf, half_res),
+    }
+
+
+def ns_per_tick(fn, ticks):
+    t0 = time.perf_counter_ns()
+    for tick in range(ticks):
+        fn(tick)
+    return (time.perf_counter_ns() - t0) / ticks
+
+
+def alloc_per_tick(fn, ticks):
+    """Average peak transient bytes allocated by one call."""
+    tracemalloc.start()
+    total = 0
+    for tick in range(ticks):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn(tick)
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / ticks
+
+
+def bench_hotpaths(args):
+    surf = game.pygame.Surface((game.WIDTH, game.HEIGHT))
+    results = {}
+    for objects in args.sizes:
+        g = make_game(objects)
+        row = {}
+        for name, fn in hot_paths(g, surf).items():
+            if args.only and name not in args.only:
+                continue
+            # paths that touch every entity get fewer ticks on huge worlds
+            ticks = args.ticks if name in ("player_update", "collide_xy", "world_update", "pickup_test", "particles",
+                                           "game_step") else max(5, args.ticks * 1000 // max(objects, 1000))
+            fn(0)  # warm up
+            row[name] = {
+                "ns_per_tick": round(ns_per_tick(fn, ticks)),
+                "alloc_bytes_per_tick": round(alloc_per_tick(fn, min(ticks, args.alloc_ticks))),
+                "ticks": ticks,
+            }
+        results[str(objects)] = row
+
+    names = list(next(iter(results.values())))
+    print(f"{'path':18s}" + "".join(f"{n + ' obj':>16s}" for n in results))
+    for name in names:
+        print(f"{name:18s}" + "".join(f"{results[n][name]['ns_per_tick'] / 1e3:13.1f} us" for n in results))
+    print(f"{'(alloc B/tick)':18s}")
+    for name in names:
+        print(f"{name:18s}" + "".join(f"{results[n][name]['alloc_bytes_per_tick']:14d} B" for n in results))
+    return results
+
+
+# ----- PROJECTILES -----
+def naive_bullet_us(world, bullets, dtf):
+    """
+    Cost per bullet of the per-object approach for comparison: every bullet
+    a Python object tested against every enemy and solid, as the enemy loop
+    in Game.step does for the player.
+    """
+    solids = world.platforms + world.moving_platforms + world.slopes + world.terrains
+    t0 = time.perf_counter_ns()
+    for b in bullets:
+        x, y, vx, vy = b
+        nx, ny = x + vx * dtf, y + vy * dtf
+        hit = False
+        for e in world.enemies:
+            if e.alive and e.rect.clipline(x, y, nx, ny):
+                hit = True
+                break
+        if not hit:
+            for o in solids:
+                if o.blocks(x, y, nx, ny):
+                    break
+    return (time.perf_counter_ns() - t0) / 1e3 / max(1, len(bullets))
+
+
+def bench_projectiles(args):
+    surf = game.pygame.Surface((game.WIDTH, game.HEIGHT))
+    results = {}
+    for objects in args.sizes:
+        for rate in args.rates:
+            random.seed(1)
+            world = synthetic_world(objects)
+            pool = world.projectiles = game.ProjectilePool(args.pool)
+            rng = random.Random(2)
+            # emitters spread along the level, each spraying bullets round in a circle
+            emitters = [(world.width * (k + 0.5) / args.emitters, rng.randint(300, game.WORLD_HEIGHT - 300))
+                        for k in range(args.emitters)]
+            cam = game.Camera(world.width, world.height)
+            cam.x = emitters[0][0] - game.WIDTH / 2
+            cam.y = emitters[0][1] - game.HEIGHT / 2
+            per_tick = rate * 16 / 1000
+            owed = 0.0
+            update_ns = []
+            draw_ns = []
+            alive = []
+            shot = 0
+            t_build = time.perf_counter()
+            pool.grid = pool.build_grid(world)
+            build_s = time.perf_counter() - t_build
+            for tick in range(args.ticks):
+                owed += per_tick
+                while owed >= 1:
+                    owed -= 1
+                    ex, ey = emitters[shot % len(emitters)]
+                    angle = shot * 0.61
+                    pool.spawn(ex, ey, math.cos(angle) * game.PROJECTILE_SPEED, math.sin(angle) * game.PROJECTILE_SPEED)
+                    shot += 1
+                t0 = time.perf_counter_ns()
+                pool.update(16, world)
+                update_ns.append(time.perf_counter_ns() - t0)
+                t0 = time.perf_counter_ns()
+                pool.draw(surf, cam)
+                draw_ns.append(time.perf_counter_ns() - t0)
+                alive.append(pool.count)
+            n = pool.count
+            sample = list(zip(pool.xs[:n], pool.ys[:n], pool.vxs[:n], pool.vys[:n]))[:args.naive_sample]
+            naive_us = naive_bullet_us(world, sample, 16 / 16.67)
+            update_ns.sort()
+            mean_alive = sum(alive) / len(alive)
+            results[f"{objects}/{rate}"] = row = {
+                "objects": objects,
+                "rate_per_s": rate,
+                "alive_mean": round(mean_alive),
+                "alive_max": max(alive),
+                "fired": pool.fired,
+                "dropped": pool.dropped,
+                "enemy_hits": pool.hits,
+                "grid_build_ms": round(build_s * 1e3, 2),
+                "update_us": round(sum(update_ns) / len(update_ns) / 1e3, 1),
+                "update_p99_us": round(update_ns[int(len(update_ns) * 0.99)] / 1e3, 1),
+                "draw_us": round(sum(draw_ns) / len(draw_ns) / 1e3, 1),
+                "ns_per_bullet": round(sum(update_ns) / max(1, sum(alive))),
+                "naive_update_us_est": round(naive_us * mean_alive, 1),
+            }
+            print(f"{objects:>8d} obj {rate:>6d}/s: {row['alive_mean']:5d} alive  update {row['update_us']:8.1f} us"
+                  f" (p99 {row['update_p99_us']:8.1f}, {row['ns_per_bullet']:4d} ns/bullet)  draw {row['draw_us']:7.1f} us"
+                  f"  naive ~{row['naive_update_us_est'] / 1e3:9.1f} ms  dropped {row['dropped']}")
+    return results
+
+
+def bench_tiles(args):
+    surf = game.pygame.Surface((game.WIDTH, game.HEIGHT))
+    span = game.TILE_SIZE * game.TILE_CHUNK
+    rng = random.Random(3)
+    results = {}
+    for screens in args.screens:
+        with tempfile.TemporaryDirectory() as directory:
+            total = game.build_tile_world(directory, screens=screens, seed=1)
+            world = game.TileWorld(directory)
+            tiles = world.tiles
+            cam = game.Camera(world.width, world.height)
+            cam.x = world.width / 2
+            cam.y = world.height - game.HEIGHT
+
+            t0 = time.perf_counter()
+            tiles.draw(surf, cam)
+            first_ms = (time.perf_counter() - t0) * 1e3
+            draw_us = timed(lambda: tiles.draw(surf, cam), repeat=args.repeat)[0] * 1e6
+            # dig one tile in view each frame: only its chunk is redrawn
+            visible = [(x, y) for x in range(int(cam.x // game.TILE_SIZE), int((cam.x + game.WIDTH) // game.TILE_SIZE))
+                       for y in range(int(cam.y // game.TILE_SIZE), int((cam.y + game.HEIGHT) // game.TILE_SIZE))]
+
+            def edit_frame():
+                tx, ty = rng.choice(visible)
+                tiles.set_tile(tx, ty, game.TILE_AIR if tiles.tile(tx, ty) else game.TILE_DIRT)
+                tiles.draw(surf, cam)
+            edit_draw_us = timed(edit_frame, repeat=args.repeat)[0] * 1e6
+
+            def uncached_frame():
+                for key in list(tiles.chunks):
+                    tiles.chunks[key].surfaces.clear()
+                tiles.draw(surf, cam)
+            full_draw_us = timed(uncached_frame, repeat=args.repeat)[0] * 1e6
+
+            n = args.ops
+            points = [(rng.randrange(world.width), rng.randrange(world.height // 2, world.height)) for _ in range(n)]
+            t0 = time.perf_counter()
+            for x, y in points:
+                tiles.tile_at(x, y)  # generates the chunks reached
+            generate_ms = (time.perf_counter() - t0) * 1e3 / max(1, len(tiles.chunks))
+            t0 = time.perf_counter()
+            for x, y in points:
+                tiles.tile_at(x, y)
+            lookup_ns = (time.perf_counter() - t0) / n * 1e9
+            t0 = time.perf_counter()
+            for i, (x, y) in enumerate(points):
+                tiles.set_tile(x // game.TILE_SIZE, y // game.TILE_SIZE, game.TILE_AIR if i % 2 else game.TILE_STONE)
+            edit_ns = (time.perf_counter() - t0) / n * 1e9
+            rects = [game.pygame.Rect(x, y, 36, 56) for x, y in points[:args.queries]]
+            t0 = time.perf_counter()
+            for r in rects:
+                tiles.platforms_in(r)
+            query_us = (time.perf_counter() - t0) / len(rects) * 1e6
+            # the first query of a touched chunk rebuilds its runs; after that they are cached
+            t0 = time.perf_counter()
+            for r in rects:
+                tiles.platforms_in(r)
+            cached_query_us = (time.perf_counter() - t0) / len(rects) * 1e6
+
+            resident = len(tiles.chunks)
+            edited = sum(c.edited for c in tiles.chunks.values())
+            t0 = time.perf_counter()
+            saved = tiles.save()
+            save_ms = (time.perf_counter() - t0) * 1e3
+            disk = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+            tiles.keep(cam.x - span, cam.y - span, cam.x + game.WIDTH + span, cam.y + game.HEIGHT + span)
+            results[str(screens)] = row = {
+                "tiles": total,
+                "first_draw_ms": round(first_ms, 2),
+                "draw_us": round(draw_us, 1),
+                "edit_draw_us": round(edit_draw_us, 1),
+                "uncached_draw_us": round(full_draw_us, 1),
+                "generate_chunk_ms": round(generate_ms, 2),
+                "lookup_ns": round(lookup_ns),
+                "edit_ns": round(edit_ns),
+                "collide_query_us": round(query_us, 1),
+                "collide_query_cached_us": round(cached_query_us, 1),
+                "chunks_resident": resident,
+                "chunks_saved": saved,
+                "save_ms": round(save_ms, 1),
+                "disk_kb": round(disk / 1024, 1),
+                "chunks_after_keep": len(tiles.chunks),
+            }
+            print(f"{total:>10d} tiles: draw {row['draw_us']:7.1f} us (after an edit {row['edit_draw_us']:7.1f},"
+                  f" uncached {row['uncached_draw_us']:8.1f})  lookup {row['lookup_ns']:5d} ns  edit {row['edit_ns']:5d} ns"
+                  f"  collide {row['collide_query_us']:5.1f}/{row['collide_query_cached_us']:4.1f} us"
+                  f"  save {saved} of {resident} chunks {row['save_ms']:7.1f} ms, {row['disk_kb']} KB")
+    return results
+
+
+def bench_lighting(args):
+    random.seed(1)
+    world = synthetic_world(args.objects)
+    results = {}
+    for scale in args.scales:
+        surf = game.pygame.Surface((round(game.WIDTH * scale), round(game.HEIGHT * scale)))
+        for bullets in args.bullets:
+            lighting = game.Lighting()
+            pool = world.projectiles = game.ProjectilePool()
+            player = game.Player(world.width / 2, game.WORLD_HEIGHT / 2)
+            cam = game.Camera(world.width, world.height)
+            cam.scale = scale
+            cam.x = player.rect.centerx - game.WIDTH / 2
+            cam.y = player.rect.centery - game.HEIGHT / 2
+            rng = random.Random(2)
+            for _ in range(bullets):
+                pool.spawn(cam.x + rng.uniform(0, game.WIDTH), cam.y + rng.uniform(0, game.HEIGHT), 0.0, 0.0)
+            lighting.draw(surf, cam, world, (player,))
+            frame_us = timed(lambda: lighting.draw(surf, cam, world, (player,)), repeat=args.repeat)[0] * 1e6
+
+            def uncached():
+                lighting.cells.clear()
+                lighting.draw(surf, cam, world, (player,))
+            uncached_us = timed(uncached, repeat=args.repeat)[0] * 1e6
+            results[f"{scale}/{bullets}"] = row = {
+                "scale": scale,
+                "bullets": bullets,
+                "lights": lighting.lights,
+                "frame_us": round(frame_us, 1),
+                "uncached_glow_us": round(uncached_us, 1),
+            }
+            print(f"scale {scale:4.2f} {bullets:4d} bullets: {row['lights']:4d} lights  {row['frame_us']:8.1f} us"
+                  f"  (glows re-summed every frame {row['uncached_glow_us']:8.1f} us)")
+    return results
+
+
+def chase_world(enemies, seed=1, screens=None):
+    """A ground with rows of ledges above it, and a crowd of enemies on the ground."""
+    rng = random.Random(seed)
+    h = game.WORLD_HEIGHT
+    world = game.World(create_demo=False)
+    if screens:
+        world.width = screens * game.WIDTH
+    world.platforms.append(game.Platform(0, h - 64, world.width, 64))
+    for row in range(1, 8):
+        y = h - 64 - row * 80
+        x = rng.randint(0, 120)
+        while x < world.width - 150:
+            world.platforms.append(game.Platform(x, y, rng.randint(90, 180), 20))
+            x += rng.randint(260, 400)
+    for i in range(3):
+        x = 500 + i * 900
+        world.moving_platforms.append(game.MovingPlatform(x, h - 300, 140, 20, path=[(x, h - 300), (x + 300, h - 380)]))
+    for i in range(enemies):
+        world.enemies.append(game.Enemy(rng.randint(100, world.width - 140), h - 64 - 36,
+                                        patrol=(40, 120), speed=1.1 + rng.random() * 0.4))
+    world.index_entities()
+    return world
+
+
+def bench_nav(args):
+    results = {}
+    for enemies in args.enemies:
+        for mode in ("sliced", "naive"):
+            random.seed(1)
+            world = chase_world(enemies)
+            t0 = time.perf_counter()
+            world.enable_navigation()
+            build_ms = (time.perf_counter() - t0) * 1e3
+            nav = world.nav
+            # the player hops between the ledges the whole crowd is chasing it over
+            player = game.Player(world.width / 2, game.WORLD_HEIGHT - 300)
+            ledges = [p for p in world.platforms[1:] if abs(p.rect.centerx - world.width / 2) < 500]
+            rng = random.Random(2)
+            saved = game.NAV_SEARCHES_PER_TICK
+            if mode == "naive":
+                game.NAV_SEARCHES_PER_TICK = 10 ** 9
+            tick_ns = []
+            try:
+                for tick in range(args.ticks):
+                    if tick % 60 == 0:
+                        ledge = rng.choice(ledges)
+                        player.rect.midbottom = ledge.rect.midtop
+                        player.standing_on = ledge
+                        player.on_ground = True
+                    if mode == "naive":
+                        nav.cache.clear()  # every enemy searches for itself
+                    t0 = time.perf_counter_ns()
+                    world.update(16, player.rect.center, (player,))
+                    tick_ns.append(time.perf_counter_ns() - t0)
+            finally:
+                game.NAV_SEARCHES_PER_TICK = saved
+            tick_ns.sort()
+            chasing = sum(e.chasing for e in world.enemies)
+            results[f"{enemies}/{mode}"] = row = {
+                "enemies": enemies,
+                "nodes": len(nav.nodes),
+                "edges": sum(len(n.all_edges()) for n in nav.nodes.values()),
+                "build_ms": round(build_ms, 1),
+                "chasing_end": chasing,
+                "searches": nav.searches,
+                "cache_hits": nav.hits,
+                "relinked": nav.relinked,
+                "tick_us": round(sum(tick_ns) / len(tick_ns) / 1e3, 1),
+                "tick_p99_us": round(tick_ns[int(len(tick_ns) * 0.99)] / 1e3, 1),
+                "tick_max_us": round(tick_ns[-1] / 1e3, 1),
+            }
+            print(f"{enemies:5d} enemies {mode:>8s}: {row['nodes']} nodes {row['edges']} edges built in {row['build_ms']:6.1f} ms"
+                  f"  tick {row['tick_us']:8.1f} us (p99 {row['tick_p99_us']:8.1f}, max {row['tick_max_us']:8.1f})"
+                  f"  {chasing} chasing, searches {row['searches']:5d} hits {row['cache_hits']:6d}")
+    results.update(bench_nav_burst(args))
+    return results
+
+
+def demo_level_world(screens, seed=3):
+    """The streamed demo level with every chunk loaded into one World: its whole navigation graph at once."""
+    with tempfile.TemporaryDirectory() as directory:
+        game.build_demo_level(directory, screens=screens, seed=seed)
+        store = game.ChunkStore(directory)
+        meta = store.read_meta()
+        world = game.World(create_demo=False)
+        world.width = meta["width"]
+        world.height = meta["height"]
+        for key in sorted(game.chunks_in_rect(0, 0, world.width - 1, world.height - 1)):
+            ents = store.load(key)
+            for kind in game.ENTITY_KINDS:
+                getattr(world, kind).extend(ents[kind])
+    world.index_entities()
+    return world
+
+
+def bench_nav_burst(args):
+    """
+    Worst tick when a crowd starts chasing at once: the player lands among
+    args.burst enemies spread over the surfaces around the middle of a wide
+    world, and every surface with an enemy on it needs its own search.
+    """
+    results = {}
+    worlds = {
+        "level": lambda: demo_level_world(args.screens),
+        "ledges": lambda: chase_world(0, screens=args.screens),
+    }
+    saved = game.NAV_SEARCHES_PER_TICK
+    for name, make in worlds.items():
+        for limit in args.limits:
+            random.seed(1)
+            world = make()
+            mid = world.width / 2
+            near = [p for p in world.platforms if p.rect.right - 40 > mid - 500 and p.rect.left + 40 < mid + 500]
+            rng = random.Random(2)
+            for _ in range(args.burst):
+                p = rng.choice(near)
+                x = rng.randint(int(max(p.rect.left, mid - 500)), int(min(p.rect.right, mid + 500)) - 36)
+                world.enemies.append(game.Enemy(x, p.rect.top - 36, patrol=(0, 0), speed=1.2))
+            world.index_entities()
+            world.enable_navigation()
+            nav = world.nav
+            player = game.Player(mid, 0)
+            world.update(16, player.rect.center, ())
+            # high up, so the searches from the floor below have a long way round to find
+            landing = min(near, key=lambda p: (p.rect.top, abs(p.rect.centerx - mid)))
+            player.rect.midbottom = landing.rect.midtop
+            player.standing_on = landing
+            player.on_ground = True
+            game.NAV_SEARCHES_PER_TICK = limit or 10 ** 9
+            tick_ns = []
+            backlog = 0
+            try:
+                for tick in range(args.burst_ticks):
+                    t0 = time.perf_counter_ns()
+                    world.update(16, player.rect.center, (player,))
+                    tick_ns.append(time.perf_counter_ns() - t0)
+                    if nav.queue:
+                        backlog = tick + 1
+            finally:
+                game.NAV_SEARCHES_PER_TICK = saved
+            label = limit or "all"
+            results[f"burst/{name}/{label}"] = row = {
+                "nodes": len(nav.nodes),
+                "chasing": sum(e.chasing for e in world.enemies),
+                "searches": nav.searches,
+                "backlog_ticks": backlog,
+                "tick_max_us": round(max(tick_ns) / 1e3, 1),
+                "tick_us": round(sum(tick_ns) / len(tick_ns) / 1e3, 1),
+            }
+            print(f"burst {name:>6s} {row['nodes']:5d} nodes, {label!s:>3s} searches/tick: {row['chasing']} chasing,"
+                  f" {row['searches']:3d} searches over {backlog:3d} ticks, worst tick {row['tick_max_us']:9.1f} us"
+                  f" (mean {row['tick_us']:7.1f})")
+    return results
+
+
+def flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(flatten(v, key))
+        elif isinstance(v, (int, float)):
+            out[key] = v
+    return out
+
+
+def bench_compare(args):
+    """Print metric ratios between two saved runs (new / old)."""
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"old: {old.get('commit', '?')}  new: {new.get('commit', '?')}")
+    a = flatten(old["results"])
+    b = flatten(new["results"])
+    for key in sorted(a.keys() & b.keys()):
+        if key.endswith(".ticks") or key.endswith("objects"):
+            continue
+        ratio = b[key] / a[key] if a[key] else float("inf") if b[key] else 1.0
+        flag = "  <-- slower/bigger" if ratio > 1 + args.threshold else ""
+        print(f"  {key:50s} {a[key]:>12} -> {b[key]:>12}  x{ratio:5.2f}{flag}")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="game.py benchmarks")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p = sub.add_parser("level", help="level file save/load time")
+    p.add_argument("--objects", type=int, default=100000)
+    p.set_defaults(func=bench_level)
+    p = sub.add_parser("memory", help="tracemalloc bytes per entity and per frame")
+    p.add_argument("--instances", type=int, default=20000)
+    p.add_argument("--objects", type=int, default=100000)
+    p.add_argument("--frames", type=int, default=120)
+    p.set_defaults(func=bench_memory)
+    p = sub.add_parser("hotpaths", help="ns/tick and allocations of physics and render paths vs world size")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    p.add_argument("--ticks", type=int, default=600)
+    p.add_argument("--alloc-ticks", type=int, default=60)
+    p.add_argument("--only", nargs="+", help="only run these paths")
+    p.set_defaults(func=bench_hotpaths)
+    p = sub.add_parser("projectiles", help="bullet pool stress: update/draw cost vs fire rate and world size")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    p.add_argument("--rates", type=int, nargs="+", default=[1000, 3000, 6000], help="bullets fired per second")
+    p.add_argument("--ticks", type=int, default=600)
+    p.add_argument("--emitters", type=int, default=16)
+    p.add_argument("--pool", type=int, default=game.PROJECTILE_POOL)
+    p.add_argument("--naive-sample", type=int, default=20, help="bullets timed with the all-pairs test")
+    p.set_defaults(func=bench_projectiles)
+    p = sub.add_parser("tiles", help="tile map draw, edit, collision query and save cost vs world size")
+    p.add_argument("--screens", type=int, nargs="+", default=[200, 2000], help="tile world widths in screens")
+    p.add_argument("--ops", type=int, default=20000, help="random lookups and edits")
+    p.add_argument("--queries", type=int, default=2000, help="player-sized collision queries")
+    p.add_argument("--repeat", type=int, default=50)
+    p.set_defaults(func=bench_tiles)
+    p = sub.add_parser("lighting", help="light map cost per frame vs light count and render scale")
+    p.add_argument("--objects", type=int, default=100000)
+    p.add_argument("--bullets", type=int, nargs="+", default=[0, 16, 64], help="glowing bullets in view")
+    p.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.5])
+    p.add_argument("--repeat", type=int, default=50)
+    p.set_defaults(func=bench_lighting)
+    p = sub.add_parser("nav", help="enemy chase cost: graph build, path searches and tick spikes, time-sliced or not")
+    p.add_argument("--enemies", type=int, nargs="+", default=[100, 300])
+    p.add_argument("--ticks", type=int, default=600)
+    p.add_argument("--burst", type=int, default=300, help="enemies that start chasing in one tick")
+    p.add_argument("--screens", type=int, default=60, help="width of the burst worlds")
+    p.add_argument("--limits", type=int, nargs="+", default=[1, 4, 8, 0],
+                   help="NAV_SEARCHES_PER_TICK values for the burst; 0 runs every search at once")
+    p.add_argument("--burst-ticks", type=int, default=60)
+    p.set_defaults(func=bench_nav)
+    p = sub.add_parser("compare", help="compare two --json result files")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=0.05, help="flag ratios above 1 + threshold")
+    p.set_defaults(func=bench_compare)
+    args = parser.parse_args()
+
+    results = args.func(args)
+    if args.json and results is not None:
+        write_results(args.json, args.bench, results)
+
+
+if __name__ == "__main__":
+    main()
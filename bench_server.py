@@ -0,0 +1,178 @@
+# bench_server.py
+# Load test for vn_server.py against localhost. Starts a server process,
+# opens many concurrent sessions, measures the server's memory per open
+# session, then has every session play through to an ending. The soft
+# open-file limit is raised to fit the sessions, as 5000 of them do not fit
+# the usual 1024. Run e.g.:
+#   python bench_server.py --sessions 5000 --json server.json
+#   python bench_game.py compare old_server.json server.json
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+try:
+    import resource
+except ImportError:  # Windows has no rlimits
+    resource = None
+
+from bench_common import write_results
+
+FD_HEADROOM = 64  # open files besides the session sockets: stdio, the event loop, the server's pipe
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "requests": len(ordered),
+        "p50_us": round(pick(0.50) * 1e6, 1),
+        "p90_us": round(pick(0.90) * 1e6, 1),
+        "p99_us": round(pick(0.99) * 1e6, 1),
+        "max_us": round(ordered[-1] * 1e6, 1),
+    }
+
+
+def raise_fd_limit(sessions):
+    """
+    Lift the soft open-file limit so `sessions` sockets fit, before the server
+    is started so it inherits the limit too. Returns the (soft, hard) limit
+    now in force, or None where there are no rlimits.
+    """
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = sessions + FD_HEADROOM
+    if soft != resource.RLIM_INFINITY and soft < want:
+        soft = want if hard == resource.RLIM_INFINITY else min(want, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    return soft, hard
+
+
+def start_server():
+    """Run vn_server.py on a free port; returns (process, port)."""
+    proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "vn_server.py"),
+                             "--port", "0"], stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        if line.startswith("Serving"):
+            return proc, int(line.rsplit(":", 1)[1])
+    raise RuntimeError("vn_server.py exited before it was serving")
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.state = None
+
+    async def request(self, latencies=None, **req):
+        t0 = time.perf_counter()
+        self.writer.write(json.dumps(req).encode() + b"\n")
+        reply = json.loads(await self.reader.readline())
+        if latencies is not None:
+            latencies.append(time.perf_counter() - t0)
+        return reply
+
+
+async def connect(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    client = Client(reader, writer)
+    client.state = json.loads(await reader.readline())
+    return client
+
+
+async def play(client, rng, latencies):
+    """Skip and pick random choices until an ending is reached; returns the number of requests."""
+    n = 0
+    while True:
+        state = await client.request(latencies, cmd="skip")
+        n += 1
+        if state["ending"]:
+            return n
+        key = rng.choice(state["choices"])[0]
+        await client.request(latencies, cmd="choose", key=key)
+        n += 1
+
+
+async def gather_limited(coros, limit):
+    sem = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with sem:
+            return await coro
+    return await asyncio.gather(*(run(c) for c in coros))
+
+
+async def load_test(port, sessions, concurrency, seed):
+    rng = random.Random(seed)
+    admin = await connect(port)
+    base = await admin.request(cmd="stats")
+
+    t0 = time.perf_counter()
+    clients = await gather_limited([connect(port) for _ in range(sessions)], concurrency)
+    connect_s = time.perf_counter() - t0
+    opened = await admin.request(cmd="stats")
+
+    latencies = []
+    t0 = time.perf_counter()
+    requests = await gather_limited([play(c, random.Random(rng.random()), latencies) for c in clients], concurrency)
+    play_s = time.perf_counter() - t0
+
+    for c in clients:
+        c.writer.close()
+    admin.writer.close()
+    return {
+        "sessions": sessions,
+        "open_per_s": round(sessions / connect_s, 1),
+        "kb_per_session": round((opened["rss_kb"] - base["rss_kb"]) / sessions, 2),
+        "server_rss_kb": opened["rss_kb"],
+        "playthroughs_per_s": round(sessions / play_s, 1),
+        "requests_per_s": round(sum(requests) / play_s, 1),
+        "latency": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="vn_server.py load test")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="sessions held open at once, one socket each on both ends: the open-file limit "
+                             "is raised to fit, up to the hard limit (ulimit -Hn)")
+    parser.add_argument("--concurrency", type=int, default=2000, help="most connections in flight at once")
+    parser.add_argument("--port", type=int,
+                        help="use a running server instead of starting one; its own open-file limit must fit --sessions")
+    args = parser.parse_args()
+
+    limit = raise_fd_limit(max(args.sessions))
+    if limit is not None and limit[0] != resource.RLIM_INFINITY and limit[0] < max(args.sessions) + FD_HEADROOM:
+        parser.error(f"{max(args.sessions)} sessions need about {max(args.sessions) + FD_HEADROOM} open files, "
+                     f"but the hard limit is {limit[1]}: raise it or run fewer --sessions")
+
+    proc = None
+    port = args.port
+    if port is None:
+        proc, port = start_server()
+    try:
+        results = {}
+        for n in args.sessions:
+            results[str(n)] = asyncio.run(load_test(port, n, args.concurrency, seed=n))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    print(f"  {'sessions':>10s} {'open/s':>10s} {'KB/sess':>10s} {'plays/s':>10s} {'req/s':>10s} {'p50 us':>10s} {'p99 us':>10s}")
+    for n, r in results.items():
+        print(f"  {n:>10s} {r['open_per_s']:10.1f} {r['kb_per_session']:10.2f} {r['playthroughs_per_s']:10.1f} "
+              f"{r['requests_per_s']:10.1f} {r['latency']['p50_us']:10.1f} {r['latency']['p99_us']:10.1f}")
+    if args.json:
+        write_results(args.json, "server", results)
+
+
+if __name__ == "__main__":
+    main()
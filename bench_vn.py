@@ -0,0 +1,347 @@
+# bench_vn.py
+# Headless benchmarks for the choice.py VN engine's text and render path.
+# Synthetic scenes are loaded into SCENES and rendered into an offscreen
+# surface. Run e.g.:
+#   python bench_vn.py --json vn.json
+#   python bench_game.py compare old_vn.json vn.json
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import random
+import tempfile
+import time
+import wave
+from array import array
+from pathlib import Path
+
+import pygame
+import choice
+from bench_common import write_results
+
+WORDS = ("the", "reactor", "hums", "Anna", "captain", "black", "liquid", "drips", "from", "a", "pipe",
+         "static", "silence", "engine", "room", "you", "hear", "something", "moving", "behind", "wall")
+FRAME_DT = 1.0 / choice.FPS
+
+
+def synthetic_text(chars, rng):
+    words = []
+    n = 0
+    while n < chars:
+        w = rng.choice(WORDS)
+        words.append(w)
+        n += len(w) + 1
+        if rng.random() < 0.06:
+            words.append("\n")
+    return " ".join(words)[:chars]
+
+
+def synthetic_markup(chars, rng):
+    """Like synthetic_text, with every few words wrapped in a style tag."""
+    tags = (("{b}", "{/b}"), ("{i}", "{/i}"), ("{color=accent}", "{/color}"), ("{speed=2}", "{/speed}"))
+    words = synthetic_text(chars, rng).split(" ")
+    for i in range(0, len(words), 4):
+        if words[i] and words[i] != "\n":
+            open_tag, close_tag = rng.choice(tags)
+            words[i] = open_tag + words[i] + close_tag
+    return " ".join(words)
+
+
+def add_scene(scene_id, chars, n_choices, rng, markup=False):
+    choices = [(f"{i + 1}. {synthetic_text(40, rng)}", str(i + 1), "INTRO") for i in range(n_choices)]
+    text = synthetic_markup(chars, rng) if markup else synthetic_text(chars, rng)
+    choice.s(scene_id, text, choices, bg="bench", portrait="bench", name="Bench")
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "frames": len(ordered),
+        "p50_us": round(pick(0.50) * 1e6, 1),
+        "p90_us": round(pick(0.90) * 1e6, 1),
+        "p99_us": round(pick(0.99) * 1e6, 1),
+        "max_us": round(ordered[-1] * 1e6, 1),
+    }
+
+
+def run_frames(frames, update=True):
+    """Time `frames` frames of typewriter update + full draw."""
+    samples = []
+    now = 0.0
+    for _ in range(frames):
+        now += FRAME_DT
+        t0 = time.perf_counter()
+        if update:
+            choice.update_typewriter(FRAME_DT, now)
+            choice.update_transition(FRAME_DT)
+        choice.draw_frame()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def reset_state():
+    choice.auto_mode = False
+    choice.fast_hold = False
+    choice.log_open = False
+    choice.message_log.clear()
+
+
+def bench_text_length(lengths, frames, rng):
+    """Typewriter reveal of scenes of growing length."""
+    out = {}
+    for chars in lengths:
+        reset_state()
+        add_scene(f"BENCH_TEXT_{chars}", chars, 3, rng)
+        choice.go_to_scene(f"BENCH_TEXT_{chars}")
+        out[str(chars)] = percentiles(run_frames(frames))
+    return out
+
+
+def bench_markup(lengths, frames, rng):
+    """Typewriter reveal of scenes full of bold/italic/colour tags, to compare with text_length."""
+    out = {}
+    for chars in lengths:
+        reset_state()
+        add_scene(f"BENCH_MARKUP_{chars}", chars, 3, rng, markup=True)
+        choice.go_to_scene(f"BENCH_MARKUP_{chars}")
+        out[str(chars)] = percentiles(run_frames(frames))
+    return out
+
+
+def bench_choices(counts, frames, rng):
+    """Fully revealed scene with a growing number of choice buttons."""
+    out = {}
+    for n in counts:
+        reset_state()
+        add_scene(f"BENCH_CHOICES_{n}", 300, n, rng)
+        choice.go_to_scene(f"BENCH_CHOICES_{n}")
+        choice.transition = None
+        choice.text_progress = len(choice.current_display_text)
+        out[str(n)] = percentiles(run_frames(frames))
+    return out
+
+
+def bench_log(sizes, frames, rng):
+    """Message log open with a growing number of entries."""
+    out = {}
+    add_scene("BENCH_LOG", 300, 3, rng)
+    for n in sizes:
+        reset_state()
+        choice.go_to_scene("BENCH_LOG")
+        choice.transition = None
+        choice.message_log.clear()
+        for _ in range(n):
+            choice.message_log.append(synthetic_text(400, rng))
+        choice.log_open = True
+        out[str(n)] = percentiles(run_frames(frames))
+    return out
+
+
+def bench_transitions(kinds, frames, rng):
+    """Draw during each transition kind; "cut" is the plain redraw they replace."""
+    out = {}
+    add_scene("BENCH_FROM", 300, 3, rng)
+    for kind in kinds:
+        samples = []
+        while len(samples) < frames:
+            reset_state()
+            choice.go_to_scene("BENCH_FROM")
+            choice.transition = None
+            choice.draw_frame()
+            add_scene("BENCH_TO", 300, 3, rng)
+            choice.SCENES["BENCH_TO"].transition = kind
+            choice.go_to_scene("BENCH_TO")
+            # every frame of one transition, the first one included
+            for _ in range(int(choice.TRANSITION_TIME / FRAME_DT)):
+                t0 = time.perf_counter()
+                choice.update_transition(FRAME_DT)
+                choice.draw_frame()
+                samples.append(time.perf_counter() - t0)
+        out[kind] = percentiles(samples)
+    return out
+
+
+def bench_wrap(lengths, repeat, rng):
+    """draw_wrapped_text alone, per call."""
+    out = {}
+    rect = choice.TEXT_BOX_RECT.inflate(-16, -16)
+    for chars in lengths:
+        text = synthetic_text(chars, rng)
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            choice.draw_wrapped_text(choice.screen, text, rect, choice.FONT)
+            samples.append(time.perf_counter() - t0)
+        out[str(chars)] = percentiles(samples)
+    return out
+
+
+def bench_reveal_rate(rates, chars, rng):
+    """Measured vs scheduled reveal time of one scene at different frame rates."""
+    out = {}
+    add_scene("BENCH_RATE", chars, 3, rng)
+    for fps in rates:
+        reset_state()
+        choice.go_to_scene("BENCH_RATE")
+        choice.transition = None
+        expected = choice.current_script.reveal_time(choice.chars_per_second)
+        n = len(choice.current_display_text)
+        frames = 0
+        while choice.text_progress < n:
+            choice.update_typewriter(1.0 / fps, frames / fps)
+            frames += 1
+        out[str(fps)] = {"expected_s": round(expected, 4), "measured_s": round(frames / fps, 4),
+                         "error_frames": round(frames - expected * fps, 2)}
+    return out
+
+
+def bench_idle(seconds):
+    """CPU used by the real main loop on a settled screen, redrawing every frame vs idling."""
+    out = {}
+    for mode, idle in (("busy", False), ("idle", True)):
+        reset_state()
+        choice.go_to_scene("INTRO")
+        choice.text_progress = len(choice.current_display_text)
+        choice.transition = None
+        pygame.event.clear()
+        pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), 1)
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        choice.run(idle)
+        wall = time.perf_counter() - wall0
+        out[mode] = {"wall_s": round(wall, 2), "cpu_s": round(time.process_time() - cpu0, 3),
+                     "cpu_pct": round(100 * (time.process_time() - cpu0) / wall, 1)}
+    return out
+
+
+def write_track(path, seconds, rate=48000):
+    """A silent stereo WAV; 48 kHz so loading it also resamples to the mixer's rate, like a real track."""
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(array("h", bytes(rate * seconds * 4)).tobytes())
+
+
+def bench_music(tracks, seconds, hold):
+    """
+    Scene changes through a chain of scenes with a track each: decoding the
+    next track on the change vs the Music manager preloading it while the
+    previous scene is read (hold seconds per scene).
+    """
+    out = {}
+    old_dir = choice.MUSIC_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        choice.MUSIC_DIR = Path(tmp)
+        for i in range(tracks):
+            write_track(Path(tmp) / f"bench{i}.wav", seconds)
+            nxt = f"BENCH_MUSIC_{i + 1}" if i + 1 < tracks else "INTRO"
+            choice.s(f"BENCH_MUSIC_{i}", "music", [("1. On", "1", nxt)])
+        choice.s("BENCH_MUSIC_START", "silence", [("1. On", "1", "BENCH_MUSIC_0")], music="")
+
+        # what a crossfade costs if the change itself decodes the track
+        samples = []
+        for i in range(tracks):
+            reset_state()
+            t0 = time.perf_counter()
+            choice.go_to_scene(f"BENCH_MUSIC_{i}")
+            choice.mixer.Sound(str(choice.find_music(f"bench{i}")))
+            samples.append(time.perf_counter() - t0)
+        out["blocking"] = percentiles(samples)
+
+        for i in range(tracks):
+            choice.SCENES[f"BENCH_MUSIC_{i}"].music = f"bench{i}"
+        music = choice.music = choice.Music()
+        reset_state()
+        choice.go_to_scene("BENCH_MUSIC_START")  # which prefetches bench0
+        samples = []
+        for i in range(tracks):
+            end = time.perf_counter() + hold
+            while time.perf_counter() < end:
+                time.sleep(FRAME_DT)
+                music.poll()
+            t0 = time.perf_counter()
+            choice.go_to_scene(f"BENCH_MUSIC_{i}")
+            music.poll()
+            samples.append(time.perf_counter() - t0)
+        out["preloaded"] = percentiles(samples)
+        stats = music.stats()
+        loads = [ms for times in stats["load_ms"].values() for ms in times]
+        out["preloaded"].update(late=stats["late"], max_wait_ms=stats["max_wait_ms"],
+                                load_ms_mean=round(sum(loads) / len(loads), 2), load_ms_max=round(max(loads), 2))
+        for i in range(tracks):
+            del choice.SCENES[f"BENCH_MUSIC_{i}"]
+        del choice.SCENES["BENCH_MUSIC_START"]
+        choice.music = choice.Music()
+    choice.MUSIC_DIR = old_dir
+    return out
+
+
+def print_table(title, key_name, rows):
+    print(title)
+    print(f"  {key_name:>10s} {'p50':>10s} {'p90':>10s} {'p99':>10s} {'max':>10s}  (us/frame)")
+    for k, r in rows.items():
+        print(f"  {k:>10s} {r['p50_us']:10.1f} {r['p90_us']:10.1f} {r['p99_us']:10.1f} {r['max_us']:10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="choice.py VN engine benchmarks")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 500, 2000, 8000])
+    parser.add_argument("--choices", type=int, nargs="+", default=[1, 3, 6, 12])
+    parser.add_argument("--log-sizes", type=int, nargs="+", default=[0, 50, 200])
+    parser.add_argument("--idle-seconds", type=float, default=3.0, help="per mode; 0 skips the idle bench")
+    parser.add_argument("--music-tracks", type=int, default=8, help="0 skips the music bench")
+    parser.add_argument("--music-seconds", type=int, default=60, help="length of each synthetic track")
+    args = parser.parse_args()
+
+    choice.start()
+    # render offscreen; draw_ui/draw_log draw onto choice.screen
+    choice.screen = pygame.Surface((choice.WIDTH, choice.HEIGHT))
+    choice.type_sfx = None
+    rng = random.Random(1)
+
+    results = {
+        "text_length": bench_text_length(args.lengths, args.frames, rng),
+        "markup": bench_markup(args.lengths, args.frames, rng),
+        "transitions": bench_transitions(("cut", "fade", "crossfade", "wipe", "slide"), args.frames, rng),
+        "choices": bench_choices(args.choices, args.frames, rng),
+        "log_size": bench_log(args.log_sizes, args.frames, rng),
+        "wrap_text": bench_wrap(args.lengths, args.frames, rng),
+    }
+    results["reveal_rate"] = bench_reveal_rate([24, 30, 60, 144], 2000, rng)
+    if args.music_tracks > 0:
+        results["music"] = bench_music(args.music_tracks, args.music_seconds, hold=1.0)
+    if args.idle_seconds > 0:
+        results["idle"] = bench_idle(args.idle_seconds)
+    print_table("typewriter + draw vs scene text length", "chars", results["text_length"])
+    print_table("typewriter + draw vs marked-up scene text length", "chars", results["markup"])
+    print_table("update + draw during a scene transition", "kind", results["transitions"])
+    print_table("draw vs choice count", "choices", results["choices"])
+    print_table("draw with log open vs log size", "entries", results["log_size"])
+    print_table("draw_wrapped_text vs text length", "chars", results["wrap_text"])
+    print("typewriter reveal time vs frame rate")
+    for fps, r in results["reveal_rate"].items():
+        print(f"  {fps:>10s} {r['measured_s']:8.3f} s measured, {r['expected_s']:.3f} s scheduled "
+              f"({r['error_frames']:+.2f} frames)")
+    if "music" in results:
+        print_table("scene change to a new track", "music", results["music"])
+        r = results["music"]["preloaded"]
+        print(f"  track loads {r['load_ms_mean']:.1f} ms mean, {r['load_ms_max']:.1f} ms max on the loader thread; "
+              f"{r['late']} late (waited {r['max_wait_ms']:.1f} ms at most)")
+    if "idle" in results:
+        print("main loop on a settled screen")
+        for mode, r in results["idle"].items():
+            print(f"  {mode:>10s} {r['cpu_s']:8.3f} s CPU over {r['wall_s']:.2f} s ({r['cpu_pct']:.1f}%)")
+
+    if args.json:
+        write_results(args.json, "vn", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# capture.py
+# Offline video capture of recorded sessions. The recording is replayed
+# through the simulation; every captured tick is reduced to a small snapshot
+# of what is on screen, and a process pool renders the snapshots into
+# offscreen surfaces in parallel. Run e.g.:
+#   python capture.py session.rec frames/ --workers 8
+#   python capture.py session.rec out/ --format raw
+#   ffmpeg -framerate 60 -i frames/frame_%06d.png out.mp4
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# SDL otherwise turns SIGTERM into a quit event and pool workers never exit
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+
+import argparse
+import multiprocessing
+import sys
+import time
+
+import pygame
+import game
+
+CULL_MARGIN = 64  # px around the view that still gets snapshotted
+
+
+def snapshot(g):
+    """Everything Game.draw needs for one frame, as plain picklable values."""
+    cam = g.cam
+    view = pygame.Rect(int(cam.x) - CULL_MARGIN, int(cam.y) - CULL_MARGIN,
+                       game.WIDTH + CULL_MARGIN * 2, game.HEIGHT + CULL_MARGIN * 2)
+    w = g.world
+    p = g.player
+    shots = w.projectiles
+    tiles = None
+    if w.tiles is not None:
+        span = game.TILE_SIZE * game.TILE_CHUNK
+        keys = [(cx, cy) for cx in range(max(0, view.left // span), view.right // span + 1)
+                for cy in range(max(0, view.top // span), view.bottom // span + 1)]
+        tiles = (w.width, w.height, [(key, bytes(w.tiles.chunk(*key).tiles)) for key in keys])
+    return {
+        "cam": (cam.x, cam.y),
+        "score": g.score,
+        "lives": g.lives,
+        "hitboxes": g.show_hitboxes,
+        "platforms": [tuple(o.rect) for o in w.platforms if view.colliderect(o.rect)],
+        "moving_platforms": [tuple(o.rect) for o in w.moving_platforms if view.colliderect(o.rect)],
+        "slopes": [(tuple(o.rect), o.type) for o in w.slopes if view.colliderect(o.rect)],
+        # terrain is solid below its surface, so only its top edge can cull it
+        "terrains": [o.points() for o in w.terrains
+                     if o.rect.left < view.right and view.left < o.rect.right and o.rect.top < view.bottom],
+        "ladders": [tuple(o.rect) for o in w.ladders if view.colliderect(o.rect)],
+        "enemies": [tuple(o.rect) for o in w.enemies if view.colliderect(o.rect)],
+        "coins": [(c.pos.x, c.pos.y, c.radius, c.bob_phase, c.kind) for c in w.coins
+                  if not c.collected and view.collidepoint(c.pos.x, c.pos.y)],
+        "player": (tuple(p.rect), p.facing, p.anim_frame, p.invincible, p.dash_active, p.dash_timer,
+                   p.dash_cooldown, p.wall_slide, p.screen_shake),
+        "particles": [(q.pos.x, q.pos.y, q.lifetime, q.max_lifetime, q.color, q.radius) for q in p.particles],
+        "projectiles": [(x, y) for x, y in zip(shots.xs[:shots.count], shots.ys[:shots.count])
+                        if view.collidepoint(x, y)],
+        "tiles": tiles,
+    }
+
+# ----- WORKERS -----
+_worker = {}
+
+
+def _init_worker(out_dir, fmt):
+    pygame.init()
+    _worker["surf"] = pygame.Surface((game.WIDTH, game.HEIGHT))
+    _worker["game"] = game.Game(world=game.World(create_demo=False))
+    _worker["out_dir"] = out_dir
+    _worker["fmt"] = fmt
+
+
+def _restore(g, snap):
+    w = g.world
+    w.platforms = [game.Platform(*r) for r in snap["platforms"]]
+    w.moving_platforms = [game.MovingPlatform(*r, path=[]) for r in snap["moving_platforms"]]
+    w.slopes = [game.Slope(*r, slope_type=t) for r, t in snap["slopes"]]
+    w.ladders = [game.Ladder(*r) for r in snap["ladders"]]
+    w.terrains = [game.Terrain(points) for points in snap["terrains"]]
+    w.enemies = [game.Enemy(*r) for r in snap["enemies"]]
+    w.coins = []
+    for x, y, radius, phase, kind in snap["coins"]:
+        c = game.PICKUP_TYPES[kind](x, y, radius)
+        c.bob_phase = phase
+        w.coins.append(c)
+    w.pickups.rebuild(w.coins)
+    if snap["tiles"] is None:
+        w.tiles = None
+    else:
+        width, height, chunks = snap["tiles"]
+        old = w.tiles.chunks if w.tiles is not None else {}
+        w.tiles = game.TileMap(width, height)
+        for key, data in chunks:
+            # unchanged chunks keep their pre-drawn surfaces from the last frame
+            c = old.get(key)
+            w.tiles.chunks[key] = c if c is not None and c.tiles == data else game.TileChunk(bytearray(data))
+    w.projectiles.clear()
+    for x, y in snap["projectiles"]:
+        w.projectiles.spawn(x, y, 0.0, 0.0)
+
+    rect, facing, anim_frame, invincible, dash_active, dash_timer, dash_cooldown, wall_slide, shake = snap["player"]
+    p = game.Player(rect[0], rect[1])
+    p.rect.size = rect[2:]
+    p.facing = facing
+    p.anim_frame = anim_frame
+    p.invincible = invincible
+    p.dash_active = dash_active
+    p.dash_timer = dash_timer
+    p.dash_cooldown = dash_cooldown
+    p.wall_slide = wall_slide
+    p.screen_shake = shake
+    for x, y, lifetime, max_lifetime, color, radius in snap["particles"]:
+        q = game.Particle(x, y, 0, 0, lifetime, color, radius)
+        q.max_lifetime = max_lifetime
+        p.particles.append(q)
+    g.player = p
+    g.cam.x, g.cam.y = snap["cam"]
+    g.score = snap["score"]
+    g.lives = snap["lives"]
+    g.show_hitboxes = snap["hitboxes"]
+
+
+def _render(job):
+    index, snap = job
+    g = _worker["game"]
+    surf = _worker["surf"]
+    _restore(g, snap)
+    g.fx_rng.seed(index)  # screen shake is reproducible per frame
+    g.draw(surf)
+    if _worker["fmt"] == "png":
+        pygame.image.save(surf, os.path.join(_worker["out_dir"], f"frame_{index:06d}.png"))
+        return index, None
+    return index, pygame.image.tobytes(surf, "RGB")
+
+# ----- DRIVER -----
+def snapshots(recording, every):
+    """Replay the recording and yield (frame index, snapshot) for every `every`-th tick."""
+    seed, level, interval, chase, ticks = game.read_recording(recording)
+    g = game.start_session(seed, level, background_streaming=False, chase=chase)
+    frame = 0
+    for n, (dt, inp, _check) in enumerate(ticks, 1):
+        g.step(inp, dt)
+        if n % every == 0:
+            yield frame, snapshot(g)
+            frame += 1
+    g.close()
+
+
+def capture(recording, out_dir, workers=None, fmt="png", every=1, batch=256):
+    """Render a recording to numbered frames; returns (frames, seconds)."""
+    os.makedirs(out_dir, exist_ok=True)
+    raw = open(os.path.join(out_dir, "frames.rgb"), "wb") if fmt == "raw" else None
+    ctx = multiprocessing.get_context("spawn")  # fresh pygame per worker
+    t0 = time.perf_counter()
+    frames = 0
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(out_dir, fmt)) as pool:
+        jobs = []
+        # batches bound the number of snapshots held in memory at once
+        for job in snapshots(recording, every):
+            jobs.append(job)
+            if len(jobs) >= batch:
+                frames += _flush(pool, jobs, raw)
+                jobs = []
+        frames += _flush(pool, jobs, raw)
+        pool.close()
+        pool.join()
+    if raw:
+        raw.close()
+    return frames, time.perf_counter() - t0
+
+
+def _flush(pool, jobs, raw):
+    # imap yields in submission order, so raw frames are appended in order
+    for index, data in pool.imap(_render, jobs, chunksize=8):
+        if raw:
+            raw.write(data)
+    return len(jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a recorded game.py session to frames")
+    parser.add_argument("recording")
+    parser.add_argument("out_dir")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--format", choices=("png", "raw"), default="png",
+                        help="numbered PNGs, or one frames.rgb stream of rgb24 frames")
+    parser.add_argument("--every", type=int, default=1, help="capture every Nth tick")
+    args = parser.parse_args()
+    if args.every < 1:
+        parser.error("--every must be at least 1")
+
+    frames, seconds = capture(args.recording, args.out_dir, args.workers, args.format, args.every)
+    # the game ticks at 60 Hz, so a frame every Nth tick plays back at 60 / N fps
+    fps = 60 / args.every
+    print(f"{frames} frames in {seconds:.2f}s ({frames / seconds:.0f} fps, "
+          f"{frames / seconds / fps:.1f}x real time at {fps:g} fps)")
+    if args.format == "raw":
+        print(f"ffmpeg -f rawvideo -pix_fmt rgb24 -s {game.WIDTH}x{game.HEIGHT} -r {fps:g} "
+              f"-i {os.path.join(args.out_dir, 'frames.rgb')} out.mp4")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,7 @@
 # Fully upgraded Pygame VN engine with:
 # - typewriter per-letter sound
 # - background images & portraits (assets/ folder)
-# - looping music
+# - per-scene music, preloaded in the background and crossfaded
 # - auto / skip / fast-forward
 # - message log
 # - adjustable text speed (+/-)
@@ -11,24 +11,40 @@
 # README referenced for project description. :contentReference[oaicite:3]{index=3}
 
 import pygame
+import ast
 import textwrap
 import os
+import re
 import sys
+import threading
+from array import array
+from itertools import accumulate
 from pathlib import Path
 from collections import deque
 from pygame import mixer
 from time import perf_counter
 
-pygame.init()
-mixer.init()
+# only the fonts at import: the window, the mixer and the first scene wait
+# for start(), so the scene graph can be used headless (vn_server.py)
+pygame.font.init()
 
 # ---------- CONFIG ----------
 WIDTH, HEIGHT = 1000, 700
 FPS = 60
+AUTO_ADVANCE_DELAY = 1.0  # seconds a fully shown scene stays up in auto mode
+FAST_MULT = 3.0  # reveal speed while Shift is held
+AUTO_MULT = 1.6  # reveal speed in auto mode
+# extra seconds before the next character when punctuation is followed by whitespace
+PUNCT_PAUSES = {".": 0.25, "!": 0.25, "?": 0.25, ",": 0.1, ";": 0.15, ":": 0.15}
+TRANSITION_TIME = 0.35  # seconds a scene change takes
+DEFAULT_TRANSITION = "crossfade"  # used when a scene sets none: "fade", "crossfade", "wipe", "slide" or "cut"
 ASSETS_DIR = Path("assets")
 BG_DIR = ASSETS_DIR / "bg"
 PORTRAITS_DIR = ASSETS_DIR / "portraits"
-MUSIC_FILE = ASSETS_DIR / "music" / "ambient_loop.ogg"
+MUSIC_DIR = ASSETS_DIR / "music"
+MUSIC_VOLUME = 0.5
+MUSIC_FADE = 1.5  # seconds the old and new track crossfade over on a change of music
+MUSIC_CACHE = 6  # decoded tracks kept: the playing, wanted and upcoming ones, then the most recent
 TYPE_SFX = ASSETS_DIR / "sfx" / "type.wav"
 
 # Fonts & Colors
@@ -51,8 +67,7 @@ CHOICE_AREA_RECT = pygame.Rect(TEXT_BOX_RECT.right + 10, TEXT_BOX_RECT.y, 230, T
 PORTRAIT_RECT = pygame.Rect(TEXT_BOX_RECT.right + 10, 40, 230, 300)
 TITLE_POS = (40, 12)
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Bastion One — Psychological Horror (VN Engine)")
+screen = None  # the window, opened by start()
 
 clock = pygame.time.Clock()
 
@@ -100,23 +115,42 @@ def draw_wrapped_text(surface, text, rect, font, color=WHITE, line_spacing=4, ma
 
 # ---------- Button with wrapping ----------
 class Button:
+    """
+    A retained choice button: the wrapped label is rendered once per state
+    (normal, hover) and hover is only recomputed when the mouse moves.
+    """
     def __init__(self, rect, text, key):
         self.rect = pygame.Rect(rect)
         self.text = text
         self.key = key  # e.g., '1', '2', '3', or 'restart'
-    def draw(self, surf, mouse_pos):
-        hover = self.rect.collidepoint(mouse_pos)
-        color = BUTTON_HOVER if hover else BUTTON_BG
-        pygame.draw.rect(surf, color, self.rect, border_radius=8)
+        self.hover = False
+        self._surfaces = None
+    def surfaces(self):
+        """(normal, hover) renderings of the button, built on first use."""
+        if self._surfaces is None:
+            self._surfaces = tuple(self.render(color) for color in (BUTTON_BG, BUTTON_HOVER))
+        return self._surfaces
+    def render(self, color):
+        surf = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        local = surf.get_rect()
+        pygame.draw.rect(surf, color, local, border_radius=8)
         # Draw wrapped lines inside
-        inner = self.rect.inflate(-10, -10)
-        draw_wrapped_text(surf, self.text, inner, FONT)
+        draw_wrapped_text(surf, self.text, local.inflate(-10, -10), FONT)
+        return surf
+    def set_hover(self, pos):
+        """Update hover from the mouse position; True if that changed the button's look."""
+        hover = bool(self.rect.collidepoint(pos))
+        changed = hover != self.hover
+        self.hover = hover
+        return changed
+    def draw(self, surf):
+        surf.blit(self.surfaces()[self.hover], self.rect)
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
 # ---------- Scene system ----------
 class Scene:
-    def __init__(self, id, text, choices=None, bg=None, portrait=None, name=None):
+    def __init__(self, id, text, choices=None, bg=None, portrait=None, name=None, transition=None, music=None):
         self.id = id
         self.text = text
         # choices: list of tuples (label_text, key, next_scene_id)
@@ -124,10 +158,272 @@ class Scene:
         self.bg = bg  # background key (filename without ext)
         self.portrait = portrait  # portrait filename (no ext)
         self.name = name  # speaking character name
+        self.transition = transition  # how the scene is entered, DEFAULT_TRANSITION if None
+        self.music = music  # track (filename without ext) in MUSIC_DIR; None keeps what plays, "" is silence
+        self._script = None
+        self._layouts = {}
+        self._buttons = None
+
+    def script(self):
+        """The scene's compiled text (tags stripped, reveal timing), built on first use."""
+        if self._script is None:
+            self._script = compile_script(self.text)
+        return self._script
+
+    def layout(self, width):
+        """The scene's text wrapped to width and rendered to line surfaces, built on first use."""
+        if width not in self._layouts:
+            self._layouts[width] = layout_script(self.script(), width)
+        return self._layouts[width]
+
+    def definition(self):
+        return (self.text, self.choices, self.bg, self.portrait, self.name, self.transition, self.music)
+
+    def redefine(self, other):
+        """Take over other's definition, dropping everything built from the old one."""
+        self.text, self.choices, self.bg, self.portrait, self.name, self.transition, self.music = other.definition()
+        self._script = None
+        self._layouts = {}
+        self._buttons = None
+
+    def buttons(self):
+        """The scene's choice buttons, built on first use and kept for later visits."""
+        if self._buttons is None:
+            self._buttons = build_buttons_for_scene(self)
+        return self._buttons
+
+# ---------- Reveal timing ----------
+# Scene text may carry inline tags: {speed=2}...{/speed} scales the reveal
+# speed, {pause=0.5} waits that many seconds before the next character,
+# {b}...{/b} and {i}...{/i} switch to bold/italic, {color=accent}...{/color}
+# colours the text (a TEXT_COLORS name or anything pygame.Color accepts, e.g.
+# #ff8800), and {{ is a literal brace. Unknown tags are shown as written.
+TAG_RE = re.compile(r"\{\{|\{(/?)(\w+)(?:=([^{}]*))?\}")
+TEXT_COLORS = {"white": WHITE, "accent": ACCENT, "gray": (150, 150, 160), "blood": (200, 40, 40)}
+
+class RevealSchedule:
+    """
+    When each character of a scene's text appears. units[i] is the cost of
+    character i in characters at the base speed, pauses[i] the seconds waited
+    before it; both are also kept as prefix sums so reveal times are O(1).
+    runs are (start, end, style) spans of text, style being (bold, italic, color).
+    """
+    def __init__(self, text, units, pauses, runs=None):
+        self.text = text
+        self.runs = runs if runs is not None else [(0, len(text), PLAIN_STYLE)]
+        self.units = array("d", units)
+        self.pauses = array("d", pauses)
+        self.cum_units = array("d", accumulate(self.units, initial=0.0))
+        self.cum_pauses = array("d", accumulate(self.pauses, initial=0.0))
+
+    def advance(self, progress, acc, cps):
+        """Spend acc seconds (at multiplier 1) revealing from progress; returns (progress, leftover acc)."""
+        n = len(self.text)
+        while progress < n:
+            t = self.units[progress] / cps + self.pauses[progress]
+            if acc < t:
+                return progress, acc
+            acc -= t
+            progress += 1
+        return n, 0.0
+
+    def reveal_time(self, cps, mult=1.0, start=0, end=None):
+        """Exact seconds to reveal characters [start, end) at cps with a fast/auto multiplier."""
+        end = len(self.text) if end is None else end
+        units = self.cum_units[end] - self.cum_units[start]
+        pauses = self.cum_pauses[end] - self.cum_pauses[start]
+        return (units / cps + pauses) / mult
+
+    def progress_at(self, seconds, cps, mult=1.0):
+        """Characters visible `seconds` after the reveal started, assuming constant speed."""
+        # time to reveal the first k characters grows with k, so bisect on it
+        lo, hi = 0, len(self.text)
+        budget = seconds * mult
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.cum_units[mid] / cps + self.cum_pauses[mid] <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def next_reveal_in(self, progress, acc, cps, mult=1.0):
+        """Seconds until character `progress` appears, None once everything is shown."""
+        if progress >= len(self.text):
+            return None
+        return max(0.0, self.units[progress] / cps + self.pauses[progress] - acc) / mult
+
+PLAIN_STYLE = (False, False, WHITE)
+
+def parse_color(value):
+    if value in TEXT_COLORS:
+        return tuple(TEXT_COLORS[value])
+    return tuple(pygame.Color(value))[:3]
+
+def compile_script(text):
+    """Strip the inline tags from scene text, split it into styled runs and work out when each character appears."""
+    chars = []
+    units = []
+    pauses = []
+    runs = []
+    speeds = [1.0]
+    colors = [WHITE]
+    bold = italic = 0  # nesting depth
+    pending = 0.0  # pause owed to the next character
+
+    def emit(piece):
+        nonlocal pending
+        if not piece:
+            return
+        style = (bold > 0, italic > 0, colors[-1])
+        if runs and runs[-1][1] == len(chars) and runs[-1][2] == style:
+            runs[-1][1] += len(piece)
+        else:
+            runs.append([len(chars), len(chars) + len(piece), style])
+        for ch in piece:
+            if ch.isspace() and chars and chars[-1] in PUNCT_PAUSES:
+                pending += PUNCT_PAUSES[chars[-1]]
+            chars.append(ch)
+            units.append(1.0 / speeds[-1])
+            pauses.append(pending)
+            pending = 0.0
+
+    pos = 0
+    for m in TAG_RE.finditer(text):
+        emit(text[pos:m.start()])
+        pos = m.end()
+        closing, name, value = m.groups()
+        if m.group() == "{{":
+            emit("{")
+            continue
+        try:
+            if name == "speed" and not closing:
+                speeds.append(max(0.01, float(value)))
+            elif name == "speed":
+                if len(speeds) > 1:
+                    speeds.pop()
+            elif name == "pause" and not closing:
+                pending += max(0.0, float(value))
+            elif name == "b" and value is None:
+                bold = max(0, bold - 1) if closing else bold + 1
+            elif name == "i" and value is None:
+                italic = max(0, italic - 1) if closing else italic + 1
+            elif name == "color" and not closing:
+                colors.append(parse_color(value))
+            elif name == "color":
+                if len(colors) > 1:
+                    colors.pop()
+            else:
+                emit(m.group())
+        except (TypeError, ValueError):
+            emit(m.group())  # malformed value: show the tag so the author spots it
+    emit(text[pos:])
+    return RevealSchedule("".join(chars), units, pauses, [tuple(r) for r in runs])
+
+# ---------- Rich text layout ----------
+style_fonts = {(False, False): FONT}
+
+def style_font(bold, italic):
+    if (bold, italic) not in style_fonts:
+        style_fonts[(bold, italic)] = pygame.font.SysFont("consolas", 20, bold=bold, italic=italic)
+    return style_fonts[(bold, italic)]
+
+def char_advances(text, font):
+    """Horizontal advance of each character of text in font."""
+    advances = []
+    for ch, m in zip(text, font.metrics(text)):
+        advances.append(m[4] if m else font.size(ch)[0])
+    return advances
+
+class TextLine:
+    """One laid-out line: characters [start, end) of the script pre-rendered onto a surface."""
+    __slots__ = ("start", "end", "y", "xs", "surface")
+
+    def __init__(self, start, end, y, xs, surface):
+        self.start = start
+        self.end = end
+        self.y = y
+        self.xs = xs  # xs[k] is the pixel width of the line's first k characters
+        self.surface = surface
+
+class TextLayout:
+    """A compiled script wrapped to a width, with every line rendered once up front."""
+    def __init__(self, lines, height):
+        self.lines = lines
+        self.height = height
+
+    def draw(self, surface, pos, visible=None):
+        """Blit the lines at pos, cut off after `visible` characters (all of them by default)."""
+        x, y = pos
+        for line in self.lines:
+            if visible is not None and line.start >= visible:
+                break
+            if line.surface is None:
+                continue
+            if visible is None or line.end <= visible:
+                surface.blit(line.surface, (x, y + line.y))
+            else:
+                w = line.xs[visible - line.start]
+                surface.blit(line.surface, (x, y + line.y), (0, 0, w, line.surface.get_height()))
+
+def layout_script(script, width, line_spacing=4):
+    """Wrap a compiled script to width the way draw_wrapped_text does and render its lines."""
+    text = script.text
+    # per-character advance and style, from the pre-measured runs
+    advances = array("d")
+    style_at = []
+    for start, end, style in script.runs:
+        advances.extend(char_advances(text[start:end], style_font(style[0], style[1])))
+        style_at.extend([style] * (end - start))
+    line_h = FONT.get_height() + line_spacing
+
+    def render(start, end, y):
+        xs = array("d", accumulate(advances[start:end], initial=0.0))
+        if start == end:
+            return TextLine(start, end, y, xs, None)
+        surf = pygame.Surface((max(1, int(xs[-1] + 1)), line_h), pygame.SRCALPHA)
+        seg = start
+        for i in range(start + 1, end + 1):
+            if i == end or style_at[i] != style_at[seg]:
+                bold, italic, color = style_at[seg]
+                img = style_font(bold, italic).render(text[seg:i], True, color)
+                surf.blit(img, (int(xs[seg - start]), 0))
+                seg = i
+        return TextLine(start, end, y, xs, surf)
+
+    lines = []
+    y = 0
+    pos = 0
+    for paragraph in text.split("\n"):
+        para_end = pos + len(paragraph)
+        if paragraph.strip() == "":
+            pos = para_end + 1
+            y += line_h
+            continue
+        line_start = None  # first character of the line being filled
+        line_end = pos
+        i = pos
+        while i <= para_end:
+            j = text.find(" ", i, para_end)
+            j = para_end if j == -1 else j
+            if i < j:  # a word, i.e. not the gap between two spaces
+                if line_start is None:
+                    line_start = i
+                elif sum(advances[line_start:j]) > width:
+                    lines.append(render(line_start, line_end, y))
+                    y += line_h
+                    line_start = i
+                line_end = j
+            i = j + 1
+        if line_start is not None:
+            lines.append(render(line_start, line_end, y))
+            y += line_h
+        pos = para_end + 1
+    return TextLayout(lines, y)
 
 SCENES = {}
-def s(id, text, choices=None, bg=None, portrait=None, name=None):
-    SCENES[id] = Scene(id, text, choices, bg, portrait, name)
+def s(id, text, choices=None, bg=None, portrait=None, name=None, transition=None, music=None):
+    SCENES[id] = Scene(id, text, choices, bg, portrait, name, transition, music)
     return SCENES[id]
 
 # ---------- Convert your full story into scenes ----------
@@ -146,7 +442,7 @@ s("INTRO", INTRO_TEXT, [
     ("1. Investigate the anomaly yourself.", '1', "INVESTIGATE"),
     ("2. Tell Anna to investigate.", '2', "TELL_ANNA"),
     ("3. Ignore the anomaly for now.", '3', "IGNORE")
-], bg="bridge", portrait="anna", name="Anna")
+], bg="bridge", portrait="anna", name="Anna", music="ambient_loop")
 
 # Investigate branch
 s("INVESTIGATE",
@@ -298,37 +594,195 @@ def get_portrait(name):
         portrait_cache[name] = load_portrait(name) or None
     return portrait_cache[name]
 
-# Load music
-if MUSIC_FILE.exists():
-    try:
-        mixer.music.load(str(MUSIC_FILE))
-        mixer.music.set_volume(0.5)
-        mixer.music.play(-1)
-    except Exception as e:
-        print("Could not load music:", e)
+# Music
+MUSIC_EVENT = pygame.event.custom_type()  # posted by the loader thread when a track is decoded
 
-# Load typing sfx
-type_sfx = None
-if TYPE_SFX.exists():
+def find_music(name):
+    for ext in (".ogg", ".wav", ".mp3"):
+        p = MUSIC_DIR / (name + ext)
+        if p.exists():
+            return p
+    return None
+
+class Music:
+    """
+    Per-scene music. Tracks are decoded into Sounds on a loader thread, the
+    ones the current scene's choices lead to ahead of time, so a scene
+    change never waits on a file: a track that is not ready yet starts when
+    it arrives and the old one plays on until then. Changes crossfade on two
+    reserved mixer channels; SDL_mixer runs the fades, so nothing is done
+    per frame.
+    """
+    def __init__(self, fade=MUSIC_FADE, volume=MUSIC_VOLUME, keep=MUSIC_CACHE):
+        self.fade = fade
+        self.volume = volume
+        self.keep = keep
+        self.sounds = {}  # track -> Sound (None if it has no file or would not decode), least recently used first
+        self.loading = set()  # tracks queued for or being decoded
+        self.upcoming = []  # tracks of the scenes the current one leads to
+        self.wanted = None  # track the current scene asked for
+        self.wanted_at = 0.0
+        self.playing = None  # track on the active channel
+        mixer.set_reserved(2)  # typing sfx and other Sound.play calls never take these
+        self.channels = (mixer.Channel(0), mixer.Channel(1))
+        self.active = 0
+        self.todo = deque()  # tracks for the loader, most urgent first
+        self.done = deque()  # (track, Sound or None, ms) from the loader
+        self.cond = threading.Condition()
+        self.thread = None
+        # metrics
+        self.load_ms = {}  # track -> ms each decode of it took
+        self.waits = []  # ms from a scene asking for its track to the track starting; 0.0 when preloaded
+        self.preloaded = 0
+        self.late = 0
+
+    def request(self, name, urgent=False):
+        """Queue a track for the loader unless it is loaded or on its way; urgent ones jump the queue."""
+        with self.cond:
+            if name in self.loading:
+                if urgent and name in self.todo:
+                    self.todo.remove(name)
+                    self.todo.appendleft(name)
+                return
+            if name in self.sounds:
+                return
+            self.loading.add(name)
+            if urgent:
+                self.todo.appendleft(name)
+            else:
+                self.todo.append(name)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._load_loop, name="music-loader", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _load_loop(self):
+        while True:
+            with self.cond:
+                while not self.todo:
+                    self.cond.wait()
+                name = self.todo.popleft()
+            t0 = perf_counter()
+            path = find_music(name)
+            sound = None
+            if path:
+                try:
+                    sound = mixer.Sound(str(path))  # decoding releases the GIL
+                except Exception as e:
+                    print(f"Could not load music {name}:", e)
+            self.done.append((name, sound, (perf_counter() - t0) * 1000))
+            try:
+                pygame.event.post(pygame.event.Event(MUSIC_EVENT))
+            except pygame.error:
+                pass  # shutting down
+
+    def poll(self):
+        """Take in the tracks the loader has finished; the wanted one starts if it just arrived."""
+        while self.done:
+            name, sound, ms = self.done.popleft()
+            with self.cond:
+                self.loading.discard(name)
+            self.sounds[name] = sound
+            self.load_ms.setdefault(name, []).append(ms)
+            if name == self.wanted and self.playing != name:
+                self.late += 1
+                self.waits.append((perf_counter() - self.wanted_at) * 1000)
+                self._start(name)
+        self._evict()
+
+    def play(self, name):
+        """Change to the track a scene names: None keeps the one playing, "" fades to silence."""
+        if name is None or name == self.wanted:
+            return
+        self.wanted = name
+        self.wanted_at = perf_counter()
+        if not name:
+            self._start(None)
+        elif name in self.sounds:
+            self.sounds[name] = self.sounds.pop(name)  # now the most recently used
+            self.preloaded += 1
+            self.waits.append(0.0)
+            self._start(name)
+        else:
+            self.request(name, urgent=True)
+
+    def prefetch(self, names):
+        """Decode the tracks of the scenes that may come next, before they are asked for."""
+        self.upcoming = [name for name in names if name]
+        for name in self.upcoming:
+            self.request(name)
+        self._evict()
+
+    def _start(self, name):
+        ms = int(self.fade * 1000)
+        old = self.channels[self.active]
+        if old.get_busy():
+            if ms:
+                old.fadeout(ms)
+            else:
+                old.stop()
+        sound = self.sounds.get(name) if name else None
+        self.playing = name if sound else None
+        if sound:
+            self.active ^= 1
+            channel = self.channels[self.active]
+            channel.set_volume(self.volume)
+            channel.play(sound, loops=-1, fade_ms=ms)
+
+    def _evict(self):
+        # a fading-out channel keeps its own reference to the Sound, so dropping it here is safe
+        extra = len(self.sounds) - self.keep
+        if extra <= 0:
+            return
+        needed = {self.playing, self.wanted, *self.upcoming}
+        for name in [name for name in self.sounds if name not in needed][:extra]:
+            del self.sounds[name]
+
+    def forget_missing(self):
+        """Look tracks that had no file up again, in case they were just added."""
+        for name in [name for name, sound in self.sounds.items() if sound is None]:
+            del self.sounds[name]
+
+    def stats(self):
+        return {
+            "load_ms": {name: [round(ms, 2) for ms in times] for name, times in self.load_ms.items()},
+            "preloaded": self.preloaded,
+            "late": self.late,
+            "max_wait_ms": round(max(self.waits, default=0.0), 2),
+        }
+
+def upcoming_music(scene):
+    """The tracks of the scenes a scene's choices (or, at an ending, the restart) lead to."""
+    ids = [nid for _, _, nid in scene.choices] or ["INTRO"]
+    return [SCENES.get(nid, SCENES["NOT_FOUND"]).music for nid in ids]
+
+music = None  # the Music, made by start() once the mixer is open
+
+type_sfx = None  # typing sfx, loaded by start()
+
+def load_type_sfx():
+    if not TYPE_SFX.exists():
+        return None
     try:
-        type_sfx = mixer.Sound(str(TYPE_SFX))
-        type_sfx.set_volume(0.12)
+        sfx = mixer.Sound(str(TYPE_SFX))
+        sfx.set_volume(0.12)
+        return sfx
     except Exception as e:
         print("Could not load type sfx:", e)
+        return None
 
 # ---------- Typewriter / state ----------
 current_scene = SCENES["INTRO"]
-current_display_text = current_scene.text
+current_script = current_scene.script()
+current_display_text = current_script.text
 text_progress = 0  # characters visible
 chars_per_second = 45.0  # default speed; adjustable
 auto_mode = False
 fast_hold = False
 message_log = deque(maxlen=200)  # store fully shown scene texts
-last_letter_time = 0.0
-fade_alpha = 0
-fading = False
-fade_dir = 0  # 1 fade in, -1 fade out, 0 none
-fade_speed = 800.0  # alpha per second
+reveal_acc = 0.0  # seconds of reveal time not yet spent on a character
+text_done_at = None  # when the current text became fully visible
+transition = None  # the running Transition, if any
 
 # Build buttons for current scene
 def build_buttons_for_scene(scene):
@@ -348,34 +802,89 @@ def build_buttons_for_scene(scene):
         btns.append(Button(r, "Restart (1)", '1'))
     return btns
 
-buttons = build_buttons_for_scene(current_scene)
+mouse_pos = (0, 0)  # last known, read by start() and updated from MOUSEMOTION
+buttons = current_scene.buttons()
+
+# ---------- Scene transitions ----------
+fade_surf = pygame.Surface((WIDTH, HEIGHT))
+fade_surf.fill(BLACK)
 
-def start_fade(direction):
-    global fading, fade_dir, fade_alpha
-    fading = True
-    fade_dir = direction
-    fade_alpha = 0 if direction == 1 else 255
+def smoothstep(t):
+    return t * t * (3.0 - 2.0 * t)
+
+class Transition:
+    """
+    A scene change composited from two cached frames: the screen as it was
+    left and the new scene's first frame, snapshotted by draw_frame. While it
+    runs each frame only blends the two, the UI itself is not redrawn.
+    """
+    def __init__(self, kind, outgoing, duration=TRANSITION_TIME):
+        self.kind = kind
+        self.outgoing = outgoing
+        self.incoming = None
+        self.duration = duration
+        self.elapsed = 0.0
+
+    def done(self):
+        return self.elapsed >= self.duration
+
+    def draw(self, surface):
+        t = min(1.0, self.elapsed / self.duration)
+        w, h = surface.get_size()
+        if self.kind == "fade":
+            # through black: out over the first half, in over the second
+            surface.blit(self.outgoing if t < 0.5 else self.incoming, (0, 0))
+            fade_surf.set_alpha(int(255 * (1.0 - abs(2.0 * t - 1.0))))
+            surface.blit(fade_surf, (0, 0))
+        elif self.kind == "wipe":
+            x = int(w * smoothstep(t))
+            surface.blit(self.incoming, (0, 0), (0, 0, x, h))
+            surface.blit(self.outgoing, (x, 0), (x, 0, w - x, h))
+        elif self.kind == "slide":
+            x = int(w * smoothstep(t))
+            surface.blit(self.outgoing, (-x, 0))
+            surface.blit(self.incoming, (w - x, 0))
+        else:  # crossfade
+            surface.blit(self.outgoing, (0, 0))
+            self.incoming.set_alpha(int(255 * t))
+            surface.blit(self.incoming, (0, 0))
+
+def start_transition(kind):
+    """Begin a transition away from whatever is on screen now; "cut" switches instantly."""
+    global transition
+    transition = None if kind == "cut" else Transition(kind, screen.copy())
 
 def go_to_scene(scene_id):
-    global current_scene, current_display_text, text_progress, buttons, last_letter_time, fading
+    global current_scene, current_script, current_display_text, text_progress, buttons, reveal_acc, text_done_at
     target = SCENES.get(scene_id, SCENES["NOT_FOUND"])
     # push current visible (fully) text into log
-    message_log.append(current_scene.text)
+    message_log.append(current_display_text)
     # set scene
     current_scene = target
-    current_display_text = current_scene.text
+    current_script = current_scene.script()
+    current_display_text = current_script.text
     text_progress = 0
-    buttons = build_buttons_for_scene(current_scene)
-    last_letter_time = perf_counter()
-    # trigger fade in
-    start_fade(1)
-
-# initialize first scene
-go_to_scene("INTRO")
-
-# ---------- Fade overlay ----------
-fade_surf = pygame.Surface((WIDTH, HEIGHT))
-fade_surf.fill(BLACK)
+    buttons = current_scene.buttons()
+    for b in buttons:
+        b.set_hover(mouse_pos)  # the mouse may have moved since the scene was last shown
+    reveal_acc = 0.0
+    text_done_at = None
+    # blend over from the frame on screen (black at startup)
+    start_transition(target.transition or DEFAULT_TRANSITION)
+    music.play(target.music)
+    music.prefetch(upcoming_music(target))
+
+def start():
+    """Open the window and the mixer and enter the first scene; run() needs this done first."""
+    global screen, music, type_sfx, mouse_pos
+    pygame.init()
+    mixer.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Bastion One — Psychological Horror (VN Engine)")
+    music = Music()
+    type_sfx = load_type_sfx()
+    mouse_pos = pygame.mouse.get_pos()
+    go_to_scene("INTRO")
 
 # ---------- Helpers for UI ----------
 def draw_ui():
@@ -416,14 +925,13 @@ def draw_ui():
 
     # Draw visible text (typewriter)
     inner_rect = TEXT_BOX_RECT.inflate(-16, -16)
-    visible_text = current_display_text[:text_progress]
-    draw_wrapped_text(screen, visible_text, inner_rect, FONT, WHITE)
+    current_scene.layout(inner_rect.width).draw(screen, inner_rect.topleft, text_progress)
 
     # Choices area
     pygame.draw.rect(screen, GRAY, CHOICE_AREA_RECT, border_radius=10)
     pygame.draw.rect(screen, BLACK, CHOICE_AREA_RECT.inflate(-6, -6), border_radius=8)
     for b in buttons:
-        b.draw(screen, pygame.mouse.get_pos())
+        b.draw(screen)
 
     # Controls hint
     hint = "Space=Skip  A=Auto  Shift=Fast  +/- adjust speed  L=Log"
@@ -468,134 +976,288 @@ def draw_log():
     hint = FONT.render("Press L to close log", True, WHITE)
     screen.blit(hint, (inner.right - hint.get_width(), inner.bottom - 24))
 
-# ---------- Main loop ----------
-running = True
-last_time = perf_counter()
-while running:
-    dt = clock.tick(FPS) / 1000.0
-    now = perf_counter()
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-            break
-
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not log_open:
-            pos = event.pos
-            for b in buttons:
-                if b.is_clicked(pos):
-                    # find next_id by key
-                    next_id = None
-                    for label, key, nid in current_scene.choices:
-                        if key == b.key:
-                            next_id = nid
-                            break
-                    if not next_id and not current_scene.choices:
-                        next_id = "INTRO"
-                    if next_id:
-                        go_to_scene(next_id)
-                    break
-
-        if event.type == pygame.KEYDOWN:
-            # global toggles
-            if event.key == pygame.K_SPACE:
-                # Show full text
-                text_progress = len(current_display_text)
-            elif event.key == pygame.K_a:
-                auto_mode = not auto_mode
-            elif event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
-                fast_hold = True
-            elif event.key == pygame.K_l:
-                log_open = not log_open
-            elif event.key == pygame.K_PLUS or event.key == pygame.K_KP_PLUS:
-                chars_per_second = min(750, chars_per_second + 10)
-            elif event.key == pygame.K_MINUS or event.key == pygame.K_KP_MINUS:
-                chars_per_second = max(5, chars_per_second - 5)
-            else:
-                # choice keys '1','2','3'
-                keyname = pygame.key.name(event.key)
-                for label, key, nid in current_scene.choices:
-                    if keyname == key:
-                        go_to_scene(nid)
-                        break
-                # If no choices and press 1 => restart
-                if not current_scene.choices and keyname == '1':
-                    go_to_scene("INTRO")
-
-        if event.type == pygame.KEYUP:
-            if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
-                fast_hold = False
-
-    # Typewriter update
-    effective_speed = chars_per_second * (3.0 if fast_hold else 1.0)
-    if auto_mode:
-        effective_speed *= 1.6
+# ---------- Per-frame updates ----------
+def reveal_multiplier():
+    return (FAST_MULT if fast_hold else 1.0) * (AUTO_MULT if auto_mode else 1.0)
 
+def update_typewriter(dt, now):
+    global text_progress, reveal_acc, text_done_at
+    if transition:
+        return  # the new scene starts typing once it is fully on screen
     if text_progress < len(current_display_text):
-        # how many chars to reveal this frame
-        to_add = effective_speed * dt
-        if to_add < 1:
-            # accumulate fractional progress using time
-            # but for simplicity just add 1 char if enough time passed
-            last_letter_time += dt
-            if last_letter_time * effective_speed >= 1.0:
-                add = int(last_letter_time * effective_speed)
-                text_progress += add
-                last_letter_time = 0.0
-            # else nothing
-        else:
-            # add floor(to_add)
-            add = max(1, int(to_add))
-            text_progress += add
-        # play type sfx per letter if available
-        if type_sfx:
+        # fractional progress carries over between frames, so the rate is frame-rate independent
+        before = text_progress
+        text_progress, reveal_acc = current_script.advance(text_progress, reveal_acc + dt * reveal_multiplier(),
+                                                           chars_per_second)
+        # play type sfx when letters appeared, if available
+        if text_progress > before and type_sfx:
             try:
                 type_sfx.play()
             except Exception:
                 pass
+        return
+    if text_done_at is None:
+        text_done_at = now
+    # fully shown - auto mode advances after a pause
+    if auto_mode and now - text_done_at > AUTO_ADVANCE_DELAY:
+        # if there are choices, pick the first automatically
+        if current_scene.choices:
+            _, _, nid = current_scene.choices[0]
+            go_to_scene(nid)
+        else:
+            go_to_scene("INTRO")
+
+def update_transition(dt):
+    global transition
+    if transition:
+        transition.elapsed += dt
+        if transition.done():
+            transition = None
+
+def draw_frame():
+    if transition:
+        if transition.incoming is None:
+            # the new scene's first frame, drawn once and reused for the whole transition
+            draw_ui()
+            transition.incoming = screen.copy()
+        transition.draw(screen)
     else:
-        # fully shown - auto mode may advance after a pause
-        if auto_mode:
-            # after a short pause, auto-advance if there is exactly one choice (or none)
-            # We'll use a simple timer
-            if not hasattr(go_to_scene, "_auto_timer"):
-                go_to_scene._auto_timer = now
-            if now - go_to_scene._auto_timer > 1.0:
-                # if there are choices, pick the first automatically
-                if current_scene.choices:
-                    _, _, nid = current_scene.choices[0]
-                    go_to_scene(nid)
-                else:
-                    go_to_scene("INTRO")
-                go_to_scene._auto_timer = now
-        # reset letter timer
-        last_letter_time = 0.0
-
-    # Fade handling
-    if fading:
-        # fade in -> alpha decreases from 255 -> 0 (showing scene)
-        if fade_dir == 1:
-            fade_alpha -= fade_speed * dt
-            if fade_alpha <= 0:
-                fade_alpha = 0
-                fading = False
-        elif fade_dir == -1:
-            fade_alpha += fade_speed * dt
-            if fade_alpha >= 255:
-                fade_alpha = 255
-                fading = False
-
-    # Draw UI
-    draw_ui()
+        draw_ui()
     if log_open:
         draw_log()
 
-    # draw fade overlay if needed (fade alpha 0..255)
-    if fade_alpha > 0:
-        fade_surf.set_alpha(int(fade_alpha))
-        screen.blit(fade_surf, (0,0))
+def next_timer(now):
+    """
+    Seconds until the screen next changes on its own: 0 while a transition runs or
+    the next letter is due within a frame, the time until the next letter or
+    auto-advance, or None when only input can change anything.
+    """
+    if transition:
+        return 0.0
+    if text_progress < len(current_display_text):
+        wait = current_script.next_reveal_in(text_progress, reveal_acc, chars_per_second, reveal_multiplier())
+        # frames that would reveal nothing new are skipped
+        return wait if wait > 1.0 / FPS else 0.0
+    if auto_mode:
+        if text_done_at is None:
+            return 0.0  # the next update stamps the text as done
+        return max(0.0, text_done_at + AUTO_ADVANCE_DELAY - now)
+    return None
 
-    pygame.display.flip()
+# ---------- Script hot reload ----------
+# With --watch the story (the top-level s(...) calls in this file and the
+# string constants they use) is re-read when the file changes. Only scenes
+# whose definition differs are patched, in place, so the current scene keeps
+# its typewriter position.
+STORY_FILE = Path(__file__)
+RELOAD_EVENT = pygame.event.custom_type()
+RELOAD_INTERVAL = 500  # ms between checks of STORY_FILE
+story_mtime = None  # while watching: STORY_FILE's mtime at the last reload
+story_ids = set()  # scenes the file defined at the last reload
+
+def is_story_statement(node):
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+        return isinstance(node.value.func, ast.Name) and node.value.func.id == "s"
+    return isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+def read_story(path=None):
+    """The scenes a script defines, as {id: Scene}, without running anything else in it or touching SCENES."""
+    path = path or STORY_FILE
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"), str(path))
+    body = [node for node in tree.body if is_story_statement(node)]
+    scenes = {}
+    def collect(id, text, choices=None, bg=None, portrait=None, name=None, transition=None, music=None):
+        scenes[id] = Scene(id, text, choices, bg, portrait, name, transition, music)
+        return scenes[id]
+    exec(compile(ast.Module(body=body, type_ignores=[]), str(path), "exec"), {"s": collect})
+    return scenes
+
+def prune_asset_caches():
+    # unused images go, and missing ones are looked up again in case they were just added
+    for cache, attr in ((bg_cache, "bg"), (portrait_cache, "portrait")):
+        used = {getattr(sc, attr) for sc in SCENES.values()}
+        for name in [name for name, img in cache.items() if img is None or name not in used]:
+            del cache[name]
+    music.forget_missing()
+
+def reload_story(path=None):
+    """Patch SCENES from the script on disk; returns the ids of the scenes that changed."""
+    global story_ids, current_script, current_display_text, text_progress, buttons, text_done_at
+    new = read_story(path)
+    changed = []
+    for sid, scene in new.items():
+        old = SCENES.get(sid)
+        if old is None:
+            SCENES[sid] = scene
+            changed.append(sid)
+        elif old.definition() != scene.definition():
+            old.redefine(scene)
+            changed.append(sid)
+    # scenes deleted from the file; the fallback and the one on screen stay
+    for sid in story_ids - new.keys() - {"NOT_FOUND", current_scene.id}:
+        SCENES.pop(sid, None)
+        changed.append(sid)
+    story_ids = set(new)
+    prune_asset_caches()
+    if current_scene.id in changed:
+        current_script = current_scene.script()
+        current_display_text = current_script.text
+        text_progress = min(text_progress, len(current_display_text))
+        if text_progress < len(current_display_text):
+            text_done_at = None
+        buttons = current_scene.buttons()
+        for b in buttons:
+            b.set_hover(mouse_pos)
+        music.play(current_scene.music)
+    # a changed scene may lead somewhere new, or name a different track
+    music.prefetch(upcoming_music(current_scene))
+    return changed
+
+def watch_story():
+    """Start checking STORY_FILE for changes every RELOAD_INTERVAL."""
+    global story_mtime, story_ids
+    story_mtime = STORY_FILE.stat().st_mtime
+    story_ids = set(read_story())
+    pygame.time.set_timer(RELOAD_EVENT, RELOAD_INTERVAL)
+
+def check_story():
+    """Reload the story if its file changed; True if anything on screen may differ."""
+    global story_mtime
+    try:
+        mtime = STORY_FILE.stat().st_mtime
+    except OSError:
+        return False
+    if mtime == story_mtime:
+        return False
+    story_mtime = mtime
+    t0 = perf_counter()
+    try:
+        changed = reload_story()
+    except Exception as e:
+        # a half-finished edit; keep the scenes we have until the next save
+        print("Could not reload story:", e)
+        return False
+    if changed:
+        print(f"Reloaded {', '.join(changed)} in {(perf_counter() - t0) * 1000:.1f} ms")
+    return bool(changed)
+
+# ---------- Main loop ----------
+def run(idle=True):
+    """Run the VN until the window is closed. With idle, settled screens sleep instead of redrawing at FPS."""
+    global text_progress, auto_mode, fast_hold, log_open, chars_per_second, mouse_pos
+    running = True
+    while running:
+        wait = next_timer(perf_counter()) if idle else 0.0
+        redraw = wait == 0.0
+        if wait == 0.0:
+            dt = clock.tick(FPS) / 1000.0
+            events = pygame.event.get()
+        else:
+            # nothing changes before the next timer: block until it or input, then draw one frame
+            first = pygame.event.wait(0 if wait is None else max(1, int(wait * 1000)))
+            events = pygame.event.get()
+            if first.type != pygame.NOEVENT:
+                events.insert(0, first)
+            else:
+                redraw = True  # woken by the timer
+            # the sleep counts towards the timer we waited for, never past it
+            slept = clock.tick() / 1000.0
+            dt = 0.0 if wait is None else min(slept, wait)
+        now = perf_counter()
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+                break
+
+            if event.type == pygame.MOUSEMOTION:
+                mouse_pos = event.pos
+                for b in buttons:
+                    # a move that changes no button leaves the idle screen as it is
+                    if b.set_hover(mouse_pos):
+                        redraw = True
+            elif event.type == RELOAD_EVENT:
+                if check_story():
+                    redraw = True
+            elif event.type == MUSIC_EVENT:
+                music.poll()  # nothing on screen changes
+            else:
+                redraw = True
+
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not log_open:
+                pos = event.pos
+                for b in buttons:
+                    if b.is_clicked(pos):
+                        # find next_id by key
+                        next_id = None
+                        for label, key, nid in current_scene.choices:
+                            if key == b.key:
+                                next_id = nid
+                                break
+                        if not next_id and not current_scene.choices:
+                            next_id = "INTRO"
+                        if next_id:
+                            go_to_scene(next_id)
+                        break
 
-pygame.quit()
-sys.exit()
+            if event.type == pygame.KEYDOWN:
+                # global toggles
+                if event.key == pygame.K_SPACE:
+                    # Show full text
+                    text_progress = len(current_display_text)
+                elif event.key == pygame.K_a:
+                    auto_mode = not auto_mode
+                elif event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
+                    fast_hold = True
+                elif event.key == pygame.K_l:
+                    log_open = not log_open
+                elif event.key == pygame.K_PLUS or event.key == pygame.K_KP_PLUS:
+                    chars_per_second = min(750, chars_per_second + 10)
+                elif event.key == pygame.K_MINUS or event.key == pygame.K_KP_MINUS:
+                    chars_per_second = max(5, chars_per_second - 5)
+                else:
+                    # choice keys '1','2','3'
+                    keyname = pygame.key.name(event.key)
+                    for label, key, nid in current_scene.choices:
+                        if keyname == key:
+                            go_to_scene(nid)
+                            break
+                    # If no choices and press 1 => restart
+                    if not current_scene.choices and keyname == '1':
+                        go_to_scene("INTRO")
+
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
+                    fast_hold = False
+
+        shown = (current_scene, text_progress)
+        update_typewriter(dt, now)
+        update_transition(dt)
+        if redraw or shown != (current_scene, text_progress):
+            draw_frame()
+            pygame.display.flip()
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Bastion One VN")
+    parser.add_argument("--watch", action="store_true", help="reload edited scenes while running")
+    parser.add_argument("--music-fade", type=float, default=MUSIC_FADE, metavar="SECONDS",
+                        help="crossfade time between scene tracks (0 cuts)")
+    parser.add_argument("--music-stats", action="store_true", help="print track load times on exit")
+    args = parser.parse_args()
+    start()
+    music.fade = max(0.0, args.music_fade)
+    if args.watch:
+        watch_story()
+    run()
+    if args.music_stats:
+        stats = music.stats()
+        for name, times in stats["load_ms"].items():
+            print(f"{name}: loaded {len(times)}x, {max(times):.1f} ms at most")
+        print(f"{stats['preloaded']} track changes preloaded, {stats['late']} late "
+              f"(waited {stats['max_wait_ms']:.1f} ms at most)")
+    pygame.quit()
+    sys.exit()
+
+if __name__ == "__main__":
+    main()
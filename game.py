@@ -3,6 +3,19 @@ import pygame
 import sys
 import math
 import random
+import os
+import json
+import queue
+import threading
+import mmap
+import struct
+import time
+import zlib
+import heapq
+import copy
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import starmap
 
 pygame.init()
 WIDTH, HEIGHT = 960, 640
@@ -10,6 +23,8 @@ SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Terraria-like Platformer - Patched")
 CLOCK = pygame.time.Clock()
 FONT = pygame.font.SysFont("consolas", 20)
+HELP_LINES = ("Arrows/A-D move • Space jump • Shift dash • F fire • W/S climb",
+              "E/Q dig/place • L light • P pause • H hitboxes")
 
 # ----- CONFIG -----
 GRAVITY = 0.35
@@ -22,6 +37,53 @@ DASH_SPEED = 8.0
 DASH_DURATION = 200  # ms
 DASH_COOLDOWN = 300  # ms
 WALL_SLIDE_FRICTION = 0.15
+CHUNK_SIZE = 1024  # px, square streaming regions
+CHUNK_LOAD_MARGIN = 1024  # px around the view kept resident
+CHUNK_UNLOAD_MARGIN = 2048  # chunks further than this are dropped (hysteresis)
+SCHED_CELL = 512  # px, spatial buckets of the update scheduler
+SCHED_NEAR = 1200  # px from the player: entities tick every frame
+SCHED_FAR = 3000  # px: entities tick every SCHED_FAR_INTERVAL frames, beyond that they sleep
+SCHED_FAR_INTERVAL = 4
+SCHED_MAX_CATCHUP = 100  # ms, most time a waking entity is advanced by at once
+TERRAIN_COLUMN = 8  # px between pre-sampled terrain heights
+TERRAIN_STICK = 8  # px a grounded player follows the terrain down instead of hopping off
+PICKUP_CELL = 256  # px, spatial buckets of the pickup index
+PROJECTILE_POOL = 4096  # bullets alive at once; a shot into a full pool is dropped
+PROJECTILE_CELL = 128  # px, buckets of the projectile broadphase
+PROJECTILE_SPEED = 14.0  # px per 60 Hz frame
+PROJECTILE_MAX_SPEED = 16.0
+PROJECTILE_MAX_DT = 50  # ms, longer ticks move bullets no further than this
+PROJECTILE_REACH = math.ceil(PROJECTILE_MAX_SPEED * PROJECTILE_MAX_DT / 16.67)  # px, longest move in one tick
+PROJECTILE_LIFE = 1200  # ms
+NAV_SPEED = 2.5  # px per 60 Hz frame a chasing enemy runs
+NAV_CLIMB = 2.0  # px per frame up or down a ladder
+NAV_CELL = 256  # px, buckets of the navigation graph's surfaces and solids
+NAV_STEP_UP = 8  # px, height difference walked over where two surfaces meet
+NAV_JUMP_EVERY = 96  # px between jump take-off points along a surface
+NAV_MAX_FRAMES = 150  # longest jump or fall that is simulated
+NAV_MAX_EXPAND = 4000  # nodes one A* search may visit
+NAV_SEARCHES_PER_TICK = 8  # queued path searches run per tick; the rest wait
+NAV_RELINKS_PER_TICK = 2  # moving platforms whose edges are redone per tick
+NAV_LINK_FRAMES = 400  # jump and fall frames simulated per tick linking surfaces after a chunk came or went
+NAV_SHIFT = 24  # px a moving platform moves before its edges are redone
+NAV_CACHE_SIZE = 4096  # cached paths
+NAV_RETRY = 60  # ticks before a search that found no path is tried again
+NAV_CHASE_RANGE = 640  # px, a player this close is chased
+NAV_LEASH = 1000  # px from home an enemy chases before it gives up
+TILE_SIZE = 16  # px
+TILE_CHUNK = 32  # tiles per side of a tile chunk, the unit of storage, redraw and saving
+LIGHT_TEXEL = 8  # world px per light map texel
+LANTERN_RADIUS = 280  # px, the light each player carries
+PICKUP_LIGHT_RADIUS = 96  # px
+PROJECTILE_LIGHT_RADIUS = 48  # px
+LIGHT_MAX_BULLETS = 64  # bullet glows drawn per frame; further bullets in view go unlit
+LIGHT_CACHE_CELLS = 512  # pickup glow cells kept pre-summed
+LIGHT_CELL = 512  # px, buckets of the shadow caster index
+RENDER_SCALES = (0.5, 0.625, 0.75, 0.875, 1.0)  # internal resolutions the auto scaler steps between
+RENDER_TARGET_FPS = 60
+RENDER_HEADROOM = 0.9  # scale down once frames take more than this share of the budget
+RENDER_RAISE = 0.75  # scale up only if the bigger size is predicted to stay under this share
+RENDER_COOLDOWN = 30  # frames between two scale changes
 
 # Colors
 BG = (10, 20, 30)
@@ -32,7 +94,14 @@ SLOPE_COL = (120, 100, 70)
 LADDER_COL = (140, 100, 60)
 ENEMY_COL = (200, 80, 80)
 COIN_COL = (230, 190, 40)
+GEM_COL = (90, 200, 230)
+HEART_COL = (230, 80, 120)
+PROJECTILE_COL = (250, 240, 150)
+TILE_COLORS = {1: (120, 85, 55), 2: (105, 105, 115), 3: (80, 150, 70)}  # tile id -> colour
+TILE_KEY_COL = (255, 0, 255)  # colour key of pre-drawn tile chunks, where the air is
 UI_COL = (220, 220, 220)
+LIGHT_AMBIENT = (28, 26, 40)  # what the dark leaves visible
+LANTERN_COL = (255, 225, 170)
 
 # ----- UTILS -----
 def clamp(v, a, b):
@@ -45,39 +114,67 @@ class Camera:
         self.y = 0
         self.w = w
         self.h = h
+        self.scale = 1.0  # screen pixels per world pixel; below 1 when drawing at a reduced resolution
 
     def apply(self, rect):
-        return pygame.Rect(rect.x - self.x, rect.y - self.y, rect.width, rect.height)
+        s = self.scale
+        if s == 1.0:
+            return pygame.Rect(rect.x - self.x, rect.y - self.y, rect.width, rect.height)
+        # scale both edges so rects that touch in the world still touch on screen
+        left = math.floor((rect.x - self.x) * s)
+        top = math.floor((rect.y - self.y) * s)
+        return pygame.Rect(left, top, math.floor((rect.right - self.x) * s) - left,
+                           math.floor((rect.bottom - self.y) * s) - top)
+
+    def to_screen(self, x, y):
+        s = self.scale
+        return (x - self.x) * s, (y - self.y) * s
+
+    def scaled(self, n):
+        """A size of n world pixels on screen, at least 1."""
+        return n if self.scale == 1.0 else max(1, int(n * self.scale))
 
     def update(self, target_rect):
         # center target with lerp
-        target_x = clamp(target_rect.centerx - WIDTH // 2, 0, WORLD_WIDTH - WIDTH)
-        target_y = clamp(target_rect.centery - HEIGHT // 2, 0, WORLD_HEIGHT - HEIGHT)
+        target_x = clamp(target_rect.centerx - WIDTH // 2, 0, self.w - WIDTH)
+        target_y = clamp(target_rect.centery - HEIGHT // 2, 0, self.h - HEIGHT)
         self.x += (target_x - self.x) * CAMERA_LERP
         self.y += (target_y - self.y) * CAMERA_LERP
 
 # ----- GAME OBJECTS -----
+# Entities use __slots__ and update their vectors in place: big worlds hold
+# hundreds of thousands of them and the hot paths run every frame.
+ZERO_VEC = pygame.Vector2(0, 0)  # shared, never mutate
+
 class Platform:
+    __slots__ = ("rect",)
+    color = PLAT_COL
+    movable = False
+    delta = ZERO_VEC  # static platforms never carry the player
+
     def __init__(self, x, y, w, h):
         self.rect = pygame.Rect(x, y, w, h)
-        self.color = PLAT_COL
-        self.movable = False
-        self.delta = pygame.Vector2(0, 0)
 
     def update(self, dt):
-        self.delta = pygame.Vector2(0, 0)
+        pass
+
+    def blocks(self, x1, y1, x2, y2):
+        """Whether the segment (a projectile's move) runs into this solid."""
+        return bool(self.rect.clipline(x1, y1, x2, y2))
 
     def draw(self, surf, cam):
         r = cam.apply(self.rect)
         pygame.draw.rect(surf, self.color, r)
 
 class MovingPlatform(Platform):
+    __slots__ = ("path", "speed", "pos", "_idx", "delta", "prev_pos")
+    color = MOVPLAT_COL
+    movable = True
+
     def __init__(self, x, y, w, h, path, speed=1.2):
         super().__init__(x, y, w, h)
         self.path = path  # list of (x,y)
         self.speed = speed
-        self.color = MOVPLAT_COL
-        self.movable = True
         self.pos = pygame.Vector2(x, y)
         self._idx = 0
         self.delta = pygame.Vector2(0, 0)
@@ -86,35 +183,42 @@ class MovingPlatform(Platform):
     def update(self, dt):
         # normalize dt to ~60fps scale (16.67 ms)
         dtf = dt / 16.67
-        self.prev_pos = pygame.Vector2(self.pos)
+        pos = self.pos
+        self.prev_pos.update(pos)
         if len(self.path) < 2:
-            self.delta = pygame.Vector2(0, 0)
+            self.delta.update(0, 0)
             return
-        target = pygame.Vector2(self.path[self._idx])
-        direction = target - self.pos
-        dist = direction.length()
+        tx, ty = self.path[self._idx]
+        dx = tx - pos.x
+        dy = ty - pos.y
+        dist = math.sqrt(dx * dx + dy * dy)
         if dist < 1:
             self._idx = (self._idx + 1) % len(self.path)
-            target = pygame.Vector2(self.path[self._idx])
-            direction = target - self.pos
-            dist = direction.length()
+            tx, ty = self.path[self._idx]
+            dx = tx - pos.x
+            dy = ty - pos.y
+            dist = math.sqrt(dx * dx + dy * dy)
             if dist == 0:
-                self.delta = pygame.Vector2(0, 0)
+                self.delta.update(0, 0)
                 return
-        direction = direction.normalize()
-        self.pos += direction * self.speed * dtf
-        self.rect.topleft = (round(self.pos.x), round(self.pos.y))
-        self.delta = self.pos - self.prev_pos
+        # never overshoot the waypoint, even on a long (catch-up) tick
+        step = min(self.speed * dtf, dist) / dist
+        pos.x += dx * step
+        pos.y += dy * step
+        self.rect.topleft = (round(pos.x), round(pos.y))
+        self.delta.update(pos.x - self.prev_pos.x, pos.y - self.prev_pos.y)
 
 class Slope:
     """
     Basic slope represented as a right triangle.
     slope_type: 'left' (up to left) or 'right' (up to right)
     """
+    __slots__ = ("rect", "type", "p1", "p2", "m", "b")
+    color = SLOPE_COL
+
     def __init__(self, x, y, w, h, slope_type='right'):
         self.rect = pygame.Rect(x, y, w, h)
         self.type = slope_type
-        self.color = SLOPE_COL
         if self.type == 'right':
             p1 = (x, y + h)
             p2 = (x + w, y)
@@ -131,6 +235,14 @@ class Slope:
     def get_y_at(self, world_x):
         return self.m * world_x + self.b
 
+    def blocks(self, x1, y1, x2, y2):
+        clip = self.rect.clipline(x1, y1, x2, y2)
+        if not clip:
+            return False
+        # the surface is a straight line: the segment crosses it iff an end is below it
+        (ax, ay), (bx, by) = clip
+        return ay >= self.get_y_at(ax) or by >= self.get_y_at(bx)
+
     def draw(self, surf, cam):
         r = cam.apply(self.rect)
         if self.type == 'right':
@@ -147,31 +259,120 @@ class Slope:
             ]
         pygame.draw.polygon(surf, self.color, points)
 
+def polyline_y(xs, ys, x):
+    """Height of the polyline (xs ascending) at x, flat past either end."""
+    i = bisect_right(xs, x)
+    if i == 0:
+        return ys[0]
+    if i == len(xs):
+        return ys[-1]
+    span = xs[i] - xs[i - 1]
+    if span == 0:
+        return ys[i]
+    return ys[i - 1] + (ys[i] - ys[i - 1]) * (x - xs[i - 1]) / span
+
+class Terrain:
+    """
+    Hilly ground as one polyline of surface points (x ascending); everything
+    below the line is solid. The vertices live in flat arrays and the surface
+    height is pre-sampled every TERRAIN_COLUMN px, so a ground query is one
+    table lookup however many segments the terrain has, and a whole stretch
+    of hills replaces what would otherwise be hundreds of Slopes.
+    """
+    __slots__ = ("xs", "ys", "column", "heights", "rect")
+    color = SLOPE_COL
+
+    def __init__(self, points, column=TERRAIN_COLUMN):
+        if len(points) < 2:
+            raise ValueError("terrain needs at least two points")
+        self.xs = xs = array("d", (p[0] for p in points))
+        self.ys = ys = array("d", (p[1] for p in points))
+        self.column = column
+        n = int((xs[-1] - xs[0]) // column) + 2
+        self.heights = array("d", (polyline_y(xs, ys, xs[0] + i * column) for i in range(n)))
+        top = min(ys)
+        self.rect = pygame.Rect(int(xs[0]), int(top), max(1, int(xs[-1] - xs[0])), max(1, int(max(ys) - top)))
+
+    def points(self):
+        return list(zip(self.xs, self.ys))
+
+    def height_at(self, world_x):
+        """Surface y at world_x, O(1) from the column table."""
+        h = self.heights
+        f = (world_x - self.xs[0]) / self.column
+        if f <= 0:
+            return h[0]
+        i = int(f)
+        if i >= len(h) - 1:
+            return h[-1]
+        a = h[i]
+        return a + (h[i + 1] - a) * (f - i)
+
+    def blocks(self, x1, y1, x2, y2):
+        # a move is at most PROJECTILE_REACH long: testing where it ends is enough
+        return self.rect.left <= x2 <= self.rect.right and y2 >= self.height_at(x2)
+
+    def draw(self, surf, cam):
+        # one polygon for the visible span: surface vertices down to the screen bottom
+        xs, ys = self.xs, self.ys
+        sw, sh = surf.get_size()
+        to_screen = cam.to_screen
+        left = max(xs[0], cam.x)
+        right = min(xs[-1], cam.x + sw / cam.scale)
+        if left >= right or to_screen(0, self.rect.top)[1] >= sh:
+            return
+        points = [(to_screen(left, 0)[0], sh), to_screen(left, self.height_at(left))]
+        points.extend(to_screen(xs[i], ys[i]) for i in range(bisect_right(xs, left), bisect_left(xs, right)))
+        points.append(to_screen(right, self.height_at(right)))
+        points.append((to_screen(right, 0)[0], sh))
+        pygame.draw.polygon(surf, self.color, points)
+
 class Ladder:
+    __slots__ = ("rect",)
+    color = LADDER_COL
+
     def __init__(self, x, y, w, h):
         self.rect = pygame.Rect(x, y, w, h)
-        self.color = LADDER_COL
 
     def draw(self, surf, cam):
         r = cam.apply(self.rect)
         pygame.draw.rect(surf, self.color, r)
         rung_count = max(2, self.rect.height // 40)
+        inset = cam.scaled(6)
         for i in range(rung_count):
             ry = r.top + (i+1) * (r.height / (rung_count + 1))
-            pygame.draw.line(surf, (100, 80, 50), (r.left+6, ry), (r.right-6, ry), 2)
+            pygame.draw.line(surf, (100, 80, 50), (r.left+inset, ry), (r.right-inset, ry), cam.scaled(2))
 
 class Enemy:
+    __slots__ = ("rect", "start_x", "start_y", "patrol", "speed", "dir", "alive", "health", "ground",
+                 "nav", "chasing", "node", "home", "goal", "path", "edge", "step")
+    color = ENEMY_COL
+
     def __init__(self, x, y, w=36, h=36, patrol=(0, 120), speed=1.0):
         self.rect = pygame.Rect(x, y, w, h)
         self.start_x = x
+        self.start_y = y
         self.patrol = patrol  # (left_offset, right_offset)
         self.speed = speed
         self.dir = 1
-        self.color = ENEMY_COL
         self.alive = True
         self.health = 1
+        self.ground = None  # Terrain under the patrol, set by World.index_entities
+        self.nav = None  # the world's Navigator, when enemies chase
+        self.forget_path()
+
+    def forget_path(self):
+        self.chasing = False
+        self.node = None  # NavNode stood on while chasing or going home
+        self.home = None  # NavNode of the patrol, found when first needed
+        self.goal = None  # NavNode the path leads to
+        self.path = None  # remaining NavEdges; [] when there is none, None while not known
+        self.edge = None  # NavEdge being jumped, fallen or climbed along
+        self.step = 0.0  # frames into edge
 
     def update(self, dt):
+        if self.nav is not None and self.nav.steer(self, dt):
+            return
         # normalize dt to ~60fps
         dtf = dt / 16.67
         # move horizontally using dtf scalar
@@ -186,16 +387,26 @@ class Enemy:
         elif self.rect.x > self.start_x + self.patrol[1]:
             self.rect.x = self.start_x + self.patrol[1]
             self.dir *= -1
+        if self.ground is not None:
+            # walk over the terrain, never below the floor the patrol started on
+            bottom = self.start_y + self.rect.height
+            x = self.rect.centerx
+            if self.ground.rect.left <= x <= self.ground.rect.right:
+                bottom = min(bottom, math.ceil(self.ground.height_at(x)))
+            self.rect.bottom = bottom
 
     def draw(self, surf, cam):
         r = cam.apply(self.rect)
         pygame.draw.rect(surf, self.color, r)
         eye_w = max(2, r.width // 6)
-        pygame.draw.rect(surf, (20,20,20), (r.x+6, r.y+8, eye_w, eye_w))
-        pygame.draw.rect(surf, (20,20,20), (r.x+ r.width-12, r.y+8, eye_w, eye_w))
+        eye_y = r.y + cam.scaled(8)
+        pygame.draw.rect(surf, (20,20,20), (r.x+cam.scaled(6), eye_y, eye_w, eye_w))
+        pygame.draw.rect(surf, (20,20,20), (r.x+ r.width-cam.scaled(12), eye_y, eye_w, eye_w))
 
 class Particle:
     """Simple particle system for dust, sparks, etc."""
+    __slots__ = ("pos", "vel", "lifetime", "max_lifetime", "color", "radius")
+
     def __init__(self, x, y, vx, vy, lifetime, color, radius=3):
         self.pos = pygame.Vector2(x, y)
         self.vel = pygame.Vector2(vx, vy)
@@ -205,28 +416,39 @@ class Particle:
         self.radius = radius
 
     def update(self, dt):
-        self.pos += self.vel * (dt / 16.67)
-        self.vel.y += GRAVITY * (dt / 16.67)
+        dtf = dt / 16.67
+        pos = self.pos
+        vel = self.vel
+        pos.x += vel.x * dtf
+        pos.y += vel.y * dtf
+        vel.y += GRAVITY * dtf
         self.lifetime -= dt
 
     def draw(self, surf, cam):
         if self.lifetime <= 0:
             return
         alpha = int(255 * (self.lifetime / self.max_lifetime))
-        sx = self.pos.x - cam.x
-        sy = self.pos.y - cam.y
+        sx, sy = cam.to_screen(self.pos.x, self.pos.y)
         color = tuple(min(255, int(c * (alpha / 255))) for c in self.color)
-        pygame.draw.circle(surf, color, (int(sx), int(sy)), max(1, self.radius))
+        pygame.draw.circle(surf, color, (int(sx), int(sy)), cam.scaled(max(1, self.radius)))
 
     def is_alive(self):
         return self.lifetime > 0
 
 class Coin:
+    """Collectible; kind picks the Game callback that runs when it is picked up."""
+    __slots__ = ("pos", "radius", "collected", "bob_phase", "cell", "slot")
+    kind = "coin"
+    value = 1
+    color = COIN_COL
+
     def __init__(self, x, y, radius=10):
         self.pos = pygame.Vector2(x, y)
         self.radius = radius
         self.collected = False
         self.bob_phase = random.random() * math.pi * 2
+        self.cell = None  # PickupIndex cell and position in it while uncollected
+        self.slot = 0
 
     def update(self, dt):
         self.bob_phase += dt * 0.01
@@ -234,13 +456,307 @@ class Coin:
     def draw(self, surf, cam):
         if self.collected:
             return
-        sx = self.pos.x - cam.x
-        sy = self.pos.y - cam.y + math.sin(self.bob_phase) * 6
-        pygame.draw.circle(surf, COIN_COL, (int(sx), int(sy)), self.radius)
-        pygame.draw.circle(surf, (255,255,200), (int(sx-3), int(sy-4)), max(2, self.radius//3))
+        sx, sy = cam.to_screen(self.pos.x, self.pos.y + math.sin(self.bob_phase) * 6)
+        radius = cam.scaled(self.radius)
+        pygame.draw.circle(surf, self.color, (int(sx), int(sy)), radius)
+        pygame.draw.circle(surf, (255,255,200), (int(sx-cam.scaled(3)), int(sy-cam.scaled(4))), max(2, radius//3))
+
+class Gem(Coin):
+    __slots__ = ()
+    kind = "gem"
+    value = 5
+    color = GEM_COL
+
+class Heart(Coin):
+    __slots__ = ()
+    kind = "heart"
+    value = 0
+    color = HEART_COL
+
+PICKUP_TYPES = {cls.kind: cls for cls in (Coin, Gem, Heart)}
+PICKUP_KINDS = tuple(PICKUP_TYPES)  # position is the kind's index on disk
+
+# ----- PICKUPS -----
+class PickupIndex:
+    """
+    Uncollected pickups bucketed into PICKUP_CELL cells. Every pickup knows
+    its cell and its position in it, so collecting one is a swap-remove, and
+    pickup tests, animation and drawing only visit the cells they cover:
+    pickups far from the player cost nothing.
+    """
+    def __init__(self):
+        self.cells = {}  # (cx, cy) -> list of pickups
+        self.count = 0
+
+    def rebuild(self, pickups):
+        self.cells = {}
+        self.count = 0
+        for p in pickups:
+            if not p.collected:
+                self.add(p)
+
+    def add(self, p):
+        key = (int(p.pos.x // PICKUP_CELL), int(p.pos.y // PICKUP_CELL))
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = []
+        p.cell = key
+        p.slot = len(cell)
+        cell.append(p)
+        self.count += 1
+
+    def remove(self, p):
+        cell = self.cells[p.cell]
+        last = cell.pop()
+        if last is not p:
+            cell[p.slot] = last
+            last.slot = p.slot
+        elif not cell:
+            del self.cells[p.cell]
+        p.cell = None
+        self.count -= 1
+
+    def _cells_in(self, left, top, right, bottom):
+        cells = self.cells
+        for cx in range(int(left // PICKUP_CELL), int(right // PICKUP_CELL) + 1):
+            for cy in range(int(top // PICKUP_CELL), int(bottom // PICKUP_CELL) + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    yield cell
+
+    def collect(self, rect):
+        """Mark the pickups inside rect collected, drop them from the index and return them."""
+        got = []
+        for cell in self._cells_in(rect.left, rect.top, rect.right - 1, rect.bottom - 1):
+            # backwards, so the swap-remove only moves already tested pickups
+            for i in range(len(cell) - 1, -1, -1):
+                p = cell[i]
+                if rect.collidepoint(p.pos.x, p.pos.y):
+                    p.collected = True
+                    self.remove(p)
+                    got.append(p)
+        return got
+
+    def update(self, dt, area=None):
+        """Animate pickups in area (left, top, right, bottom), or all of them."""
+        cells = self.cells.values() if area is None else self._cells_in(*area)
+        for cell in cells:
+            for p in cell:
+                p.update(dt)
+
+    def draw(self, surf, cam):
+        # margin covers the radius and bob of a pickup just outside the view
+        margin = 32
+        w, h = surf.get_size()
+        w /= cam.scale
+        h /= cam.scale
+        for cell in self._cells_in(cam.x - margin, cam.y - margin, cam.x + w + margin, cam.y + h + margin):
+            for p in cell:
+                p.draw(surf, cam)
+
+# ----- PROJECTILES -----
+PROJECTILE_SPRITES = {}  # render scale -> bullet surface
+
+def projectile_sprite(scale):
+    sprite = PROJECTILE_SPRITES.get(scale)
+    if sprite is None:
+        r = max(1, round(3 * scale))
+        sprite = pygame.Surface((r * 2, r * 2), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, PROJECTILE_COL, (r, r), r)
+        PROJECTILE_SPRITES[scale] = sprite
+    return sprite
+
+class ProjectilePool:
+    """
+    Bullets as parallel arrays preallocated for `capacity` of them. Live
+    bullets are packed at the front, so firing writes slot `count` and a hit
+    is a swap-remove: no per-bullet object is ever created.
+
+    Collisions go through a grid of PROJECTILE_CELL buckets built once per set
+    of world entities. A solid or enemy is bucketed by the whole area it can
+    ever occupy (a moving platform's path, an enemy's patrol) padded by
+    PROJECTILE_REACH, the furthest a bullet moves in one tick, so a bullet
+    only tests the cell it ends its move in and that covers its whole path.
+    """
+    def __init__(self, capacity=PROJECTILE_POOL):
+        self.capacity = capacity
+        self.xs = array("d", [0.0]) * capacity
+        self.ys = array("d", [0.0]) * capacity
+        self.vxs = array("d", [0.0]) * capacity
+        self.vys = array("d", [0.0]) * capacity
+        self.lifes = array("d", [0.0]) * capacity  # ms left
+        self.count = 0
+        self.grid = None  # (cx, cy) -> (solids, enemies), built on the first update that needs it
+        # running totals
+        self.fired = 0
+        self.dropped = 0
+        self.hits = 0
+
+    def reindex(self):
+        """Drop the broadphase grid; call whenever the world's entity lists are replaced."""
+        self.grid = None
+
+    def __getstate__(self):
+        # the grid holds methods bound to the original entities: copies rebuild their own
+        state = self.__dict__.copy()
+        state["grid"] = None
+        return state
+
+    def spawn(self, x, y, vx, vy, life=PROJECTILE_LIFE):
+        """Fire a bullet; False if the pool is full."""
+        if self.count == self.capacity:
+            self.dropped += 1
+            return False
+        speed = math.hypot(vx, vy)
+        if speed > PROJECTILE_MAX_SPEED:
+            # faster bullets would skip past the padding of the grid
+            vx *= PROJECTILE_MAX_SPEED / speed
+            vy *= PROJECTILE_MAX_SPEED / speed
+        i = self.count
+        self.xs[i] = x
+        self.ys[i] = y
+        self.vxs[i] = vx
+        self.vys[i] = vy
+        self.lifes[i] = life
+        self.count = i + 1
+        self.fired += 1
+        return True
+
+    def clear(self):
+        self.count = 0
+
+    def build_grid(self, world):
+        grid = {}
+        pad = PROJECTILE_REACH
+
+        def add(left, top, right, bottom, obj, slot):
+            for cx in range(int((left - pad) // PROJECTILE_CELL), int((right + pad) // PROJECTILE_CELL) + 1):
+                for cy in range(int((top - pad) // PROJECTILE_CELL), int((bottom + pad) // PROJECTILE_CELL) + 1):
+                    cell = grid.get((cx, cy))
+                    if cell is None:
+                        cell = grid[(cx, cy)] = ([], [])
+                    cell[slot].append(obj)
+
+        # solids are stored as their blocks test; a platform's is its rect's own
+        # clipline, which saves a Python call per candidate
+        for p in world.platforms:
+            r = p.rect
+            add(r.left, r.top, r.right, r.bottom, r.clipline, 0)
+        for o in world.slopes + world.terrains:
+            r = o.rect
+            add(r.left, r.top, r.right, r.bottom, o.blocks, 0)
+        for mp in world.moving_platforms:
+            xs = [pt[0] for pt in mp.path] or [mp.rect.x]
+            ys = [pt[1] for pt in mp.path] or [mp.rect.y]
+            # the rect moves in place, so its bound clipline stays valid
+            add(min(xs), min(ys), max(xs) + mp.rect.width, max(ys) + mp.rect.height, mp.rect.clipline, 0)
+        for e in world.enemies:
+            if e.nav is not None:
+                continue  # can chase out of its patrol box: bucketed where it is, every tick
+            w, h = e.rect.size
+            top = e.start_y if e.ground is None else min(e.start_y, e.ground.rect.top - h)
+            add(e.start_x - e.patrol[0], top, e.start_x + e.patrol[1] + w, e.start_y + h, e, 1)
+        return grid
+
+    def update(self, dt, world):
+        """Move every bullet and resolve what it ran into; returns the enemies it killed."""
+        n = self.count
+        if not n:
+            return []
+        grid = self.grid
+        if grid is None:
+            grid = self.grid = self.build_grid(world)
+        lookup = grid.get
+        dtf = min(dt, PROJECTILE_MAX_DT) / 16.67
+        xs, ys, vxs, vys, lifes = self.xs, self.ys, self.vxs, self.vys, self.lifes
+        width = world.width
+        height = world.height
+        tiles_block = world.tiles.blocks if world.tiles is not None else None
+        size = PROJECTILE_CELL
+        roamers = {}  # cell -> enemies that may be chasing, by their rect this tick
+        if world.nav is not None:
+            pad = PROJECTILE_REACH
+            for e in world.enemies:
+                if e.nav is not None and e.alive:
+                    r = e.rect
+                    for cx in range(int((r.left - pad) // size), int((r.right + pad) // size) + 1):
+                        for cy in range(int((r.top - pad) // size), int((r.bottom + pad) // size) + 1):
+                            roamers.setdefault((cx, cy), []).append(e)
+        roaming = roamers.get
+        killed = []
+        # backwards, so the swap-remove only moves bullets that already moved
+        for i in range(n - 1, -1, -1):
+            x = xs[i]
+            y = ys[i]
+            nx = x + vxs[i] * dtf
+            ny = y + vys[i] * dtf
+            life = lifes[i] - dt
+            hit = life <= 0 or not (0 <= nx < width and 0 <= ny < height)
+            if not hit:
+                key = (int(nx // size), int(ny // size))
+                cell = lookup(key)
+                for enemies in (roaming(key), cell[1] if cell is not None else None):
+                    if enemies is None:
+                        continue
+                    for e in enemies:
+                        if e.alive and e.rect.clipline(x, y, nx, ny):
+                            hit = True
+                            self.hits += 1
+                            e.health -= 1
+                            if e.health <= 0:
+                                e.alive = False
+                                killed.append(e)
+                            break
+                    if hit:
+                        break
+                if not hit and cell is not None:
+                    for blocks in cell[0]:
+                        if blocks(x, y, nx, ny):
+                            hit = True
+                            break
+                if not hit and tiles_block is not None:
+                    hit = tiles_block(x, y, nx, ny)
+            if hit:
+                n -= 1
+                if i != n:
+                    xs[i] = xs[n]
+                    ys[i] = ys[n]
+                    vxs[i] = vxs[n]
+                    vys[i] = vys[n]
+                    lifes[i] = lifes[n]
+            else:
+                xs[i] = nx
+                ys[i] = ny
+                lifes[i] = life
+        self.count = n
+        return killed
+
+    def draw(self, surf, cam):
+        n = self.count
+        if not n:
+            return
+        sprite = projectile_sprite(cam.scale)
+        r = sprite.get_width() // 2
+        s = cam.scale
+        ox = cam.x
+        oy = cam.y
+        w, h = surf.get_size()
+        # one blits call: a draw call per bullet would cost more than moving them
+        blits = []
+        for x, y in zip(self.xs[:n], self.ys[:n]):
+            sx = (x - ox) * s - r
+            sy = (y - oy) * s - r
+            if -r * 2 < sx < w and -r * 2 < sy < h:
+                blits.append((sprite, (sx, sy)))
+        surf.blits(blits, doreturn=False)
 
 # ----- PLAYER -----
 class Player:
+    __slots__ = ("rect", "vel", "speed", "on_ground", "jump_count", "max_jumps", "ladder", "facing",
+                 "health", "invincible", "anim_timer", "anim_frame", "standing_on", "dash_active",
+                 "dash_timer", "dash_cooldown", "dash_dir", "wall_slide", "wall_side", "screen_shake",
+                 "particles")
+
     def __init__(self, x, y):
         self.rect = pygame.Rect(x, y, 36, 56)
         self.vel = pygame.Vector2(0,0)
@@ -279,10 +795,15 @@ class Player:
     def update(self, keys, dt, world):
         dtf = dt / 16.67  # normalize dt to ~60fps scale
         
-        # update particles
-        self.particles = [p for p in self.particles if p.is_alive()]
-        for p in self.particles:
-            p.update(dt)
+        # update particles, compacting dead ones out in place
+        particles = self.particles
+        alive = 0
+        for p in particles:
+            if p.lifetime > 0:
+                p.update(dt)
+                particles[alive] = p
+                alive += 1
+        del particles[alive:]
 
         # update dash cooldown
         if self.dash_cooldown > 0:
@@ -291,7 +812,7 @@ class Player:
         # handle dash
         if self.dash_active:
             self.dash_timer -= dt
-            self.vel = self.dash_dir * DASH_SPEED
+            self.vel.update(self.dash_dir.x * DASH_SPEED, self.dash_dir.y * DASH_SPEED)
             if self.dash_timer <= 0:
                 self.dash_active = False
                 self.dash_cooldown = DASH_COOLDOWN
@@ -327,19 +848,20 @@ class Player:
             self.wall_slide = False
             if not self.on_ground and not self.dash_active:
                 # check for wall on sides
-                for plat in world.platforms + world.moving_platforms:
-                    # right wall
-                    if self.vel.x > 0 and self.rect.right > plat.rect.left and self.rect.left < plat.rect.left:
-                        if self.rect.centery > plat.rect.top and self.rect.centery < plat.rect.bottom:
-                            self.wall_slide = True
-                            self.wall_side = 1
-                            self.vel.y *= WALL_SLIDE_FRICTION
-                    # left wall
-                    elif self.vel.x < 0 and self.rect.left < plat.rect.right and self.rect.right > plat.rect.right:
-                        if self.rect.centery > plat.rect.top and self.rect.centery < plat.rect.bottom:
-                            self.wall_slide = True
-                            self.wall_side = -1
-                            self.vel.y *= WALL_SLIDE_FRICTION
+                for plats in (world.platforms, world.moving_platforms):
+                    for plat in plats:
+                        # right wall
+                        if self.vel.x > 0 and self.rect.right > plat.rect.left and self.rect.left < plat.rect.left:
+                            if self.rect.centery > plat.rect.top and self.rect.centery < plat.rect.bottom:
+                                self.wall_slide = True
+                                self.wall_side = 1
+                                self.vel.y *= WALL_SLIDE_FRICTION
+                        # left wall
+                        elif self.vel.x < 0 and self.rect.left < plat.rect.right and self.rect.right > plat.rect.right:
+                            if self.rect.centery > plat.rect.top and self.rect.centery < plat.rect.bottom:
+                                self.wall_slide = True
+                                self.wall_side = -1
+                                self.vel.y *= WALL_SLIDE_FRICTION
 
             if not self.wall_slide:
                 self.vel.y += GRAVITY * dtf
@@ -382,38 +904,46 @@ class Player:
 
     def collide_x(self, world):
         # collision with static & moving platforms (rect collision)
-        for plat in world.platforms + world.moving_platforms:
-            if self.rect.colliderect(plat.rect):
-                if self.vel.x > 0:
-                    self.rect.right = plat.rect.left
-                elif self.vel.x < 0:
-                    self.rect.left = plat.rect.right
+        solids = (world.platforms, world.moving_platforms)
+        if world.tiles is not None:
+            solids += (world.tiles.platforms_in(self.rect),)
+        for plats in solids:
+            for plat in plats:
+                if self.rect.colliderect(plat.rect):
+                    if self.vel.x > 0:
+                        self.rect.right = plat.rect.left
+                    elif self.vel.x < 0:
+                        self.rect.left = plat.rect.right
 
         # world bounds
-        self.rect.left = clamp(self.rect.left, 0, WORLD_WIDTH - self.rect.width)
-        self.rect.right = clamp(self.rect.right, self.rect.width, WORLD_WIDTH)
+        self.rect.left = clamp(self.rect.left, 0, world.width - self.rect.width)
+        self.rect.right = clamp(self.rect.right, self.rect.width, world.width)
 
     def collide_y(self, world):
         # moving platforms and static platforms
-        for plat in world.moving_platforms + world.platforms:
-            if self.rect.colliderect(plat.rect):
-                # coming down onto platform
-                if self.vel.y > 0 and (self.rect.bottom - self.vel.y) <= (plat.rect.top + 6):
-                    self.rect.bottom = plat.rect.top
-                    self.vel.y = 0
-                    self.on_ground = True
-                    self.jump_count = 0
-                    self.standing_on = plat  # remember which platform we stand on
-                    # spawn landing particles
-                    self.spawn_particles(self.rect.centerx, self.rect.bottom, count=6, color=(150, 150, 150))
-                    self.screen_shake = 100.0
-                elif self.vel.y < 0 and (self.rect.top - self.vel.y) >= (plat.rect.bottom - 6):
-                    # hit head
-                    self.rect.top = plat.rect.bottom
-                    self.vel.y = 0
-                else:
-                    # side case or overlapping; try to separate horizontally handled elsewhere
-                    pass
+        solids = (world.moving_platforms, world.platforms)
+        if world.tiles is not None:
+            solids += (world.tiles.platforms_in(self.rect),)
+        for plats in solids:
+            for plat in plats:
+                if self.rect.colliderect(plat.rect):
+                    # coming down onto platform
+                    if self.vel.y > 0 and (self.rect.bottom - self.vel.y) <= (plat.rect.top + 6):
+                        self.rect.bottom = plat.rect.top
+                        self.vel.y = 0
+                        self.on_ground = True
+                        self.jump_count = 0
+                        self.standing_on = plat  # remember which platform we stand on
+                        # spawn landing particles
+                        self.spawn_particles(self.rect.centerx, self.rect.bottom, count=6, color=(150, 150, 150))
+                        self.screen_shake = 100.0
+                    elif self.vel.y < 0 and (self.rect.top - self.vel.y) >= (plat.rect.bottom - 6):
+                        # hit head
+                        self.rect.top = plat.rect.bottom
+                        self.vel.y = 0
+                    else:
+                        # side case or overlapping; try to separate horizontally handled elsewhere
+                        pass
 
         # slopes:
         for slope in world.slopes:
@@ -429,9 +959,26 @@ class Player:
                     self.spawn_particles(self.rect.centerx, self.rect.bottom, count=6, color=(150, 150, 150))
                     self.screen_shake = 100.0
 
+        # terrain: solid below the surface, one table lookup each
+        px = self.rect.centerx
+        for terrain in world.terrains:
+            if terrain.rect.left <= px <= terrain.rect.right:
+                ground_y = terrain.height_at(px)
+                # vel.y in [0, 1) means we stood on ground last frame: follow it downhill
+                if self.rect.bottom >= ground_y or (0 <= self.vel.y < 1 and ground_y - self.rect.bottom <= TERRAIN_STICK):
+                    landing = self.vel.y > 1
+                    self.rect.bottom = math.ceil(ground_y)
+                    self.vel.y = 0
+                    self.on_ground = True
+                    self.jump_count = 0
+                    self.standing_on = terrain
+                    if landing:
+                        self.spawn_particles(self.rect.centerx, self.rect.bottom, count=6, color=(150, 150, 150))
+                        self.screen_shake = 100.0
+
         # floor bound
-        if self.rect.bottom > WORLD_HEIGHT:
-            self.rect.bottom = WORLD_HEIGHT
+        if self.rect.bottom > world.height:
+            self.rect.bottom = world.height
             self.vel.y = 0
             self.on_ground = True
             self.jump_count = 0
@@ -511,32 +1058,923 @@ class Player:
         # dash trail effect
         if self.dash_active:
             trail_alpha = int(100 * (self.dash_timer / DASH_DURATION))
-            pygame.draw.rect(surf, (100, 200, 255, trail_alpha), r, border_radius=6)
+            pygame.draw.rect(surf, (100, 200, 255, trail_alpha), r, border_radius=cam.scaled(6))
         
-        pygame.draw.rect(surf, color, r, border_radius=6)
+        pygame.draw.rect(surf, color, r, border_radius=cam.scaled(6))
         
         # eyes
-        eye_y = r.y + 10
+        eye_y = r.y + cam.scaled(10)
+        eye = cam.scaled(6)
         if self.facing >= 0:
-            pygame.draw.rect(surf, (20,20,20), (r.x + r.width - 12, eye_y, 6, 6))
+            pygame.draw.rect(surf, (20,20,20), (r.x + r.width - cam.scaled(12), eye_y, eye, eye))
         else:
-            pygame.draw.rect(surf, (20,20,20), (r.x + 6, eye_y, 6, 6))
+            pygame.draw.rect(surf, (20,20,20), (r.x + eye, eye_y, eye, eye))
         
         # wall slide visual
         if self.wall_slide:
-            pygame.draw.circle(surf, (100, 150, 255), (r.centerx, r.centery), 20, 2)
+            pygame.draw.circle(surf, (100, 150, 255), (r.centerx, r.centery), cam.scaled(20), cam.scaled(2))
+
+# ----- UPDATE SCHEDULING -----
+class UpdateScheduler:
+    """
+    Decides which entities get ticked each frame.
+
+    Moving platforms and enemies are bucketed into SCHED_CELL cells by their
+    home position (static platforms, slopes and ladders never need a tick;
+    pickups are animated by their own PickupIndex). Cells within SCHED_NEAR of
+    the focus tick every frame, cells within SCHED_FAR tick every
+    SCHED_FAR_INTERVAL frames with the time they missed, and everything
+    further away sleeps until the focus comes back.
+    """
+    def __init__(self):
+        self.cells = {}  # (cx, cy) -> (moving platforms, enemies)
+        self.last_tick = {}  # cell -> time it was last ticked
+        self.time = 0.0
+        self.dt = 0.0
+        self.frame = 0
+        self.scheduled = 0  # entities that can ever be ticked
+        self.bounds = (0, -1, 0, -1)  # occupied cell range: min cx, max cx, min cy, max cy
+        # counters for the last frame
+        self.ticked = 0
+        self.ticked_near = 0
+        self.ticked_far = 0
+
+    def _bucket(self, x, y):
+        key = (int(x // SCHED_CELL), int(y // SCHED_CELL))
+        if key not in self.cells:
+            self.cells[key] = ([], [])
+        return self.cells[key]
+
+    def rebuild(self, world):
+        """Re-bucket the world's entities; call whenever its entity lists are replaced."""
+        self.cells = {}
+        self.last_tick = {}
+        for mp in world.moving_platforms:
+            xs = [pt[0] for pt in mp.path] or [mp.rect.x]
+            ys = [pt[1] for pt in mp.path] or [mp.rect.y]
+            self._bucket((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2)[0].append(mp)
+        for e in world.enemies:
+            self._bucket(e.start_x + (e.patrol[1] - e.patrol[0]) / 2, e.rect.centery)[1].append(e)
+        self.scheduled = len(world.moving_platforms) + len(world.enemies)
+        keys = self.cells.keys()
+        self.bounds = (min((k[0] for k in keys), default=0), max((k[0] for k in keys), default=-1),
+                       min((k[1] for k in keys), default=0), max((k[1] for k in keys), default=-1))
+
+    def _tick_cell(self, key, cell):
+        elapsed = min(self.time - self.last_tick.get(key, self.time - self.dt), SCHED_MAX_CATCHUP)
+        self.last_tick[key] = self.time
+        n = 0
+        for mp in cell[0]:
+            mp.update(elapsed)
+            n += 1
+        for e in cell[1]:
+            if e.alive:
+                e.update(elapsed)
+                n += 1
+        return n
+
+    def update(self, dt, focus=None):
+        """
+        Tick the entities due this frame; with no focus everything is ticked.
+        focus may also be a list of points (one per player): a cell is then
+        near or far by its closest point.
+        """
+        self.frame += 1
+        self.time += dt
+        self.dt = dt
+        self.ticked_near = 0
+        self.ticked_far = 0
+        if focus is None:
+            for key, cell in self.cells.items():
+                self.ticked_near += self._tick_cell(key, cell)
+            self.ticked = self.ticked_near
+            return
+        if isinstance(focus, list):
+            self._update_around(focus)
+            return
+
+        fx, fy = focus
+        near_x = range(int((fx - SCHED_NEAR) // SCHED_CELL), int((fx + SCHED_NEAR) // SCHED_CELL) + 1)
+        near_y = range(int((fy - SCHED_NEAR) // SCHED_CELL), int((fy + SCHED_NEAR) // SCHED_CELL) + 1)
+        bx0, bx1, by0, by1 = self.bounds
+        far_x = range(max(bx0, int((fx - SCHED_FAR) // SCHED_CELL)), min(bx1, int((fx + SCHED_FAR) // SCHED_CELL)) + 1)
+        far_y = range(max(by0, int((fy - SCHED_FAR) // SCHED_CELL)), min(by1, int((fy + SCHED_FAR) // SCHED_CELL)) + 1)
+        cells = self.cells
+        for cx in far_x:
+            for cy in far_y:
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    continue
+                if cx in near_x and cy in near_y:
+                    self.ticked_near += self._tick_cell((cx, cy), cell)
+                elif (cx + cy + self.frame) % SCHED_FAR_INTERVAL == 0:
+                    # far cells take turns so their cost is spread over frames
+                    self.ticked_far += self._tick_cell((cx, cy), cell)
+        self.ticked = self.ticked_near + self.ticked_far
+
+    def _update_around(self, points):
+        near = set()
+        due = set()
+        bx0, bx1, by0, by1 = self.bounds
+        for fx, fy in points:
+            near.update((cx, cy)
+                        for cx in range(int((fx - SCHED_NEAR) // SCHED_CELL), int((fx + SCHED_NEAR) // SCHED_CELL) + 1)
+                        for cy in range(int((fy - SCHED_NEAR) // SCHED_CELL), int((fy + SCHED_NEAR) // SCHED_CELL) + 1))
+            due.update((cx, cy)
+                       for cx in range(max(bx0, int((fx - SCHED_FAR) // SCHED_CELL)), min(bx1, int((fx + SCHED_FAR) // SCHED_CELL)) + 1)
+                       for cy in range(max(by0, int((fy - SCHED_FAR) // SCHED_CELL)), min(by1, int((fy + SCHED_FAR) // SCHED_CELL)) + 1))
+        cells = self.cells
+        # sorted: the same order as the single-focus loop, and the same on every lockstep peer
+        for key in sorted(due):
+            cell = cells.get(key)
+            if cell is None:
+                continue
+            if key in near:
+                self.ticked_near += self._tick_cell(key, cell)
+            elif (key[0] + key[1] + self.frame) % SCHED_FAR_INTERVAL == 0:
+                self.ticked_far += self._tick_cell(key, cell)
+        self.ticked = self.ticked_near + self.ticked_far
+
+# ----- NAVIGATION -----
+# Enemies chase over a graph of the surfaces they can stand on. Edges are
+# walks between touching surfaces, ladder climbs, and jumps and falls found
+# by stepping the PLAYER_JUMP / GRAVITY arc frame by frame from take-off
+# points along each surface until it lands, hits a solid or gives up. An
+# edge keeps the frames of its arc, so an enemy follows exactly the path
+# that was checked, whatever its dt. Static arcs are computed once; edges
+# to and from a moving platform are redone as it moves, from the stored
+# arcs of the surfaces around it, and only paths through those surfaces
+# are dropped from the cache.
+NAV_HALF = 18  # px, half an enemy: how far past a surface's end it steps off
+
+class NavEdge:
+    __slots__ = ("dst", "x0", "kind", "points", "cost")
+
+    def __init__(self, dst, x0, kind, points=()):
+        self.dst = dst
+        self.x0 = x0  # where on its surface the enemy sets off
+        self.kind = kind  # "walk", "jump", "fall" or "climb"
+        self.points = points  # (x, bottom) per frame from the take-off to the landing
+        self.cost = len(points) * NAV_SPEED  # in px walked in the same time
+
+    def __deepcopy__(self, memo):
+        # the frames never change once made: copies (lockstep snapshots) share them
+        edge = NavEdge.__new__(NavEdge)
+        memo[id(self)] = edge
+        edge.dst = copy.deepcopy(self.dst, memo)
+        edge.x0, edge.kind, edge.points, edge.cost = self.x0, self.kind, self.points, self.cost
+        return edge
+
+
+class NavNode:
+    """A surface an enemy can stand on: a platform, slope, terrain, the world floor or a ladder top."""
+    __slots__ = ("id", "entity", "kind", "left", "right", "top", "edges", "arcs", "dyn", "ladders", "built_at")
+
+    def __init__(self, id, entity, kind, left, right, top=0):
+        self.id = id
+        self.entity = entity
+        self.kind = kind  # "flat", "moving", "slope", "terrain", "floor" or "ladder"
+        self.left = left
+        self.right = right
+        self.top = top  # surface y of the floor
+        self.edges = []  # NavEdges over static geometry, or all of them for a moving platform
+        self.arcs = []  # (x0, kind, frames, bounds) of every arc tried from here, landed or not
+        self.dyn = {}  # moving platform node id -> NavEdges from here onto it
+        self.ladders = []  # ladder nodes standing on this surface
+        self.built_at = None  # moving platforms: rect position the edges were made at
+
+    def __deepcopy__(self, memo):
+        node = NavNode.__new__(NavNode)
+        memo[id(self)] = node
+        for name in self.__slots__:
+            value = getattr(self, name)
+            # arcs are immutable once built and by far the bulk of the graph: shared
+            setattr(node, name, value if name == "arcs" else copy.deepcopy(value, memo))
+        return node
+
+    def y_at(self, x):
+        kind = self.kind
+        if kind == "flat" or kind == "moving" or kind == "ladder":
+            return self.entity.rect.top
+        if kind == "slope":
+            return self.entity.get_y_at(x)
+        if kind == "terrain":
+            return self.entity.height_at(x)
+        return self.top
+
+    def all_edges(self):
+        if not self.dyn:
+            return self.edges
+        return self.edges + [e for edges in self.dyn.values() for e in edges]
+
+class Navigator:
+    """
+    The navigation graph of one World, A* path search over it with a cache
+    keyed on (start node, goal node), and the steering of chasing enemies.
+    Searches an enemy needs are queued and at most NAV_SEARCHES_PER_TICK run
+    per tick, so a crowd starting to chase at once is spread over frames;
+    enemies that share a start and goal share one search. When the world's
+    entity lists change (a streamed chunk came or went) the graph is synced
+    instead of rebuilt: the nodes that left are unlinked at once, and new
+    nodes and the surfaces around the change are linked over the following
+    ticks, about NAV_LINK_FRAMES frames of simulated jumps and falls a tick.
+    """
+    def __init__(self, world):
+        self.world = world
+        self.stale = True  # entity lists changed: synced before the next use
+        self.nodes = {}  # id -> NavNode; ids are never reused
+        self.next_id = 0
+        self.floor = None
+        self.by_entity = {}  # platform, slope, terrain or ladder -> NavNode
+        self.moving = []
+        self.to_link = {}  # id -> surface or ladder waiting for its edges, in order
+        self.to_relink = {}  # id -> moving platform waiting for its edges
+        self.linking = None  # the half-done link job of a node taken from to_link
+        self.surfaces = {}  # NAV_CELL cell -> static surface nodes crossing it
+        self.solids = {}  # NAV_CELL cell -> static platform rects overlapping it
+        self.cache = {}  # (start id, goal id) -> (edges, tick found)
+        self.users = {}  # node id -> cache keys whose path leaves or enters the node
+        self.queue = []  # cache keys waiting for a search, oldest first
+        self.waiting = {}  # cache key -> enemies waiting for it
+        self.relink_at = 0  # next moving platform checked for a shift
+        self.targets = []  # (x, bottom, node) of each player
+        self.tick = 0
+        # counters
+        self.searches = 0
+        self.hits = 0
+        self.relinked = 0
+        self.build_ms = 0.0
+
+    # --- building ---
+    def _cells(self, left, top, right, bottom):
+        return [(cx, cy) for cx in range(int(left // NAV_CELL), int(right // NAV_CELL) + 1)
+                for cy in range(int(top // NAV_CELL), int(bottom // NAV_CELL) + 1)]
+
+    def _add(self, entity, kind, left, right, top=0):
+        node = NavNode(self.next_id, entity, kind, left, right, top)
+        self.next_id += 1
+        self.nodes[node.id] = node
+        if entity is not None:
+            self.by_entity[entity] = node
+        if kind == "moving":
+            self.moving.append(node)
+        return node
+
+    def _surface_cells(self, node):
+        """The cells a standable node is bucketed in; ladders and moving platforms are in none."""
+        kind = node.kind
+        if kind == "floor":
+            top = bottom = self.world.height
+        elif kind == "flat":
+            top = bottom = node.entity.rect.top
+        elif kind == "slope" or kind == "terrain":
+            top, bottom = node.entity.rect.top, node.entity.rect.bottom
+        else:
+            return []
+        return self._cells(node.left, top, node.right, bottom)
+
+    def _place(self, node):
+        for key in self._surface_cells(node):
+            self.surfaces.setdefault(key, []).append(node)
+        if node.kind == "flat":
+            r = node.entity.rect
+            for key in self._cells(r.left, r.top, r.right - 1, r.bottom - 1):
+                self.solids.setdefault(key, []).append(r)
+
+    def _unplace(self, node):
+        for key in self._surface_cells(node):
+            cell = self.surfaces[key]
+            cell.remove(node)
+            if not cell:
+                del self.surfaces[key]
+        if node.kind == "flat":
+            r = node.entity.rect
+            for key in self._cells(r.left, r.top, r.right - 1, r.bottom - 1):
+                cell = self.solids[key]
+                cell.remove(r)
+                if not cell:
+                    del self.solids[key]
+
+    def _queue_link(self, node):
+        if node.kind == "moving":
+            self.to_relink[node.id] = node
+        else:
+            self.to_link[node.id] = node
+
+    def build(self):
+        """Make the whole graph at once; sync() keeps it up to date from then on."""
+        t0 = time.perf_counter()
+        self.nodes = {}
+        self.by_entity = {}
+        self.moving = []
+        self.surfaces = {}
+        self.solids = {}
+        self.cache = {}
+        self.users = {}
+        self.queue = []
+        self.waiting = {}
+        self.to_link = {}
+        self.to_relink = {}
+        self.linking = None
+        self.floor = self._add(None, "floor", 0, self.world.width, self.world.height)
+        self._place(self.floor)
+        self._queue_link(self.floor)
+        self.sync()
+        self.link_queued()
+        self.build_ms = (time.perf_counter() - t0) * 1e3
+
+    def sync(self):
+        """
+        Match the graph to the world's entity lists. Cached paths, queued
+        searches and enemy paths only go if they use a node that left or
+        whose edges are redone.
+        """
+        world = self.world
+        present = {}
+        for kind, entities in (("flat", world.platforms), ("moving", world.moving_platforms),
+                               ("slope", world.slopes), ("terrain", world.terrains), ("ladder", world.ladders)):
+            for entity in entities:
+                present[entity] = kind
+        changed = []  # rects of static geometry that came or went
+        gone = [node for entity, node in self.by_entity.items() if entity not in present]
+        if gone:
+            self._unlink(gone, changed)
+        new = []
+        for entity, kind in present.items():
+            if entity in self.by_entity:
+                continue
+            r = entity.rect
+            if kind == "ladder":
+                node = self._add(entity, kind, r.centerx, r.centerx)
+            else:
+                node = self._add(entity, kind, r.left, r.right)
+            self._place(node)
+            self._queue_link(node)
+            new.append(node)
+            if kind != "moving":
+                changed.append(r)
+        for node in new:
+            if node.kind == "ladder":
+                base = self.node_at(node.left, node.entity.rect.bottom, NAV_STEP_UP)
+                if base is not None:
+                    base.ladders.append(node)
+                    self._queue_link(base)
+        if changed:
+            self._queue_near(changed)
+        self.stale = False
+
+    def _unlink(self, gone, changed):
+        ids = {node.id for node in gone}
+        if self.linking is not None:
+            # its walks and landings may lead to nodes that are leaving: start it again
+            node = self.linking[0]
+            self.linking = None
+            if node.id not in ids:
+                self._queue_link(node)
+        for node in gone:
+            del self.nodes[node.id]
+            del self.by_entity[node.entity]
+            self.to_link.pop(node.id, None)
+            self.to_relink.pop(node.id, None)
+            if node.kind == "moving":
+                self.moving.remove(node)
+                continue
+            self._unplace(node)
+            changed.append(node.entity.rect)
+            for ladder in node.ladders:
+                if ladder.id not in ids:
+                    self._queue_link(ladder)  # its climb down led onto this surface
+        for node in self.nodes.values():
+            if node.ladders:
+                ladders = [ladder for ladder in node.ladders if ladder.id not in ids]
+                if len(ladders) != len(node.ladders):
+                    node.ladders = ladders
+                    self._queue_link(node)
+            for nid in ids.intersection(node.dyn):
+                del node.dyn[nid]
+            if any(edge.dst.id in ids for edge in node.edges):
+                node.edges = [edge for edge in node.edges if edge.dst.id not in ids]
+                self._queue_link(node)  # an arc that landed there may land lower now
+        for nid in ids:
+            self._invalidate(nid)
+        self.queue = [key for key in self.queue if key[0] not in ids and key[1] not in ids]
+        for key in [key for key in self.waiting if key[0] in ids or key[1] in ids]:
+            del self.waiting[key]
+        self.targets = [(x, bottom, None if node is not None and node.id in ids else node)
+                        for x, bottom, node in self.targets]
+        for e in self.world.enemies:
+            if self._uses(e, ids):
+                e.forget_path()
+
+    @staticmethod
+    def _uses(enemy, ids):
+        for node in (enemy.node, enemy.home, enemy.goal, enemy.edge.dst if enemy.edge is not None else None):
+            if node is not None and node.id in ids:
+                return True
+        return any(edge.dst.id in ids for edge in enemy.path or ())
+
+    def _queue_near(self, rects):
+        """Queue the surfaces whose jumps, falls or walks may end differently now that rects came or went."""
+        reach = NAV_MAX_FRAMES * NAV_SPEED
+        boxes = [(r.left - 2 * NAV_HALF, r.top - 2 * NAV_HALF, r.right + 2 * NAV_HALF, r.bottom + 2 * NAV_HALF)
+                 for r in rects]
+        for node in self.nodes.values():
+            if node.kind == "moving" or node.id in self.to_link:
+                continue
+            if node.kind == "floor":
+                top = bottom = self.world.height
+            else:
+                top, bottom = node.entity.rect.top, node.entity.rect.bottom
+            for left, btop, right, bbottom in boxes:
+                if (node.left - reach <= right and left <= node.right + reach
+                        and top - reach <= bbottom and btop <= bottom + reach):
+                    self._queue_link(node)
+                    break
+                # falls reach further down than a jump's width
+                if any(aleft <= right and left <= aright and atop <= bbottom and btop <= abottom
+                       for _, _, _, (aleft, atop, aright, abottom) in node.arcs):
+                    self._queue_link(node)
+                    break
+
+    def link_queued(self, budget=None):
+        """
+        Give queued nodes their edges, simulating about budget frames of
+        jumps and falls (None: everything queued). Surfaces go first: a
+        moving platform's edges onto them come from their arcs.
+        """
+        full = budget is None
+        spent = 0
+        while (self.linking is not None or self.to_link) and (full or spent < budget):
+            if self.linking is None:
+                self.linking = self._link_job(self.to_link.pop(next(iter(self.to_link))))
+            job = self.linking
+            frames, finished = self._run_link(job, None if full else budget - spent)
+            spent += frames
+            if not finished:
+                break
+            self.linking = None
+            node = job[0]
+            if not full:
+                # its arcs changed: so did where they come down on moving platforms
+                node.dyn = {}
+                cells = set(self._surface_cells(node))
+                for mover in self.moving:
+                    if cells.isdisjoint(self._mover_cells(mover.entity.rect)):
+                        continue
+                    edges = self._onto(node, mover)
+                    if edges:
+                        node.dyn[mover.id] = edges
+            self._invalidate(node.id)
+        while self.to_relink and self.linking is None and not self.to_link and (full or spent < budget):
+            spent += self.relink(self.to_relink.pop(next(iter(self.to_relink))))
+
+    def _invalidate(self, nid):
+        for key in self.users.pop(nid, ()):
+            self.cache.pop(key, None)
+
+    def node_at(self, x, bottom, slack=4):
+        """The static surface an enemy at (x, bottom) stands on, or the moving platform it rides."""
+        best = None
+        best_d = slack + 1
+        for node in self.surfaces.get((int(x // NAV_CELL), int(bottom // NAV_CELL)), ()):
+            if node.left - NAV_HALF <= x <= node.right + NAV_HALF:
+                d = abs(node.y_at(x) - bottom)
+                if d < best_d:
+                    best, best_d = node, d
+        for node in self.moving:
+            r = node.entity.rect
+            if r.left - NAV_HALF <= x <= r.right + NAV_HALF and abs(r.top - bottom) < best_d:
+                best, best_d = node, abs(r.top - bottom)
+        return best
+
+    def _landing(self, src, x, prev_y, y):
+        """The first surface a fall from prev_y to y at x lands on, and where."""
+        best = None
+        best_y = y + 1
+        for key in ((int(x // NAV_CELL), cy) for cy in range(int(prev_y // NAV_CELL), int(y // NAV_CELL) + 1)):
+            for node in self.surfaces.get(key, ()):
+                # an enemy stands wherever its body overlaps the surface
+                if node is not src and node.left - NAV_HALF < x < node.right + NAV_HALF:
+                    sy = node.y_at(x)
+                    if prev_y <= sy < best_y:
+                        best, best_y = node, sy
+        return best, best_y
+
+    def arc(self, src, x0, y0, d, v, vy):
+        """Step one jump or fall; (frames, landing node) with node None if it never lands."""
+        width = self.world.width
+        height = self.world.height
+        solids = self.solids
+        body = pygame.Rect(0, 0, 2 * NAV_HALF, 2 * NAV_HALF)
+        x = x0
+        y = y0
+        frames = [(x0, y0)]
+        for _ in range(NAV_MAX_FRAMES):
+            vy += GRAVITY
+            prev_y = y
+            x += d * v
+            y += vy
+            if not 0 <= x <= width or y > height + 1:
+                break
+            if vy > 0:
+                node, land_y = self._landing(src, x, prev_y, y)
+                if node is not None:
+                    frames.append((x, land_y))
+                    return frames, node
+            # the body is smaller than a cell, so it overlaps at most four
+            body.x = round(x) - NAV_HALF
+            body.y = round(y) - 2 * NAV_HALF
+            cx0 = body.left // NAV_CELL
+            cx1 = (body.right - 1) // NAV_CELL
+            cy0 = body.top // NAV_CELL
+            cy1 = (body.bottom - 1) // NAV_CELL
+            blocked = False
+            for key in {(cx0, cy0), (cx1, cy0), (cx0, cy1), (cx1, cy1)}:
+                rects = solids.get(key)
+                if rects and body.collidelist(rects) != -1:
+                    blocked = True
+                    break
+            if blocked:
+                break
+            frames.append((x, y))
+        return frames, None
+
+    def link(self, node):
+        """Work out the static edges leaving a surface or ladder."""
+        self._run_link(self._link_job(node), None)
+
+    @staticmethod
+    def _keep(edges, edge):
+        # one edge per target, kind and stretch of the surface: the cheapest
+        key = (edge.dst.id, edge.kind, int(edge.x0 // NAV_JUMP_EVERY))
+        old = edges.get(key)
+        if old is None or edge.cost < old.cost:
+            edges[key] = edge
+
+    def _link_job(self, node):
+        """
+        Start linking node: its walks and climbs are found now, its jumps and
+        falls listed to be simulated by _run_link. A job is a plain list
+        [node, edges, arcs, tries, tries done] so it copies with the world.
+        """
+        edges = {}
+        keep = self._keep
+        if node.kind == "ladder":
+            r = node.entity.rect
+            x = node.left
+            base = self.node_at(x, r.bottom, NAV_STEP_UP)
+            if base is not None:
+                keep(edges, NavEdge(base, x, "climb", climb(x, r.top, r.bottom)))
+            starts = [(x, d) for d in (-1, 1)]
+        else:
+            # walk onto touching surfaces
+            y_top = node.y_at
+            for cell in self._cells(node.left - NAV_HALF, min(y_top(node.left), y_top(node.right)) - NAV_STEP_UP,
+                                    node.right + NAV_HALF, max(y_top(node.left), y_top(node.right)) + NAV_STEP_UP):
+                for other in self.surfaces.get(cell, ()):
+                    if other is node:
+                        continue
+                    for x in (other.left, other.right, node.left, node.right):
+                        if (node.left <= x <= node.right and other.left <= x <= other.right
+                                and abs(other.y_at(x) - y_top(x)) <= NAV_STEP_UP):
+                            keep(edges, NavEdge(other, x, "walk"))
+            for ladder in node.ladders:
+                r = ladder.entity.rect
+                keep(edges, NavEdge(ladder, ladder.left, "climb", climb(ladder.left, r.bottom, r.top)))
+            starts = [(node.left - NAV_HALF, -1), (node.right + NAV_HALF, 1)]
+            # jumps from along the surface, where there is something within a jump above;
+            # the scan starts and ends with the surfaces, which matters for the world-wide floor
+            cxs = [key[0] for key, cell in self.surfaces.items() if len(cell) > 1 or cell[0] is not node]
+            first = max(node.left, min(cxs, default=0) * NAV_CELL - 2 * NAV_JUMP_EVERY)
+            x = node.left + NAV_JUMP_EVERY / 2 + max(0, (first - node.left) // NAV_JUMP_EVERY) * NAV_JUMP_EVERY
+            last = min(node.right, (max(cxs, default=0) + 1) * NAV_CELL + 2 * NAV_JUMP_EVERY)
+            while x < last:
+                y = y_top(x)
+                if any(other is not node for key in self._cells(x - 2 * NAV_JUMP_EVERY, y - 2 * NAV_JUMP_EVERY,
+                                                                x + 2 * NAV_JUMP_EVERY, y - 1)
+                       for other in self.surfaces.get(key, ())):
+                    starts.extend(((x, -1), (x, 1)))
+                x += NAV_JUMP_EVERY
+        ends = len(starts) if node.kind == "ladder" else 2
+        tries = []
+        for i, (x0, d) in enumerate(starts):
+            y0 = node.y_at(min(max(x0, node.left), node.right))
+            tries.append((x0, y0, d, "jump", PLAYER_JUMP, NAV_SPEED))
+            tries.append((x0, y0, d, "jump", PLAYER_JUMP, NAV_SPEED / 2))
+            if i < ends:
+                # stepping off an end: a fall, or a jump from the edge
+                tries.append((x0, y0, d, "fall", 0.0, NAV_SPEED))
+                tries.append((x0, y0, d, "fall", 0.0, NAV_SPEED / 2))
+        return [node, edges, [], tries, 0]
+
+    def _run_link(self, job, budget):
+        """
+        Simulate more of a job's arcs, until about budget frames were stepped
+        (None: all of them). Returns (frames stepped, whether the node has
+        its new edges).
+        """
+        node, edges, arcs, tries, done = job
+        spent = 0
+        while done < len(tries) and (budget is None or spent < budget):
+            x0, y0, d, kind, vy, v = tries[done]
+            done += 1
+            frames, dst = self.arc(node, x0, y0, d, v, vy)
+            spent += len(frames)
+            xs = [f[0] for f in frames]
+            ys = [f[1] for f in frames]
+            arcs.append((x0, kind, tuple(frames), (min(xs), min(ys), max(xs), max(ys))))
+            if dst is not None and dst is not node:
+                self._keep(edges, NavEdge(dst, x0, kind, tuple(frames)))
+        job[4] = done
+        if done < len(tries):
+            return spent, False
+        # the old edges and arcs stay in use until the new ones are complete
+        node.arcs = arcs
+        node.edges = list(edges.values())
+        return spent, True
+
+    def relink(self, mover):
+        """Redo the edges from and onto a moving platform where it is now; returns the frames stepped."""
+        r = mover.entity.rect
+        mover.left, mover.right = r.left, r.right
+        mover.built_at = r.topleft
+        mover.edges = []
+        stepped = 0
+        for x0, d in ((r.left - NAV_HALF, -1), (r.right + NAV_HALF, 1)):
+            for kind, vy, v in (("jump", PLAYER_JUMP, NAV_SPEED), ("fall", 0.0, NAV_SPEED)):
+                frames, dst = self.arc(mover, x0, r.top, d, v, vy)
+                stepped += len(frames)
+                if dst is not None:
+                    mover.edges.append(NavEdge(dst, x0, kind, tuple(frames)))
+        self.to_relink.pop(mover.id, None)
+        touched = [mover]
+        # arcs of nearby surfaces that cross the platform's top on their way down now land on it
+        seen = set()
+        for key in self._mover_cells(r):
+            for node in self.surfaces.get(key, ()):
+                if node.id in seen:
+                    continue
+                seen.add(node.id)
+                new = self._onto(node, mover)
+                if new or mover.id in node.dyn:
+                    if new:
+                        node.dyn[mover.id] = new
+                    else:
+                        del node.dyn[mover.id]
+                    touched.append(node)
+        for node in touched:
+            self._invalidate(node.id)
+        self.relinked += 1
+        return stepped
+
+    def _mover_cells(self, r):
+        reach = NAV_MAX_FRAMES * NAV_SPEED
+        return self._cells(r.left - reach, r.top - reach, r.right + reach, r.top + reach)
+
+    def _onto(self, node, mover):
+        """Edges of node's arcs cut short where they come down on the moving platform."""
+        r = mover.entity.rect
+        new = []
+        for x0, kind, frames, (left, top, right, bottom) in node.arcs:
+            if right < r.left or left > r.right or bottom < r.top or top > r.top:
+                continue
+            prev_y = None
+            for i, (x, y) in enumerate(frames):
+                if prev_y is not None and y > prev_y and r.left <= x <= r.right and prev_y <= r.top <= y:
+                    new.append(NavEdge(mover, x0, kind, frames[:i] + ((x, r.top),)))
+                    break
+                prev_y = y
+        return new
+
+    # --- paths ---
+    def search(self, start, goal, start_x):
+        """A* from start to goal; the edges to follow, () if goal cannot be reached."""
+        def h(node):
+            return max(0, goal.left - node.right, node.left - goal.right)
+        best = {start.id: 0.0}
+        at_x = {start.id: start_x}
+        came = {}
+        heap = [(h(start), 0, start.id)]
+        nodes = self.nodes
+        n = 0
+        while heap:
+            _, _, nid = heapq.heappop(heap)
+            if nid == goal.id:
+                path = []
+                while nid in came:
+                    nid, edge = came[nid]
+                    path.append(edge)
+                path.reverse()
+                return tuple(path)
+            n += 1
+            if n > NAV_MAX_EXPAND:
+                break
+            g = best[nid]
+            x = at_x[nid]
+            for edge in nodes[nid].all_edges():
+                cost = g + abs(x - edge.x0) + edge.cost
+                did = edge.dst.id
+                if cost < best.get(did, math.inf):
+                    best[did] = cost
+                    at_x[did] = edge.points[-1][0] if edge.points else edge.x0
+                    came[did] = (nid, edge)
+                    heapq.heappush(heap, (cost + h(edge.dst), n, did))
+        return ()
+
+    def path(self, enemy, start, goal):
+        """The cached path, or None after queueing a search for it."""
+        key = (start.id, goal.id)
+        hit = self.cache.get(key)
+        if hit is not None and (hit[0] or self.tick - hit[1] < NAV_RETRY):
+            self.hits += 1
+            return list(hit[0])
+        waiting = self.waiting.get(key)
+        if waiting is None:
+            self.waiting[key] = waiting = []
+            self.queue.append(key)
+        if enemy not in waiting:
+            waiting.append(enemy)
+        return None
+
+    def _store(self, key, edges):
+        cache = self.cache
+        if len(cache) >= NAV_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[key] = (edges, self.tick)
+        for edge in edges:
+            self.users.setdefault(edge.dst.id, []).append(key)
+        self.users.setdefault(key[0], []).append(key)
+        self.users.setdefault(key[1], []).append(key)  # found no path: goes with the goal too
+
+    def update(self, players=()):
+        """Once per tick: follow the players, redo moved platforms and run some queued searches."""
+        if self.floor is None:
+            self.build()
+        elif self.stale:
+            self.sync()
+        self.link_queued(NAV_LINK_FRAMES)
+        self.tick += 1
+        targets = []
+        for i, p in enumerate(players):
+            node = None
+            if p.on_ground and p.standing_on is not None:
+                node = self.by_entity.get(p.standing_on)
+            elif p.on_ground:
+                node = self.node_at(p.rect.centerx, p.rect.bottom, NAV_STEP_UP)
+            if node is None and i < len(self.targets):
+                node = self.targets[i][2]  # in the air: where it last stood
+            targets.append((p.rect.centerx, p.rect.bottom, node))
+        self.targets = targets
+
+        moving = self.moving
+        for _ in range(min(NAV_RELINKS_PER_TICK, len(moving))):
+            self.relink_at = (self.relink_at + 1) % len(moving)
+            node = moving[self.relink_at]
+            r = node.entity.rect
+            node.left, node.right = r.left, r.right
+            if node.built_at is None:
+                continue  # new: still queued for its first edges
+            bx, by = node.built_at
+            if abs(r.x - bx) + abs(r.y - by) > NAV_SHIFT:
+                self.relink(node)
+
+        for _ in range(min(NAV_SEARCHES_PER_TICK, len(self.queue))):
+            key = self.queue.pop(0)
+            enemies = self.waiting.pop(key)
+            start = self.nodes[key[0]]
+            edges = self.search(start, self.nodes[key[1]], enemies[0].rect.centerx)
+            self.searches += 1
+            self._store(key, edges)
+            for e in enemies:
+                if e.node is start and e.goal is not None and e.goal.id == key[1] and e.edge is None:
+                    e.path = list(edges)
+
+    # --- steering ---
+    def target_for(self, enemy):
+        """The closest player in chase range whose surface is known, or None."""
+        x = enemy.rect.centerx
+        y = enemy.rect.bottom
+        home_x = enemy.start_x + enemy.rect.width / 2
+        best = None
+        best_d = NAV_CHASE_RANGE if not enemy.chasing else NAV_LEASH
+        for target in self.targets:
+            tx, ty, node = target
+            if node is None or abs(tx - home_x) > NAV_LEASH:
+                continue
+            d = abs(tx - x) + abs(ty - y)
+            if d < best_d:
+                best, best_d = target, d
+        return best
+
+    def walk(self, enemy, x, dtf):
+        """Walk along the current surface towards x; True once there."""
+        node = enemy.node
+        r = enemy.rect
+        if node.kind == "moving":
+            r.x += round(node.entity.delta.x)
+        x = min(max(x, node.left - NAV_HALF), node.right + NAV_HALF)
+        dx = x - r.centerx
+        move = max(1, round(NAV_SPEED * dtf))
+        arrived = abs(dx) <= move
+        r.centerx = round(x) if arrived else r.centerx + (move if dx > 0 else -move)
+        r.bottom = math.ceil(node.y_at(min(max(r.centerx, node.left), node.right)))
+        enemy.dir = 1 if dx > 0 else -1 if dx < 0 else enemy.dir
+        return arrived
+
+    def steer(self, enemy, dt):
+        """Move a chasing or homeward enemy; False to leave it to its patrol."""
+        dtf = dt / 16.67
+        r = enemy.rect
+        edge = enemy.edge
+        if edge is not None:
+            enemy.step += dtf
+            frames = edge.points
+            i = int(enemy.step)
+            if i >= len(frames) - 1:
+                # landed: settle on the surface, which may have moved since the edge was made
+                enemy.edge = None
+                enemy.node = dst = edge.dst
+                x = frames[-1][0]
+                r.centerx = round(x)
+                r.bottom = math.ceil(dst.y_at(min(max(x, dst.left), dst.right)))
+            else:
+                (x0, y0), (x1, y1) = frames[i], frames[i + 1]
+                f = enemy.step - i
+                r.centerx = round(x0 + (x1 - x0) * f)
+                r.bottom = round(y0 + (y1 - y0) * f)
+            return True
+
+        target = self.target_for(enemy)
+        if target is None and not enemy.chasing:
+            return False
+        if enemy.node is None:
+            enemy.node = self.node_at(r.centerx, r.bottom)
+            if enemy.node is None:
+                enemy.chasing = False
+                return False
+        if target is not None:
+            enemy.chasing = True
+            goal_x, _, goal = target
+        else:
+            # lost the player: go back to the patrol
+            if enemy.home is None:
+                enemy.home = self.node_at(enemy.start_x + r.width / 2, enemy.start_y + r.height, NAV_STEP_UP)
+            goal = enemy.home
+            goal_x = enemy.start_x + r.width / 2
+            left = enemy.start_x - enemy.patrol[0]
+            if goal is None or (enemy.node is goal and left <= r.x <= enemy.start_x + enemy.patrol[1]):
+                enemy.forget_path()
+                return False
+
+        if enemy.node is goal:
+            enemy.path = None
+            self.walk(enemy, goal_x, dtf)
+            return True
+        if enemy.goal is not goal or enemy.path is None:
+            enemy.goal = goal
+            enemy.path = self.path(enemy, enemy.node, goal)
+        if not enemy.path:
+            # no path yet, or none at all: keep as close as this surface allows
+            self.walk(enemy, goal_x, dtf)
+            return True
+        edge = enemy.path[0]
+        if self.walk(enemy, edge.x0, dtf):
+            enemy.path.pop(0)
+            if edge.kind == "walk":
+                enemy.node = edge.dst
+            else:
+                enemy.edge = edge
+                enemy.step = 0.0
+            if not enemy.path:
+                enemy.path = None
+        return True
+
+def climb(x, y0, y1):
+    """Frames of a ladder climb at x from y0 to y1."""
+    n = max(1, int(abs(y1 - y0) / NAV_CLIMB))
+    return tuple((x, y0 + (y1 - y0) * i / n) for i in range(n + 1))
 
 # ----- LEVEL / WORLD -----
 class World:
-    def __init__(self):
+    def __init__(self, create_demo=True):
         self.platforms = []
         self.moving_platforms = []
         self.slopes = []
+        self.terrains = []
         self.ladders = []
         self.enemies = []
         self.coins = []
+        self.width = WORLD_WIDTH
+        self.height = WORLD_HEIGHT
         self.spawn_point = (120, WORLD_HEIGHT - 200)
-        self.create_demo_world()
+        self.tiles = None  # TileMap, in tile worlds
+        self.nav = None  # Navigator, when enemies chase
+        self.scheduler = UpdateScheduler()
+        self.pickups = PickupIndex()
+        self.projectiles = ProjectilePool()
+        if create_demo:
+            self.create_demo_world()
+            self.index_entities()
 
     def create_demo_world(self):
         self.platforms.append(Platform(0, WORLD_HEIGHT - 64, WORLD_WIDTH, 64))
@@ -559,6 +1997,11 @@ class World:
         self.slopes.append(Slope(400, WORLD_HEIGHT-160, 300, 160, slope_type='right'))
         self.slopes.append(Slope(1500, WORLD_HEIGHT-200, 360, 200, slope_type='left'))
 
+        # rolling hill
+        base = WORLD_HEIGHT - 64
+        self.terrains.append(Terrain([(x, base - 140 * math.sin(math.pi * (x - 1900) / 560) ** 2)
+                                      for x in range(1900, 2461, 20)]))
+
         # ladders
         self.ladders.append(Ladder(2500, WORLD_HEIGHT-300, 40, 180))
         self.ladders.append(Ladder(600, WORLD_HEIGHT-200, 40, 120))
@@ -575,30 +2018,1143 @@ class World:
             cx = random.randint(100, WORLD_WIDTH-100)
             cy = random.randint(100, WORLD_HEIGHT-200)
             self.coins.append(Coin(cx, cy, radius=10))
+        for i in range(4):
+            self.coins.append(Gem(400 + i * 700, random.randint(200, WORLD_HEIGHT-400), radius=12))
+        self.coins.append(Heart(2880, WORLD_HEIGHT - 120, radius=12))
 
-    def update(self, dt):
-        for mp in self.moving_platforms:
-            mp.update(dt)
-        for p in self.platforms:
-            p.update(dt)
+    def index_entities(self):
+        """Refresh per-entity lookups; call whenever the entity lists are replaced."""
+        for e in self.enemies:
+            e.ground = None
+            left = e.start_x - e.patrol[0]
+            right = e.start_x + e.patrol[1] + e.rect.width
+            for t in self.terrains:
+                if t.rect.left < right and left < t.rect.right and e.start_y + e.rect.height >= t.rect.top:
+                    e.ground = t
+                    break
+            if e.nav is not self.nav:
+                e.nav = self.nav
+                e.forget_path()
+        if self.nav is not None:
+            self.nav.stale = True  # synced, not rebuilt: enemies still here keep their paths
+        self.scheduler.rebuild(self)
+        self.pickups.rebuild(self.coins)
+        self.projectiles.reindex()
+
+    def enable_navigation(self):
+        """Let enemies chase players over a navigation graph of this world."""
+        self.nav = Navigator(self)
+        self.nav.build()
         for e in self.enemies:
-            e.update(dt)
-        for c in self.coins:
-            c.update(dt)
+            e.nav = self.nav
+        self.projectiles.reindex()  # chasing enemies leave the static grid
+
+    def update(self, dt, focus=None, players=()):
+        # paths found and platforms moved before the enemies that use them tick
+        if self.nav is not None:
+            self.nav.update(players)
+        # static platforms, slopes, terrain and ladders have nothing to tick
+        self.scheduler.update(dt, focus)
+        # bullets fly on out of view, so they all move every tick
+        self.projectiles.update(dt, self)
+        # pickups only animate, so only those that can be on screen do
+        if focus is None:
+            self.pickups.update(dt)
+        else:
+            points = focus if isinstance(focus, list) else [focus]
+            xs = [pt[0] for pt in points]
+            ys = [pt[1] for pt in points]
+            self.pickups.update(dt, (min(xs) - WIDTH, min(ys) - HEIGHT, max(xs) + WIDTH, max(ys) + HEIGHT))
+
+    def stream(self, cam):
+        # everything is resident in the demo world
+        pass
+
+    def stream_around(self, centers):
+        """stream() for a view centred on each of the px points, e.g. every lockstep player."""
+        pass
 
     def draw(self, surf, cam):
-        for p in self.platforms:
-            p.draw(surf, cam)
-        for mp in self.moving_platforms:
-            mp.draw(surf, cam)
-        for s in self.slopes:
-            s.draw(surf, cam)
-        for ladder in self.ladders:
-            ladder.draw(surf, cam)
-        for e in self.enemies:
-            e.draw(surf, cam)
-        for c in self.coins:
-            c.draw(surf, cam)
+        if self.tiles is not None:
+            self.tiles.draw(surf, cam)
+        # terrain first so the floor it sits on is drawn over its base
+        for t in self.terrains:
+            t.draw(surf, cam)
+        # skip what is off screen: the per-entity Python cost would dominate otherwise
+        w, h = surf.get_size()
+        visible = pygame.Rect(int(cam.x) - 1, int(cam.y) - 1, int(w / cam.scale) + 2, int(h / cam.scale) + 2).colliderect
+        for entities in (self.platforms, self.moving_platforms, self.slopes, self.ladders, self.enemies):
+            for e in entities:
+                if visible(e.rect):
+                    e.draw(surf, cam)
+        self.pickups.draw(surf, cam)
+        self.projectiles.draw(surf, cam)
+
+# ----- LEVEL FILES -----
+# Binary level format (little-endian):
+#   header   magic "PLVL", version u16, section count u16, width, height, spawn x, spawn y (i32)
+#   table    one (offset u32, count u32) per section, in LEVEL_SECTIONS order
+#   sections packed fixed-size records, see LEVEL_SECTIONS
+# Moving platforms and terrains index into the shared "paths" and
+# "terrain_points" sections instead of storing variable-length point lists
+# inline, so every section is a flat array. Plain coins have their own
+# section, other collectibles share "pickups". Older versions simply lack
+# the later sections (terrain arrived in 2, pickups in 3).
+LEVEL_MAGIC = b"PLVL"
+LEVEL_VERSION = 3
+LEVEL_SECTION_COUNTS = {1: 7, 2: 9, 3: 10}  # version -> sections it has
+LEVEL_HEADER = struct.Struct("<4sHHiiii")
+LEVEL_SECTION = struct.Struct("<II")
+LEVEL_SECTIONS = (
+    ("platforms", struct.Struct("<4i")),  # x, y, w, h
+    ("moving_platforms", struct.Struct("<4idII")),  # x, y, w, h, speed, first path point, point count
+    ("paths", struct.Struct("<2f")),  # x, y
+    ("slopes", struct.Struct("<4iB")),  # x, y, w, h, 0 = right / 1 = left
+    ("ladders", struct.Struct("<4i")),  # x, y, w, h
+    ("enemies", struct.Struct("<6id")),  # x, y, w, h, patrol left, patrol right, speed
+    ("coins", struct.Struct("<2fi")),  # x, y, radius
+    ("terrains", struct.Struct("<II")),  # first terrain point, point count
+    ("terrain_points", struct.Struct("<2f")),  # x, y
+    ("pickups", struct.Struct("<2fiB")),  # x, y, radius, index into PICKUP_KINDS
+)
+SLOPE_TYPES = ("right", "left")
+ENTITY_KINDS = ("platforms", "moving_platforms", "slopes", "ladders", "enemies", "coins", "terrains")
+
+def entity_records(platforms=(), moving_platforms=(), slopes=(), ladders=(), enemies=(), coins=(), terrains=()):
+    """Convert live entities into plain lists that can be written to disk."""
+    return {
+        "platforms": [[p.rect.x, p.rect.y, p.rect.width, p.rect.height] for p in platforms],
+        "moving_platforms": [[mp.rect.x, mp.rect.y, mp.rect.width, mp.rect.height, mp.speed,
+                              [list(pt) for pt in mp.path]] for mp in moving_platforms],
+        "slopes": [[sl.rect.x, sl.rect.y, sl.rect.width, sl.rect.height, sl.type] for sl in slopes],
+        "ladders": [[ld.rect.x, ld.rect.y, ld.rect.width, ld.rect.height] for ld in ladders],
+        "enemies": [[e.start_x, e.start_y, e.rect.width, e.rect.height, e.patrol[0], e.patrol[1], e.speed]
+                    for e in enemies],
+        "coins": [[c.pos.x, c.pos.y, c.radius, c.kind] for c in coins],
+        "terrains": [[list(pt) for pt in t.points()] for t in terrains],
+    }
+
+def world_records(world):
+    return entity_records(world.platforms, world.moving_platforms, world.slopes, world.ladders,
+                          [e for e in world.enemies if e.alive],
+                          [c for c in world.coins if not c.collected], world.terrains)
+
+def pack_level(rec, width=0, height=0, spawn_point=(0, 0)):
+    """Pack entity records (see entity_records) into the binary level format."""
+    rows = dict(rec)
+    rows["paths"] = []
+    moving = []
+    for x, y, w, h, speed, path in rec.get("moving_platforms", ()):
+        moving.append((x, y, w, h, speed, len(rows["paths"]), len(path)))
+        rows["paths"].extend(path)
+    rows["moving_platforms"] = moving
+    rows["terrain_points"] = []
+    terrains = []
+    for points in rec.get("terrains", ()):
+        terrains.append((len(rows["terrain_points"]), len(points)))
+        rows["terrain_points"].extend(points)
+    rows["terrains"] = terrains
+    rows["coins"] = []
+    rows["pickups"] = []
+    for r in rec.get("coins", ()):
+        kind = r[3] if len(r) > 3 else "coin"
+        if kind == "coin":
+            rows["coins"].append(r[:3])
+        else:
+            rows["pickups"].append((r[0], r[1], r[2], PICKUP_KINDS.index(kind)))
+    rows["slopes"] = [(x, y, w, h, SLOPE_TYPES.index(t)) for x, y, w, h, t in rec.get("slopes", ())]
+
+    body = []
+    table = []
+    offset = LEVEL_HEADER.size + LEVEL_SECTION.size * len(LEVEL_SECTIONS)
+    for name, fmt in LEVEL_SECTIONS:
+        data = b"".join(fmt.pack(*r) for r in rows.get(name, ()))
+        table.append(LEVEL_SECTION.pack(offset, len(data) // fmt.size))
+        body.append(data)
+        offset += len(data)
+    header = LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, len(LEVEL_SECTIONS),
+                               int(width), int(height), int(spawn_point[0]), int(spawn_point[1]))
+    return header + b"".join(table) + b"".join(body)
+
+def unpack_level(buf):
+    """
+    Build entities straight from a packed level buffer (bytes, mmap, ...).
+    Returns (width, height, spawn_point, entities by kind).
+    """
+    view = memoryview(buf)
+    try:
+        magic, version, count, width, height, sx, sy = LEVEL_HEADER.unpack_from(view)
+        if magic != LEVEL_MAGIC:
+            raise ValueError("not a level file")
+        if LEVEL_SECTION_COUNTS.get(version) != count:
+            raise ValueError(f"unsupported level version {version}")
+        cols = {}
+        for i, (name, fmt) in enumerate(LEVEL_SECTIONS):
+            if i >= count:
+                cols[name] = []
+                continue
+            offset, n = LEVEL_SECTION.unpack_from(view, LEVEL_HEADER.size + i * LEVEL_SECTION.size)
+            cols[name] = list(fmt.iter_unpack(view[offset:offset + n * fmt.size]))
+    finally:
+        view.release()
+
+    # starmap keeps the per-object loop in C for the plain constructors
+    paths = cols["paths"]
+    terrain_points = cols["terrain_points"]
+    ents = {
+        "platforms": list(starmap(Platform, cols["platforms"])),
+        "moving_platforms": [MovingPlatform(x, y, w, h, path=paths[first:first + n], speed=speed)
+                             for x, y, w, h, speed, first, n in cols["moving_platforms"]],
+        "slopes": [Slope(x, y, w, h, SLOPE_TYPES[t]) for x, y, w, h, t in cols["slopes"]],
+        "ladders": list(starmap(Ladder, cols["ladders"])),
+        "enemies": [Enemy(x, y, w, h, (pl, pr), speed) for x, y, w, h, pl, pr, speed in cols["enemies"]],
+        "coins": list(starmap(Coin, cols["coins"]))
+                 + [PICKUP_TYPES[PICKUP_KINDS[k]](x, y, r) for x, y, r, k in cols["pickups"]],
+        "terrains": [Terrain(terrain_points[first:first + n]) for first, n in cols["terrains"]],
+    }
+    return width, height, (sx, sy), ents
+
+def read_level_file(path):
+    """Memory-map a level file and unpack it."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return unpack_level(mm)
+
+def save_level(world, path):
+    """Export a live World (alive enemies and uncollected coins only) to a level file."""
+    data = pack_level(world_records(world), world.width, world.height, world.spawn_point)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def load_level(path):
+    """Create a World from a level file."""
+    width, height, spawn_point, ents = read_level_file(path)
+    world = World(create_demo=False)
+    world.width = width
+    world.height = height
+    world.spawn_point = spawn_point
+    for kind in ENTITY_KINDS:
+        setattr(world, kind, ents[kind])
+    world.index_entities()
+    return world
+
+# ----- CHUNK STREAMING -----
+# A streamed level lives in a directory: level.json holds the size and spawn
+# point, and every non-empty CHUNK_SIZE square region is its own c_<cx>_<cy>.lvl
+# level file. Only chunks near the camera are ever in memory.
+def chunk_of(x, y):
+    return int(x // CHUNK_SIZE), int(y // CHUNK_SIZE)
+
+def chunks_in_rect(left, top, right, bottom):
+    cx0, cy0 = chunk_of(left, top)
+    cx1, cy1 = chunk_of(right, bottom)
+    return {(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)}
+
+def split_records(rec):
+    """Bucket level records into per-chunk records.
+
+    Static platforms and terrains are clipped at chunk borders so that a long
+    floor or range of hills is solid wherever the player is; everything else
+    goes to the chunk that holds its centre (or its position, for coins).
+    """
+    chunks = {}
+    def bucket(key):
+        if key not in chunks:
+            chunks[key] = {kind: [] for kind in ENTITY_KINDS}
+        return chunks[key]
+
+    for x, y, w, h in rec.get("platforms", ()):
+        for key in chunks_in_rect(x, y, x + w - 1, y + h - 1):
+            left = max(x, key[0] * CHUNK_SIZE)
+            top = max(y, key[1] * CHUNK_SIZE)
+            right = min(x + w, (key[0] + 1) * CHUNK_SIZE)
+            bottom = min(y + h, (key[1] + 1) * CHUNK_SIZE)
+            bucket(key)["platforms"].append([left, top, right - left, bottom - top])
+    for points in rec.get("terrains", ()):
+        xs = [pt[0] for pt in points]
+        ys = [pt[1] for pt in points]
+        for cx in range(int(xs[0] // CHUNK_SIZE), int(xs[-1] // CHUNK_SIZE) + 1):
+            left = max(xs[0], cx * CHUNK_SIZE)
+            right = min(xs[-1], (cx + 1) * CHUNK_SIZE)
+            if right <= left:
+                continue
+            piece = [[left, polyline_y(xs, ys, left)]]
+            piece.extend([x, y] for x, y in zip(xs, ys) if left < x < right)
+            piece.append([right, polyline_y(xs, ys, right)])
+            bucket(chunk_of(left, min(pt[1] for pt in piece)))["terrains"].append(piece)
+    for kind in ("moving_platforms", "slopes", "ladders", "enemies"):
+        for r in rec.get(kind, ()):
+            bucket(chunk_of(r[0] + r[2] / 2, r[1] + r[3] / 2))[kind].append(r)
+    for r in rec.get("coins", ()):
+        bucket(chunk_of(r[0], r[1]))["coins"].append(r)
+    return chunks
+
+class ChunkStore:
+    """Reads and writes the chunk files of one level directory."""
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, f"c_{key[0]}_{key[1]}.lvl")
+
+    def read_meta(self):
+        with open(os.path.join(self.directory, "level.json")) as f:
+            return json.load(f)
+
+    def write_meta(self, width, height, spawn_point):
+        os.makedirs(self.directory, exist_ok=True)
+        meta = {"width": width, "height": height, "chunk_size": CHUNK_SIZE, "spawn": list(spawn_point)}
+        with open(os.path.join(self.directory, "level.json"), "w") as f:
+            json.dump(meta, f)
+
+    def load(self, key):
+        """Entities of one chunk, built from its level file."""
+        try:
+            return read_level_file(self.path(key))[3]
+        except FileNotFoundError:
+            return {kind: [] for kind in ENTITY_KINDS}  # sparse level: nothing lives here
+
+    def write(self, key, rec):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(key), "wb") as f:
+            f.write(pack_level(rec))
+
+def export_chunked_level(world, directory):
+    """Write a live World out as a streamed level directory."""
+    store = ChunkStore(directory)
+    store.write_meta(world.width, world.height, world.spawn_point)
+    for key, chunk_rec in split_records(world_records(world)).items():
+        store.write(key, chunk_rec)
+
+def build_demo_level(directory, screens=200, seed=None):
+    """Generate a long demo level chunk by chunk, never holding it all in memory."""
+    rng = random.Random(seed)
+    store = ChunkStore(directory)
+    width = screens * WIDTH
+    height = WORLD_HEIGHT
+    store.write_meta(width, height, (120, height - 200))
+    for cx in range((width + CHUNK_SIZE - 1) // CHUNK_SIZE):
+        x0 = cx * CHUNK_SIZE
+        x1 = min(width, x0 + CHUNK_SIZE)
+        rec = {kind: [] for kind in ENTITY_KINDS}
+        rec["platforms"].append([x0, height - 64, x1 - x0, 64])
+        for i in range(4):
+            rec["platforms"].append([x0 + 60 + i * 250, rng.randint(300, height - 300), 150, 20])
+        if cx % 3 == 1:
+            y = height - 280
+            rec["moving_platforms"].append([x0 + 100, y, 140, 20, 1.2, [[x0 + 100, y], [x0 + 700, y - 100]]])
+        if cx % 4 == 2:
+            rec["slopes"].append([x0 + 400, height - 160, 300, 160, rng.choice(("left", "right"))])
+        if cx % 4 == 0:
+            # two rolling hills along the floor
+            amp = rng.randint(60, 160)
+            rec["terrains"].append([[x, height - 64 - amp * math.sin(2 * math.pi * (x - x0 - 100) / 800) ** 2]
+                                    for x in range(x0 + 100, x0 + 901, 20)])
+        if cx % 5 == 3:
+            rec["ladders"].append([x0 + 800, height - 300, 40, 180])
+        for i in range(3):
+            rec["enemies"].append([x0 + 100 + i * 340, height - 64 - 36, 36, 36, 40, 160,
+                                   1.1 + rng.random() * 0.4])
+        for i in range(14):
+            rec["coins"].append([rng.randint(x0, x1 - 1), rng.randint(100, height - 200), 10])
+        if cx % 3 == 0:
+            rec["coins"].append([rng.randint(x0, x1 - 1), rng.randint(200, height - 400), 12, "gem"])
+        for key, chunk_rec in split_records(rec).items():
+            store.write(key, chunk_rec)
+
+class Chunk:
+    def __init__(self, key, entities, removed):
+        self.key = key
+        self.entities = entities
+        # drop enemies killed / coins collected before this chunk was last unloaded
+        for i in removed.get("enemies", ()):
+            entities["enemies"][i].alive = False
+        for i in removed.get("coins", ()):
+            entities["coins"][i].collected = True
+
+    def removed(self):
+        """Indices of entities that must stay gone when the chunk is reloaded."""
+        return {
+            "enemies": {i for i, e in enumerate(self.entities["enemies"]) if not e.alive},
+            "coins": {i for i, c in enumerate(self.entities["coins"]) if c.collected},
+        }
+
+class ChunkedWorld(World):
+    """
+    World streamed from a level directory around the camera.
+
+    Chunks are read and built on a background thread; the main thread only
+    swaps finished chunks in (stream) and rebuilds the flat entity lists the
+    rest of the game iterates; the update scheduler then only ticks what is
+    near the player. With background=False chunks load inside
+    stream instead, which keeps runs reproducible. Moving entities belong to the chunk they were
+    stored in and restart from their stored position when it reloads.
+    """
+    def __init__(self, directory, background=True):
+        self.store = ChunkStore(directory)
+        self.background = background
+        meta = self.store.read_meta()
+        if meta.get("chunk_size", CHUNK_SIZE) != CHUNK_SIZE:
+            raise ValueError(f"level {directory} was built with chunk size {meta['chunk_size']}")
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.spawn_point = tuple(meta["spawn"])
+        self.chunks = {}
+        self.tiles = None
+        self.nav = None
+        self.scheduler = UpdateScheduler()
+        self.pickups = PickupIndex()
+        self.projectiles = ProjectilePool()
+        self._removed = {}  # key -> removed entity indices of unloaded chunks
+        self._pending = set()
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        for kind in ENTITY_KINDS:
+            setattr(self, kind, [])
+        if background:
+            self._worker = threading.Thread(target=self._load_worker, daemon=True)
+            self._worker.start()
+        # the spawn area is loaded synchronously so the player has ground to stand on
+        sx, sy = self.spawn_point
+        for key in self._wanted(sx - WIDTH // 2, sy - HEIGHT // 2, CHUNK_LOAD_MARGIN):
+            self._add_chunk(self._load_chunk(key))
+        self._rebuild()
+
+    def _load_worker(self):
+        while True:
+            key = self._requests.get()
+            if key is None:
+                return
+            try:
+                self._results.put(self._load_chunk(key))
+            except Exception as e:
+                print("Could not load chunk", key, e)
+                self._results.put(Chunk(key, {kind: [] for kind in ENTITY_KINDS}, {}))
+
+    def _load_chunk(self, key):
+        return Chunk(key, self.store.load(key), self._removed.get(key, {}))
+
+    def _wanted(self, x, y, margin):
+        left = max(0, x - margin)
+        top = max(0, y - margin)
+        right = min(self.width - 1, x + WIDTH + margin)
+        bottom = min(self.height - 1, y + HEIGHT + margin)
+        return chunks_in_rect(left, top, right, bottom)
+
+    def _add_chunk(self, chunk):
+        self._pending.discard(chunk.key)
+        self._removed.pop(chunk.key, None)
+        self.chunks[chunk.key] = chunk
+
+    def _rebuild(self):
+        for kind in ENTITY_KINDS:
+            setattr(self, kind, [])
+        for chunk in self.chunks.values():
+            ents = chunk.entities
+            self.platforms.extend(ents["platforms"])
+            self.moving_platforms.extend(ents["moving_platforms"])
+            self.slopes.extend(ents["slopes"])
+            self.ladders.extend(ents["ladders"])
+            self.enemies.extend(e for e in ents["enemies"] if e.alive)
+            self.coins.extend(c for c in ents["coins"] if not c.collected)
+            self.terrains.extend(ents["terrains"])
+        self.index_entities()
+
+    def stream(self, cam):
+        """Request chunks entering the load margin, swap in finished loads and drop far chunks."""
+        changed = False
+        keep = self._wanted(cam.x, cam.y, CHUNK_UNLOAD_MARGIN)
+        while True:
+            try:
+                chunk = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if chunk.key in keep:
+                self._add_chunk(chunk)
+                changed = True
+            else:
+                self._pending.discard(chunk.key)  # camera moved on while it was loading
+
+        for key in self._wanted(cam.x, cam.y, CHUNK_LOAD_MARGIN):
+            if key not in self.chunks and key not in self._pending:
+                if self.background:
+                    self._pending.add(key)
+                    self._requests.put(key)
+                else:
+                    self._add_chunk(self._load_chunk(key))
+                    changed = True
+
+        for key in [k for k in self.chunks if k not in keep]:
+            removed = self.chunks.pop(key).removed()
+            if removed["enemies"] or removed["coins"]:
+                self._removed[key] = removed
+            changed = True
+
+        if changed:
+            self._rebuild()
+
+    def close(self):
+        self._requests.put(None)
+
+# ----- TILE MAP -----
+# A tile world lives in a directory like a streamed level: tiles.json holds
+# the size, seed and spawn point, and t_<cx>_<cy>.bin the zlib-compressed
+# tile ids of every chunk that was ever edited. Chunks nobody edited are
+# generated from the seed when first needed, so a world of millions of tiles
+# starts out as one small JSON file.
+TILE_AIR, TILE_DIRT, TILE_STONE, TILE_GRASS = range(4)
+TILE_META = "tiles.json"
+
+class TileChunk:
+    """TILE_CHUNK x TILE_CHUNK tile ids in one bytearray, row by row, plus what is derived from them."""
+    __slots__ = ("tiles", "runs", "solids", "surfaces", "edited")
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.runs = None  # per row, (first, end, id) runs of one solid tile id: the collision and draw cache
+        self.solids = None  # per row, None or the runs as world-space Platforms, made by TileMap.platforms_in
+        self.surfaces = {}  # render scale -> the chunk pre-drawn
+        self.edited = False  # differs from the store
+
+    def __getstate__(self):
+        # copies (lockstep snapshots) carry only the tiles; caches are rebuilt when used
+        return self.tiles, self.edited
+
+    def __setstate__(self, state):
+        self.tiles, self.edited = state
+        self.runs = self.solids = None
+        self.surfaces = {}
+
+    def touch(self):
+        """The tiles changed: this chunk alone is re-run and redrawn when next used."""
+        self.runs = self.solids = None
+        self.surfaces.clear()
+        self.edited = True
+
+    def row_runs(self):
+        if self.runs is None:
+            n = TILE_CHUNK
+            tiles = self.tiles
+            self.runs = []
+            for row in range(n):
+                line = tiles[row * n:(row + 1) * n]
+                runs = []
+                first = 0
+                while first < n:
+                    t = line[first]
+                    end = first + 1
+                    while end < n and line[end] == t:
+                        end += 1
+                    if t != TILE_AIR:
+                        runs.append((first, end, t))
+                    first = end
+                self.runs.append(runs)
+        return self.runs
+
+    def surface(self, scale):
+        surf = self.surfaces.get(scale)
+        if surf is None:
+            tile = TILE_SIZE * scale
+            size = math.ceil(TILE_CHUNK * tile)
+            surf = pygame.Surface((size, size))
+            surf.fill(TILE_KEY_COL)
+            # one fill per run of equal tiles rather than one per tile
+            for row, runs in enumerate(self.row_runs()):
+                top = math.floor(row * tile)
+                height = math.floor((row + 1) * tile) - top
+                for first, end, t in runs:
+                    left = math.floor(first * tile)
+                    surf.fill(TILE_COLORS[t], (left, top, math.floor(end * tile) - left, height))
+            surf.set_colorkey(TILE_KEY_COL, pygame.RLEACCEL)
+            self.surfaces[scale] = surf
+        return surf
+
+class TileStore:
+    """Reads and writes the files of one tile world directory."""
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, f"t_{key[0]}_{key[1]}.bin")
+
+    def read_meta(self):
+        with open(os.path.join(self.directory, TILE_META)) as f:
+            return json.load(f)
+
+    def write_meta(self, width, height, seed, spawn_point):
+        os.makedirs(self.directory, exist_ok=True)
+        meta = {"width": width, "height": height, "tile_size": TILE_SIZE, "tile_chunk": TILE_CHUNK,
+                "seed": seed, "spawn": list(spawn_point)}
+        with open(os.path.join(self.directory, TILE_META), "w") as f:
+            json.dump(meta, f)
+
+    def load(self, key):
+        """Saved tile ids of one chunk, None if it was never edited."""
+        try:
+            with open(self.path(key), "rb") as f:
+                return bytearray(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, tiles):
+        # via a temporary file, so a crash never leaves half a chunk behind
+        path = self.path(key)
+        with open(path + ".tmp", "wb") as f:
+            f.write(zlib.compress(tiles))
+        os.replace(path + ".tmp", path)
+
+class TileMap:
+    """
+    The tile terrain of a world, kept chunk by chunk. A tile lookup is a dict
+    lookup and a byte index; an edit only marks its own chunk, so collision
+    runs, the pre-drawn surface and the saved file of that one chunk are
+    rebuilt while every other chunk keeps its caches. Chunks come from the
+    store if they were edited before and are generated otherwise.
+    """
+    def __init__(self, width, height, seed=0, store=None, persist=True):
+        self.cols = width // TILE_SIZE
+        self.rows = height // TILE_SIZE
+        self.seed = seed
+        self.store = store
+        self.persist = persist and store is not None
+        self.chunks = {}  # (cx, cy) -> TileChunk
+        rng = random.Random(seed)
+        self.phases = [rng.uniform(0, 2 * math.pi) for _ in range(5)]
+        self.redraws = 0  # chunk surfaces drawn, for the stats line
+
+    # --- generation ---
+    def surface_row(self, tx):
+        """Row of the top solid tile of column tx in the generated world."""
+        p = self.phases
+        wave = math.sin(tx * 0.013 + p[0]) * 10 + math.sin(tx * 0.041 + p[1]) * 4 + math.sin(tx * 0.11 + p[2]) * 1.5
+        return int(self.rows * 0.6 + wave)
+
+    def generate(self, cx, cy):
+        n = TILE_CHUNK
+        p = self.phases
+        tiles = bytearray(n * n)
+        for col in range(n):
+            tx = cx * n + col
+            if not 0 <= tx < self.cols:
+                continue
+            top = self.surface_row(tx)
+            cave = math.sin(tx * 0.09 + p[3])
+            for row in range(n):
+                ty = cy * n + row
+                depth = ty - top
+                if depth < 0 or ty >= self.rows:
+                    continue
+                if depth > 3 and ty < self.rows - 2 and cave * math.sin(ty * 0.15 + p[4]) > 0.6:
+                    continue
+                tiles[row * n + col] = TILE_GRASS if depth == 0 else TILE_DIRT if depth < 6 else TILE_STONE
+        return tiles
+
+    # --- access ---
+    def chunk(self, cx, cy):
+        c = self.chunks.get((cx, cy))
+        if c is None:
+            tiles = self.store.load((cx, cy)) if self.store else None
+            c = self.chunks[(cx, cy)] = TileChunk(tiles if tiles is not None else self.generate(cx, cy))
+        return c
+
+    def tile(self, tx, ty):
+        if not (0 <= tx < self.cols and 0 <= ty < self.rows):
+            return TILE_AIR
+        n = TILE_CHUNK
+        c = self.chunks.get((tx // n, ty // n)) or self.chunk(tx // n, ty // n)
+        return c.tiles[ty % n * n + tx % n]
+
+    def tile_at(self, x, y):
+        return self.tile(int(x // TILE_SIZE), int(y // TILE_SIZE))
+
+    def blocks(self, x1, y1, x2, y2):
+        """
+        Whether the segment crosses a solid tile. Walks it one tile at a time
+        (a DDA), so a bullet moving further than a tile per tick cannot skip
+        a one-tile wall.
+        """
+        tx = int(x1 // TILE_SIZE)
+        ty = int(y1 // TILE_SIZE)
+        ex = int(x2 // TILE_SIZE)
+        ey = int(y2 // TILE_SIZE)
+        dx = x2 - x1
+        dy = y2 - y1
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # how far along the segment (0..1) the next column and row edge are crossed
+        if dx:
+            next_x = ((tx + (step_x > 0)) * TILE_SIZE - x1) / dx
+            each_x = TILE_SIZE / abs(dx)
+        else:
+            next_x = each_x = math.inf
+        if dy:
+            next_y = ((ty + (step_y > 0)) * TILE_SIZE - y1) / dy
+            each_y = TILE_SIZE / abs(dy)
+        else:
+            next_y = each_y = math.inf
+        tile = self.tile
+        if tile(tx, ty) != TILE_AIR:
+            return True
+        for _ in range(abs(ex - tx) + abs(ey - ty)):
+            if next_x < next_y:
+                tx += step_x
+                next_x += each_x
+            else:
+                ty += step_y
+                next_y += each_y
+            if tile(tx, ty) != TILE_AIR:
+                return True
+        return False
+
+    def set_tile(self, tx, ty, tile):
+        """Change one tile; False if it is outside the map or already that tile."""
+        if not (0 <= tx < self.cols and 0 <= ty < self.rows):
+            return False
+        n = TILE_CHUNK
+        c = self.chunk(tx // n, ty // n)
+        i = ty % n * n + tx % n
+        if c.tiles[i] == tile:
+            return False
+        c.tiles[i] = tile
+        c.touch()
+        return True
+
+    def platforms_in(self, rect):
+        """
+        Platforms standing in for the solid tile runs that overlap rect, for
+        Player collision. They are made once per chunk row and kept until the
+        chunk is touched, so the per-tick queries allocate no Platforms.
+        """
+        n = TILE_CHUNK
+        tx0 = max(0, rect.left // TILE_SIZE)
+        tx1 = min(self.cols - 1, (rect.right - 1) // TILE_SIZE)
+        ty0 = max(0, rect.top // TILE_SIZE)
+        ty1 = min(self.rows - 1, (rect.bottom - 1) // TILE_SIZE)
+        found = []
+        for ty in range(ty0, ty1 + 1):
+            for cx in range(tx0 // n, tx1 // n + 1):
+                base = cx * n
+                for first, end, platform in self._row_solids(cx, ty):
+                    if base + end > tx0 and base + first <= tx1:
+                        found.append(platform)
+        return found
+
+    def _row_solids(self, cx, ty):
+        """(first, end, Platform) for each run of tile row ty within chunk column cx, cached on the chunk."""
+        n = TILE_CHUNK
+        chunk = self.chunk(cx, ty // n)
+        rows = chunk.solids
+        if rows is None:
+            rows = chunk.solids = [None] * n
+        row = rows[ty % n]
+        if row is None:
+            x = cx * n * TILE_SIZE
+            y = ty * TILE_SIZE
+            row = rows[ty % n] = [
+                (first, end, Platform(x + first * TILE_SIZE, y, (end - first) * TILE_SIZE, TILE_SIZE))
+                for first, end, _ in chunk.row_runs()[ty % n]
+            ]
+        return row
+
+    def draw(self, surf, cam):
+        span = TILE_CHUNK * TILE_SIZE
+        s = cam.scale
+        w, h = surf.get_size()
+        cx0 = max(0, int(cam.x // span))
+        cx1 = min((self.cols - 1) // TILE_CHUNK, int((cam.x + w / s) // span))
+        cy0 = max(0, int(cam.y // span))
+        cy1 = min((self.rows - 1) // TILE_CHUNK, int((cam.y + h / s) // span))
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                chunk = self.chunk(cx, cy)
+                if s not in chunk.surfaces:
+                    self.redraws += 1
+                x, y = cam.to_screen(cx * span, cy * span)
+                surf.blit(chunk.surface(s), (math.floor(x), math.floor(y)))
+
+    # --- memory and disk ---
+    def keep(self, left, top, right, bottom):
+        """Drop the chunks outside the px rect; edited ones are saved first, or kept if they cannot be."""
+        self.keep_any(((left, top, right, bottom),))
+
+    def keep_any(self, boxes):
+        """keep() for several (left, top, right, bottom) px rects: a chunk inside any of them stays."""
+        span = TILE_CHUNK * TILE_SIZE
+        spans = [(l // span, t // span, r // span, b // span) for l, t, r, b in boxes]
+        for key in [k for k in self.chunks
+                    if not any(x0 <= k[0] <= x1 and y0 <= k[1] <= y1 for x0, y0, x1, y1 in spans)]:
+            chunk = self.chunks[key]
+            if chunk.edited:
+                if not self.persist:
+                    continue
+                self.store.write(key, chunk.tiles)
+            del self.chunks[key]
+
+    def save(self):
+        """Write every edited chunk to the store; returns how many were written."""
+        if not self.persist:
+            return 0
+        n = 0
+        for key, chunk in self.chunks.items():
+            if chunk.edited:
+                self.store.write(key, chunk.tiles)
+                chunk.edited = False
+                n += 1
+        return n
+
+class TileWorld(World):
+    """
+    A world whose ground is a TileMap from a tile world directory. Chunks
+    far from the camera are dropped and edited ones saved as it moves; with
+    persist=False edits stay in memory, so a recorded session replays from
+    the same tiles every time.
+    """
+    def __init__(self, directory, persist=True):
+        super().__init__(create_demo=False)
+        store = TileStore(directory)
+        meta = store.read_meta()
+        if (meta["tile_size"], meta["tile_chunk"]) != (TILE_SIZE, TILE_CHUNK):
+            raise ValueError(f"tile world {directory} was built with other tile or chunk sizes")
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.spawn_point = tuple(meta["spawn"])
+        self.tiles = TileMap(self.width, self.height, meta["seed"], store, persist)
+        self.index_entities()
+
+    def stream(self, cam):
+        m = CHUNK_UNLOAD_MARGIN
+        self.tiles.keep(cam.x - m, cam.y - m, cam.x + WIDTH + m, cam.y + HEIGHT + m)
+
+    def stream_around(self, centers):
+        w, h = WIDTH // 2 + CHUNK_UNLOAD_MARGIN, HEIGHT // 2 + CHUNK_UNLOAD_MARGIN
+        self.tiles.keep_any([(x - w, y - h, x + w, y + h) for x, y in centers])
+
+    def close(self):
+        self.tiles.save()
+
+def build_tile_world(directory, screens=200, seed=None):
+    """Write a new tile world: only its meta file, the tiles are generated as they are reached."""
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    width = screens * WIDTH // (TILE_SIZE * TILE_CHUNK) * TILE_SIZE * TILE_CHUNK
+    height = WORLD_HEIGHT
+    tiles = TileMap(width, height, seed)
+    spawn_x = 120
+    spawn = (spawn_x, tiles.surface_row(spawn_x // TILE_SIZE) * TILE_SIZE - 60)
+    TileStore(directory).write_meta(width, height, seed, spawn)
+    return tiles.cols * tiles.rows
+
+# ----- BACKGROUND -----
+GRID_SPACING = 160
+GRID_COL = (20, 30, 40)
+
+def make_grid_tile(spacing, color, fill=None, view=(WIDTH, HEIGHT)):
+    """Tileable grid surface, a whole number of cells at least as big as the view."""
+    w = spacing * -(-view[0] // spacing)
+    h = spacing * -(-view[1] // spacing)
+    if fill is None:
+        tile = pygame.Surface((w, h), pygame.SRCALPHA)
+    else:
+        tile = pygame.Surface((w, h))
+        if pygame.display.get_surface():
+            tile = tile.convert()
+        tile.fill(fill)
+    for x in range(0, w, spacing):
+        pygame.draw.line(tile, color, (x, 0), (x, h))
+    for y in range(0, h, spacing):
+        pygame.draw.line(tile, color, (0, y), (w, y))
+    return tile
+
+class BackgroundLayer:
+    """
+    A pre-rendered tile scrolled at `depth` times the camera movement
+    (1.0 moves with the world, smaller values lag behind for parallax).
+    """
+    def __init__(self, tile, depth=1.0):
+        self.tile = tile
+        self.depth = depth
+
+    def draw(self, surf, cam_x, cam_y, offset=(0, 0)):
+        tw, th = self.tile.get_size()
+        sw, sh = surf.get_size()
+        # wrap the scroll position into the tile; a tile at least the view's
+        # size then needs at most 2x2 blits
+        x0 = -int(cam_x * self.depth % tw) + offset[0]
+        y0 = -int(cam_y * self.depth % th) + offset[1]
+        if x0 > 0:
+            x0 -= tw
+        if y0 > 0:
+            y0 -= th
+        y = y0
+        while y < sh:
+            x = x0
+            while x < sw:
+                surf.blit(self.tile, (x, y))
+                x += tw
+            y += th
+
+def default_background(scale=1.0, view=(WIDTH, HEIGHT)):
+    # back to front; the first layer is opaque and replaces clearing the screen
+    spacing = max(2, round(GRID_SPACING * scale))
+    return [BackgroundLayer(make_grid_tile(spacing, GRID_COL, fill=BG, view=view), depth=1.0)]
+
+# ----- LIGHTING -----
+LIGHT_SPRITES = {}  # (radius, color) -> radial falloff at light map resolution
+
+def light_sprite(radius, color):
+    key = (radius, color)
+    sprite = LIGHT_SPRITES.get(key)
+    if sprite is None:
+        r = max(1, round(radius / LIGHT_TEXEL))
+        sprite = pygame.Surface((2 * r + 1, 2 * r + 1))
+        sprite.fill((0, 0, 0))
+        # outer rings first, each brighter one drawn over the last: (1 - d/r)² falloff
+        for ring in range(r, 0, -1):
+            k = (1 - ring / (r + 1)) ** 2
+            pygame.draw.circle(sprite, tuple(int(c * k) for c in color), (r, r), ring)
+        LIGHT_SPRITES[key] = sprite
+    return sprite
+
+def cast_shadows(layer, lx, ly, rects, far):
+    """
+    Black out on layer what rects hide from the light at (lx, ly): for each
+    edge facing away from the light, the quad from the edge to its corners
+    pushed `far` px out. layer is the light's sprite; its centre is the light.
+    """
+    half = layer.get_width() // 2
+    ox = lx - half * LIGHT_TEXEL
+    oy = ly - half * LIGHT_TEXEL
+    t = LIGHT_TEXEL
+    for r in rects:
+        left, top, right, bottom = r.left, r.top, r.right, r.bottom
+        if left <= lx < right and top <= ly < bottom:
+            continue
+        corners = ((left, top), (right, top), (right, bottom), (left, bottom))
+        projected = []
+        for x, y in corners:
+            dx = x - lx
+            dy = y - ly
+            k = far / max(1.0, math.hypot(dx, dy))
+            projected.append((x + dx * k, y + dy * k))
+        # top, right, bottom, left edge; each is back-facing when the light is not in front of it
+        for i, back in enumerate((ly >= top, lx <= right, ly <= bottom, lx >= left)):
+            if back:
+                j = (i + 1) % 4
+                quad = (corners[i], corners[j], projected[j], projected[i])
+                pygame.draw.polygon(layer, (0, 0, 0), [((x - ox) / t, (y - oy) / t) for x, y in quad])
+
+class Lighting:
+    """
+    Darkness over the world. Light is summed on a map with one texel per
+    LIGHT_TEXEL world px, from pre-drawn falloff sprites and additive blits,
+    then smoothly stretched over the frame and multiplied onto it, so no
+    per-pixel work happens in Python. Pickup glows only change when a pickup
+    goes, so each pickup cell keeps its glows pre-summed; the lanterns, which
+    cast shadows from platforms and tiles, and bullet glows are redrawn each
+    frame.
+    """
+    def __init__(self, ambient=LIGHT_AMBIENT):
+        self.ambient = ambient
+        self.cells = {}  # pickup cell -> (what its glows were summed from, surface)
+        self.built = 0  # pickup cells summed, for the stats line
+        self.lights = 0  # lights drawn in the last frame
+        self._map = None
+        self._stretched = None
+        self._casters = {}  # LIGHT_CELL cell -> static platforms overlapping it
+        self._indexed = None  # the platform list _casters was built from, and its length
+        self._indexed_len = 0
+
+    def glow_cell(self, key, pickups):
+        """The summed glows of one pickup cell; spills PICKUP_LIGHT_RADIUS into its neighbours."""
+        made_from = tuple((p.kind, p.pos.x, p.pos.y) for p in pickups)
+        cached = self.cells.get(key)
+        if cached is not None and cached[0] == made_from:
+            return cached[1]
+        t = LIGHT_TEXEL
+        margin = math.ceil(PICKUP_LIGHT_RADIUS / t) + 1
+        size = PICKUP_CELL // t + 2 * margin
+        surf = pygame.Surface((size, size))
+        surf.fill((0, 0, 0))
+        x0 = key[0] * PICKUP_CELL // t - margin
+        y0 = key[1] * PICKUP_CELL // t - margin
+        for p in pickups:
+            sprite = light_sprite(PICKUP_LIGHT_RADIUS, p.color)
+            half = sprite.get_width() // 2
+            surf.blit(sprite, (int(p.pos.x // t) - x0 - half, int(p.pos.y // t) - y0 - half),
+                      special_flags=pygame.BLEND_RGB_ADD)
+        if len(self.cells) >= LIGHT_CACHE_CELLS:
+            self.cells.clear()
+        self.cells[key] = (made_from, surf)
+        self.built += 1
+        return surf
+
+    def occluders(self, world, area):
+        """Rects of everything that casts a shadow inside area."""
+        plats = world.platforms
+        # streamed worlds replace the list whenever chunks come and go
+        if plats is not self._indexed or len(plats) != self._indexed_len:
+            self._casters = casters = {}
+            for p in plats:
+                r = p.rect
+                for cx in range(r.left // LIGHT_CELL, (r.right - 1) // LIGHT_CELL + 1):
+                    for cy in range(r.top // LIGHT_CELL, (r.bottom - 1) // LIGHT_CELL + 1):
+                        cell = casters.get((cx, cy))
+                        if cell is None:
+                            cell = casters[(cx, cy)] = []
+                        cell.append(p)
+            self._indexed = plats
+            self._indexed_len = len(plats)
+        found = set()
+        for cx in range(area.left // LIGHT_CELL, (area.right - 1) // LIGHT_CELL + 1):
+            for cy in range(area.top // LIGHT_CELL, (area.bottom - 1) // LIGHT_CELL + 1):
+                for p in self._casters.get((cx, cy), ()):
+                    if area.colliderect(p.rect):
+                        found.add(p)
+        rects = [p.rect for p in found]
+        rects.extend(p.rect for p in world.moving_platforms if area.colliderect(p.rect))
+        if world.tiles is not None:
+            rects.extend(p.rect for p in world.tiles.platforms_in(area))
+        return rects
+
+    def draw(self, surf, cam, world, players):
+        t = LIGHT_TEXEL
+        s = cam.scale
+        w, h = surf.get_size()
+        view_w = w / s
+        view_h = h / s
+        # the map is aligned to whole texels of the world so cached cells line up
+        ox = math.floor(cam.x / t)
+        oy = math.floor(cam.y / t)
+        size = (math.ceil(view_w / t) + 2, math.ceil(view_h / t) + 2)
+        if self._map is None or self._map.get_size() != size:
+            self._map = pygame.Surface(size)
+        light_map = self._map
+        light_map.fill(self.ambient)
+        add = pygame.BLEND_RGB_ADD
+        lights = 0
+
+        # pickup glows, pre-summed per cell
+        reach = PICKUP_LIGHT_RADIUS
+        cells = world.pickups.cells
+        margin = math.ceil(PICKUP_LIGHT_RADIUS / t) + 1
+        for cx in range(int((cam.x - reach) // PICKUP_CELL), int((cam.x + view_w + reach) // PICKUP_CELL) + 1):
+            for cy in range(int((cam.y - reach) // PICKUP_CELL), int((cam.y + view_h + reach) // PICKUP_CELL) + 1):
+                pickups = cells.get((cx, cy))
+                if pickups:
+                    light_map.blit(self.glow_cell((cx, cy), pickups),
+                                   (cx * PICKUP_CELL // t - margin - ox, cy * PICKUP_CELL // t - margin - oy),
+                                   special_flags=add)
+                    lights += len(pickups)
+
+        # lanterns, with shadows
+        for player in players:
+            lx, ly = player.rect.centerx, player.rect.top + 12
+            sprite = light_sprite(LANTERN_RADIUS, LANTERN_COL)
+            half = sprite.get_width() // 2
+            area = pygame.Rect(lx - half * t, ly - half * t, sprite.get_width() * t, sprite.get_height() * t)
+            layer = sprite.copy()
+            cast_shadows(layer, lx, ly, self.occluders(world, area), LANTERN_RADIUS * 1.5)
+            light_map.blit(layer, (lx // t - half - ox, ly // t - half - oy), special_flags=add)
+            lights += 1
+
+        # bullet glows, no shadows
+        shots = world.projectiles
+        if shots.count:
+            sprite = light_sprite(PROJECTILE_LIGHT_RADIUS, PROJECTILE_COL)
+            half = sprite.get_width() // 2
+            left = cam.x - PROJECTILE_LIGHT_RADIUS
+            top = cam.y - PROJECTILE_LIGHT_RADIUS
+            right = cam.x + view_w + PROJECTILE_LIGHT_RADIUS
+            bottom = cam.y + view_h + PROJECTILE_LIGHT_RADIUS
+            blits = [(sprite, (int(x // t) - half - ox, int(y // t) - half - oy))
+                     for x, y in zip(shots.xs[:shots.count], shots.ys[:shots.count])
+                     if left <= x < right and top <= y < bottom]
+            del blits[LIGHT_MAX_BULLETS:]
+            for sprite, pos in blits:
+                light_map.blit(sprite, pos, special_flags=add)
+            lights += len(blits)
+
+        # stretch over the frame, texel corners on their world positions, and multiply
+        big = (round(size[0] * t * s), round(size[1] * t * s))
+        if self._stretched is None or self._stretched.get_size() != big:
+            self._stretched = pygame.Surface(big)
+        pygame.transform.smoothscale(light_map, big, self._stretched)
+        surf.blit(self._stretched, (round((ox * t - cam.x) * s), round((oy * t - cam.y) * s)),
+                  special_flags=pygame.BLEND_RGB_MULT)
+        self.lights = lights
+
+# ----- RENDER TARGET -----
+class RenderTarget:
+    """
+    Offscreen surface the world is drawn into at `scale` times the window
+    size and then stretched onto it. With auto, record() moves the scale
+    through RENDER_SCALES to hold target_fps: down as soon as frames run
+    over budget, back up once the larger size (cost ~ scale²) should fit.
+    A step down that did not make frames faster (the time went somewhere
+    other than filling pixels) is undone and not retried until a step up.
+    """
+    def __init__(self, size, scale=1.0, auto=True, target_fps=RENDER_TARGET_FPS):
+        self.size = size
+        self.auto = auto
+        self.scales = tuple(sorted(set(RENDER_SCALES) | {scale})) if auto else (scale,)
+        self.level = self.scales.index(scale)
+        self.budget = 1000.0 / target_fps  # ms
+        self.frame_ms = None  # moving average of recorded frame times
+        self.cooldown = 0
+        self.floor = 0  # lowest level worth trying
+        self.before_ms = None  # average before the last step down, until it has been judged
+        self._surfaces = {}  # scale -> surface, kept so stepping back and forth allocates nothing
+
+    @property
+    def scale(self):
+        return self.scales[self.level]
+
+    def surface(self):
+        scale = self.scale
+        if scale not in self._surfaces:
+            w, h = self.size
+            surf = pygame.Surface((max(1, round(w * scale)), max(1, round(h * scale))))
+            if pygame.display.get_surface():
+                surf = surf.convert()
+            self._surfaces[scale] = surf
+        return self._surfaces[scale]
+
+    def present(self, dst):
+        """Stretch the internal surface over dst."""
+        pygame.transform.scale(self.surface(), dst.get_size(), dst)
+
+    def record(self, frame_ms):
+        """Feed the time one frame took to simulate and draw; True if the scale changed."""
+        if self.frame_ms is None:
+            self.frame_ms = frame_ms
+        else:
+            self.frame_ms += (frame_ms - self.frame_ms) * 0.1
+        if not self.auto:
+            return False
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+        before, self.before_ms = self.before_ms, None
+        if before is not None and self.frame_ms > before * 0.95:
+            self.level += 1
+            self.floor = self.level
+            self.frame_ms = before
+            self.cooldown = RENDER_COOLDOWN
+            return True
+        old = self.scale
+        if self.frame_ms > self.budget * RENDER_HEADROOM and self.level > self.floor:
+            self.level -= 1
+            self.before_ms = self.frame_ms
+        elif (self.level < len(self.scales) - 1
+              and self.frame_ms * (self.scales[self.level + 1] / old) ** 2 < self.budget * RENDER_RAISE):
+            self.level += 1
+            self.floor = 0
+        else:
+            return False
+        # expect the new size's cost straight away instead of waiting for the average to catch up
+        self.frame_ms *= (self.scale / old) ** 2
+        self.cooldown = RENDER_COOLDOWN
+        return True
 
 # ----- GAME -----
 def draw_ui(surf, score, lives, cam):
@@ -609,146 +3165,474 @@ def draw_ui(surf, score, lives, cam):
     pos = FONT.render(f"Cam: {int(cam.x)},{int(cam.y)}", True, UI_COL)
     surf.blit(pos, (12, 60))
 
-def main():
-    world = World()
-    player = Player(*world.spawn_point)
-    cam = Camera(WORLD_WIDTH, WORLD_HEIGHT)
-    score = 0
-    lives = 3
-    paused = False
-    show_hitboxes = False
-
-    while True:
-        dt = CLOCK.tick(60)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
-                if event.key == pygame.K_SPACE:
-                    player.jump()
-                if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
-                    # dash in facing direction or input direction
-                    keys = pygame.key.get_pressed()
-                    dash_dir = pygame.Vector2(0, 0)
-                    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-                        dash_dir.x -= 1
-                    if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-                        dash_dir.x += 1
-                    if keys[pygame.K_w] or keys[pygame.K_UP]:
-                        dash_dir.y -= 1
-                    if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-                        dash_dir.y += 1
-                    player.dash(dash_dir)
-                if event.key == pygame.K_p:
-                    paused = not paused
-                if event.key == pygame.K_h:
-                    show_hitboxes = not show_hitboxes
-
-        keys = pygame.key.get_pressed()
-
-        if not paused:
-            world.update(dt)
-            player.update(keys, dt, world)
-            cam.update(player.rect)
-
-            # coin pickups
-            for coin in world.coins:
-                if not coin.collected:
-                    if player.rect.collidepoint(coin.pos.x, coin.pos.y):
-                        coin.collected = True
-                        score += 1
-
-            # enemy collisions with a slightly reduced hitbox to avoid corner-tunneling
-            for enemy in world.enemies:
-                if enemy.alive:
-                    # shrink enemy hitbox a bit for fairness and reliability
-                    hitbox = enemy.rect.inflate(-6, -6)
-                    if player.rect.colliderect(hitbox):
-                        # if player is falling and hits enemy from above -> enemy dies
-                        if player.vel.y > 0 and player.rect.bottom <= enemy.rect.top + 12:
-                            enemy.alive = False
-                            # bounce the player up a little
-                            player.vel.y = PLAYER_JUMP / 2
-                            player.on_ground = False
-                        else:
-                            player.hurt(enemy.rect)
-
-            # remove dead enemies
-            world.enemies = [e for e in world.enemies if e.alive]
-
-            # death / respawn if below world
-            if player.rect.top > WORLD_HEIGHT + 300:
-                lives -= 1
-                player = Player(*world.spawn_point)
-                if lives <= 0:
-                    # reset everything
-                    lives = 3
-                    score = 0
-                    world = World()
-
-        # DRAW
-        SCREEN.fill(BG)
+# ----- INPUT -----
+# Everything the simulation reads from the keyboard in one tick, as two small
+# bitmasks so it can be recorded and fed back in unchanged.
+HELD_KEYS = (pygame.K_a, pygame.K_LEFT, pygame.K_d, pygame.K_RIGHT,
+             pygame.K_w, pygame.K_UP, pygame.K_s, pygame.K_DOWN)
+HELD_BITS = {k: 1 << i for i, k in enumerate(HELD_KEYS)}
+EV_JUMP = 1
+EV_DASH = 2
+EV_PAUSE = 4
+EV_HITBOXES = 8
+EV_FIRE = 16
+EV_DIG = 32
+EV_PLACE = 64
+
+class TickInput:
+    def __init__(self, held=0, events=0):
+        self.held = held
+        self.events = events
+
+    @classmethod
+    def from_keyboard(cls, events=0):
+        pressed = pygame.key.get_pressed()
+        held = 0
+        for k, bit in HELD_BITS.items():
+            if pressed[k]:
+                held |= bit
+        return cls(held, events)
+
+    def __getitem__(self, key):
+        # lets Player.update index it like pygame.key.get_pressed()
+        return bool(self.held & HELD_BITS.get(key, 0))
+
+class Game:
+    """One play session: world, player, camera and score, advanced one tick at a time."""
+    def __init__(self, level=None, background_streaming=True, world=None, chase=True):
+        self.level = level
+        self.background_streaming = background_streaming
+        self.chase = chase  # enemies chase players; sessions recorded before this existed replay without
+        self.world = world if world is not None else self.make_world()
+        self.player = Player(*self.world.spawn_point)
+        self.cam = Camera(self.world.width, self.world.height)
+        self.score = 0
+        self.lives = 3
+        self.paused = False
+        self.show_hitboxes = False
+        self.ticks = 0
+        self.fx_rng = random.Random()  # render-only randomness stays out of the simulation
+        self.backgrounds = {}  # render scale -> layers, built on first draw; headless runs never need them
+        self.view = Camera(self.world.width, self.world.height)  # camera plus screen shake, for drawing
+        self.lighting = None  # Lighting, when the world is dark; drawing only, like the backgrounds
+        self.pickup_handlers = {}  # pickup kind -> callback(pickup)
+        self.on_pickup("coin", self.add_score)
+        self.on_pickup("gem", self.add_score)
+        self.on_pickup("heart", self.add_life)
+
+    def on_pickup(self, kind, callback):
+        """Run callback(pickup) whenever the player collects a pickup of this kind."""
+        self.pickup_handlers[kind] = callback
+
+    def add_score(self, pickup):
+        self.score += pickup.value
+
+    def add_life(self, pickup):
+        self.lives += 1
+
+    def make_world(self):
+        if not self.level:
+            world = World()
+        elif os.path.isdir(self.level):
+            if os.path.exists(os.path.join(self.level, TILE_META)):
+                # edits of a recorded session must not change the world its replay starts from
+                world = TileWorld(self.level, persist=self.background_streaming)
+            else:
+                world = ChunkedWorld(self.level, background=self.background_streaming)
+        else:
+            world = load_level(self.level)
+        if self.chase:
+            world.enable_navigation()
+        return world
+
+    def players(self):
+        """Every player in the world, drawn in this order."""
+        return (self.player,)
+
+    def apply_actions(self, player, inp):
+        """The one-shot moves of a tick's input: jump and dash."""
+        if inp.events & EV_JUMP:
+            player.jump()
+        if inp.events & EV_DASH:
+            # dash in facing direction or input direction
+            dash_dir = pygame.Vector2(0, 0)
+            if inp[pygame.K_a] or inp[pygame.K_LEFT]:
+                dash_dir.x -= 1
+            if inp[pygame.K_d] or inp[pygame.K_RIGHT]:
+                dash_dir.x += 1
+            if inp[pygame.K_w] or inp[pygame.K_UP]:
+                dash_dir.y -= 1
+            if inp[pygame.K_s] or inp[pygame.K_DOWN]:
+                dash_dir.y += 1
+            player.dash(dash_dir)
+        if inp.events & EV_FIRE:
+            self.fire(player)
+        if inp.events & (EV_DIG | EV_PLACE) and self.world.tiles is not None:
+            self.edit_tile(player, inp, TILE_AIR if inp.events & EV_DIG else TILE_DIRT)
+
+    def fire(self, player):
+        """Shoot one bullet from the player's front the way it faces."""
+        x = player.rect.right if player.facing >= 0 else player.rect.left
+        self.world.projectiles.spawn(x, player.rect.centery - 6, player.facing * PROJECTILE_SPEED, 0.0)
+
+    def edit_tile(self, player, inp, tile):
+        """Dig out or place the tile in front of the player, or below / above it with down / up held."""
+        r = player.rect
+        if inp[pygame.K_s] or inp[pygame.K_DOWN]:
+            x, y = r.centerx, r.bottom + TILE_SIZE // 2
+        elif inp[pygame.K_w] or inp[pygame.K_UP]:
+            x, y = r.centerx, r.top - TILE_SIZE // 2
+        else:
+            x, y = r.centerx + player.facing * (r.width // 2 + TILE_SIZE // 2), r.centery
+        tx, ty = int(x // TILE_SIZE), int(y // TILE_SIZE)
+        if tile != TILE_AIR and any(p.rect.colliderect((tx * TILE_SIZE, ty * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+                                    for p in self.players()):
+            return  # never wall a player in
+        self.world.tiles.set_tile(tx, ty, tile)
+
+    def interact(self, player):
+        """Pickups and enemy contact for one player after it moved."""
+        world = self.world
+        # pickups: only the index cells under the player are tested
+        for p in world.pickups.collect(player.rect):
+            handler = self.pickup_handlers.get(p.kind)
+            if handler:
+                handler(p)
+
+        # enemy collisions with a slightly reduced hitbox to avoid corner-tunneling
+        for enemy in world.enemies:
+            if enemy.alive:
+                # shrink enemy hitbox a bit for fairness and reliability
+                hitbox = enemy.rect.inflate(-6, -6)
+                if player.rect.colliderect(hitbox):
+                    # if player is falling and hits enemy from above -> enemy dies
+                    if player.vel.y > 0 and player.rect.bottom <= enemy.rect.top + 12:
+                        enemy.alive = False
+                        # bounce the player up a little
+                        player.vel.y = PLAYER_JUMP / 2
+                        player.on_ground = False
+                    else:
+                        player.hurt(enemy.rect)
+
+    def step(self, inp, dt):
+        player = self.player
+        self.apply_actions(player, inp)
+        if inp.events & EV_PAUSE:
+            self.paused = not self.paused
+        if inp.events & EV_HITBOXES:
+            self.show_hitboxes = not self.show_hitboxes
+        self.ticks += 1
+        if self.paused:
+            return
 
+        world = self.world
+        world.update(dt, player.rect.center, self.players())
+        player.update(inp, dt, world)
+        self.cam.update(player.rect)
+        world.stream(self.cam)
+        self.interact(player)
+
+        # remove dead enemies
+        world.enemies = [e for e in world.enemies if e.alive]
+
+        # death / respawn if below world
+        if player.rect.top > world.height + 300:
+            self.lives -= 1
+            self.player = Player(*world.spawn_point)
+            if self.lives <= 0:
+                # reset everything
+                self.lives = 3
+                self.score = 0
+                self.close()
+                self.world = self.make_world()
+
+    def checksum(self):
+        """CRC of the simulation state, used to spot replay divergence."""
+        crc = 0
+        for p in self.players():
+            crc = zlib.crc32(struct.pack("<4i2d5i", p.rect.x, p.rect.y, p.rect.width, p.rect.height,
+                                         p.vel.x, p.vel.y, p.health, p.jump_count, self.score, self.lives,
+                                         len(p.particles)), crc)
+        for e in self.world.enemies:
+            crc = zlib.crc32(struct.pack("<2i", e.rect.x, e.rect.y), crc)
+        for mp in self.world.moving_platforms:
+            crc = zlib.crc32(struct.pack("<2d", mp.pos.x, mp.pos.y), crc)
+        tiles = self.world.tiles
+        if tiles is not None:
+            for key in sorted(k for k, c in tiles.chunks.items() if c.edited):
+                crc = zlib.crc32(tiles.chunks[key].tiles, crc)
+        shots = self.world.projectiles
+        if shots.count:
+            crc = zlib.crc32(shots.xs[:shots.count].tobytes() + shots.ys[:shots.count].tobytes(), crc)
+        # catches any difference in how often the shared RNG was drawn from
+        rng_state = random.getstate()[1]
+        return zlib.crc32(struct.pack(f"<{len(rng_state)}I", *rng_state), crc)
+
+    def draw(self, surf, target=None):
+        """
+        Draw a frame onto surf. With a RenderTarget the world is drawn at its
+        internal resolution and stretched over surf; the HUD is always native.
+        """
+        world = self.world
+        player = self.player
+        cam = self.cam
+        scale = target.scale if target else 1.0
+        world_surf = surf if scale == 1.0 else target.surface()
         # screen shake effect
         shake_offset = (0, 0)
         if player.screen_shake > 0:
-            shake_x = random.randint(-3, 3)
-            shake_y = random.randint(-2, 2)
+            shake_x = self.fx_rng.randint(-3, 3)
+            shake_y = self.fx_rng.randint(-2, 2)
             shake_offset = (shake_x, shake_y)
 
-        # background grid for scale
-        grid_spacing = 160
-        start_x = -(cam.x % grid_spacing) + shake_offset[0]
-        start_y = -(cam.y % grid_spacing) + shake_offset[1]
-        for gx in range(int(WIDTH / grid_spacing) + 2):
-            pygame.draw.line(SCREEN, (20,30,40), (start_x + gx * grid_spacing, 0), (start_x + gx * grid_spacing, HEIGHT))
-        for gy in range(int(HEIGHT / grid_spacing) + 2):
-            pygame.draw.line(SCREEN, (20,30,40), (0, start_y + gy * grid_spacing), (WIDTH, start_y + gy * grid_spacing))
-
-        # apply camera with shake offset
-        cam_temp = Camera(WORLD_WIDTH, WORLD_HEIGHT)
-        cam_temp.x = cam.x - shake_offset[0]
-        cam_temp.y = cam.y - shake_offset[1]
-        
-        world.draw(SCREEN, cam_temp)
-        player.draw(SCREEN, cam_temp)
-
-        if show_hitboxes:
-            pr = cam_temp.apply(player.rect)
-            pygame.draw.rect(SCREEN, (255,0,0), pr, 1)
+        if scale not in self.backgrounds:
+            self.backgrounds[scale] = default_background(scale, world_surf.get_size())
+        for layer in self.backgrounds[scale]:
+            layer.draw(world_surf, cam.x * scale, cam.y * scale, (int(shake_offset[0] * scale), int(shake_offset[1] * scale)))
+
+        # shake only offsets the render view, the simulation camera is untouched
+        view = self.view
+        view.x = cam.x - shake_offset[0]
+        view.y = cam.y - shake_offset[1]
+        view.scale = scale
+
+        world.draw(world_surf, view)
+        for p in self.players():
+            p.draw(world_surf, view)
+        if self.lighting is not None:
+            self.lighting.draw(world_surf, view, world, self.players())
+
+        if self.show_hitboxes:
+            pr = view.apply(player.rect)
+            pygame.draw.rect(world_surf, (255,0,0), pr, 1)
             for p in world.platforms + world.moving_platforms:
-                r = cam_temp.apply(p.rect)
-                pygame.draw.rect(SCREEN, (0,255,0), r, 1)
-            for s in world.slopes:
-                r = cam_temp.apply(s.rect)
-                pygame.draw.rect(SCREEN, (255,255,0), r, 1)
+                r = view.apply(p.rect)
+                pygame.draw.rect(world_surf, (0,255,0), r, 1)
+            for s in world.slopes + world.terrains:
+                r = view.apply(s.rect)
+                pygame.draw.rect(world_surf, (255,255,0), r, 1)
             for e in world.enemies:
-                r = cam_temp.apply(e.rect)
-                pygame.draw.rect(SCREEN, (255,100,0), r.inflate(-6, -6), 1)
+                r = view.apply(e.rect)
+                pygame.draw.rect(world_surf, (255,100,0), r.inflate(-view.scaled(6), -view.scaled(6)), 1)
+
+        if world_surf is not surf:
+            target.present(surf)
+
+        draw_ui(surf, self.score, self.lives, cam)
+        if self.show_hitboxes:
+            sched = world.scheduler
+            stats = FONT.render(f"Ticked: {sched.ticked_near} near + {sched.ticked_far} far / {sched.scheduled}"
+                                f"  Pickups: {world.pickups.count}  Render: {scale:.0%}", True, UI_COL)
+            surf.blit(stats, (12, 86))
+            y = 108
+            if world.tiles is not None:
+                tiles = FONT.render(f"Tile chunks: {len(world.tiles.chunks)}  Redrawn: {world.tiles.redraws}", True, UI_COL)
+                surf.blit(tiles, (12, y))
+                y += 22
+            if self.lighting is not None:
+                lights = FONT.render(f"Lights: {self.lighting.lights}  Glow cells summed: {self.lighting.built}",
+                                     True, UI_COL)
+                surf.blit(lights, (12, y))
 
-        draw_ui(SCREEN, score, lives, cam)
-        
         # dash cooldown indicator
         if player.dash_cooldown > 0:
             cooldown_pct = player.dash_cooldown / DASH_COOLDOWN
             bar_width = int(100 * cooldown_pct)
-            pygame.draw.rect(SCREEN, (200, 100, 100), (WIDTH - 120, 8, bar_width, 12))
-            pygame.draw.rect(SCREEN, (150, 80, 80), (WIDTH - 120, 8, 100, 12), 1)
+            pygame.draw.rect(surf, (200, 100, 100), (WIDTH - 120, 8, bar_width, 12))
+            pygame.draw.rect(surf, (150, 80, 80), (WIDTH - 120, 8, 100, 12), 1)
             txt = FONT.render("Dash", True, UI_COL)
-            SCREEN.blit(txt, (WIDTH - 115, 28))
+            surf.blit(txt, (WIDTH - 115, 28))
         else:
-            pygame.draw.rect(SCREEN, (100, 200, 100), (WIDTH - 120, 8, 100, 12))
+            pygame.draw.rect(surf, (100, 200, 100), (WIDTH - 120, 8, 100, 12))
             txt = FONT.render("Dash Ready", True, UI_COL)
-            SCREEN.blit(txt, (WIDTH - 125, 28))
-        
-        help_txt = FONT.render("Arrows/A-D move • Space jump • Shift dash • W/S climb • P pause • H hitboxes", True, UI_COL)
-        SCREEN.blit(help_txt, (WIDTH//2 - help_txt.get_width()//2, HEIGHT - 28))
-
+            surf.blit(txt, (WIDTH - 125, 28))
+
+        # two lines: the keys on one would run past the edges of the window
+        for i, line in enumerate(HELP_LINES):
+            help_txt = FONT.render(line, True, UI_COL)
+            surf.blit(help_txt, (WIDTH//2 - help_txt.get_width()//2, HEIGHT - 28 - 22 * (len(HELP_LINES) - 1 - i)))
+
+    def close(self):
+        if isinstance(self.world, (ChunkedWorld, TileWorld)):
+            self.world.close()
+
+# ----- RECORDING -----
+# Session file: an uncompressed header (magic "PREC", version, RNG seed,
+# checkpoint interval, level path, flags u8) followed by a zlib stream of
+# 4-byte ticks (dt ms u16, held keys u8, events u8). After every
+# CHECKPOINT_TICKS-th tick a u32 Game.checksum follows. Version 1 files have
+# no flags byte; they were recorded before enemies chased and replay without.
+REC_MAGIC = b"PREC"
+REC_VERSION = 2
+REC_HEADER = struct.Struct("<4sHQHH")
+REC_FLAGS = struct.Struct("<B")
+REC_CHASE = 1
+REC_TICK = struct.Struct("<HBB")
+REC_CHECK = struct.Struct("<I")
+CHECKPOINT_TICKS = 60
+
+class Recorder:
+    def __init__(self, path, seed, level=None, interval=CHECKPOINT_TICKS, chase=True):
+        level_bytes = (level or "").encode("utf-8")
+        self.file = open(path, "wb")
+        self.file.write(REC_HEADER.pack(REC_MAGIC, REC_VERSION, seed, interval, len(level_bytes)))
+        self.file.write(level_bytes)
+        self.file.write(REC_FLAGS.pack(REC_CHASE if chase else 0))
+        self.zip = zlib.compressobj(9)
+        self.interval = interval
+        self.ticks = 0
+
+    def write(self, inp, dt, game):
+        data = REC_TICK.pack(min(int(dt), 0xFFFF), inp.held, inp.events)
+        self.ticks += 1
+        if self.ticks % self.interval == 0:
+            data += REC_CHECK.pack(game.checksum())
+        self.file.write(self.zip.compress(data))
+
+    def close(self):
+        self.file.write(self.zip.flush())
+        self.file.close()
+
+def read_recording(path):
+    """
+    Return (seed, level, interval, chase, ticks) where ticks yields
+    (dt, TickInput, checksum or None).
+    """
+    with open(path, "rb") as f:
+        magic, version, seed, interval, level_len = REC_HEADER.unpack(f.read(REC_HEADER.size))
+        if magic != REC_MAGIC:
+            raise ValueError("not a session recording")
+        if version not in (1, REC_VERSION):
+            raise ValueError(f"unsupported recording version {version}")
+        level = f.read(level_len).decode("utf-8") or None
+        flags = REC_FLAGS.unpack(f.read(REC_FLAGS.size))[0] if version >= 2 else 0
+        data = zlib.decompress(f.read())
+
+    def ticks():
+        pos = 0
+        n = 0
+        while pos < len(data):
+            dt, held, events = REC_TICK.unpack_from(data, pos)
+            pos += REC_TICK.size
+            n += 1
+            check = None
+            if n % interval == 0:
+                check, = REC_CHECK.unpack_from(data, pos)
+                pos += REC_CHECK.size
+            yield dt, TickInput(held, events), check
+    return seed, level, interval, bool(flags & REC_CHASE), ticks()
+
+def start_session(seed, level=None, background_streaming=True, chase=True):
+    # every simulation draw from `random` follows from this seed
+    random.seed(seed)
+    return Game(level, background_streaming, chase=chase)
+
+def replay_session(path, on_tick=None):
+    """
+    Re-run a recorded session as fast as possible without drawing.
+    Returns (ticks, seconds, divergences) with divergences a list of
+    (tick, recorded checksum, replayed checksum). on_tick(game, tick) is
+    called after every simulated tick.
+    """
+    seed, level, interval, chase, ticks = read_recording(path)
+    game = start_session(seed, level, background_streaming=False, chase=chase)
+    divergences = []
+    n = 0
+    t0 = time.perf_counter()
+    for dt, inp, check in ticks:
+        game.step(inp, dt)
+        n += 1
+        if on_tick:
+            on_tick(game, n)
+        if check is not None:
+            got = game.checksum()
+            if got != check:
+                divergences.append((n, check, got))
+    elapsed = time.perf_counter() - t0
+    game.close()
+    return n, elapsed, divergences
+
+def main(level=None, record=None, render_scale=None, dark=False):
+    seed = random.randrange(2 ** 63)
+    # streamed chunks must arrive on the same tick every run for a recording to replay
+    game = start_session(seed, level, background_streaming=not record)
+    if dark:
+        game.lighting = Lighting()
+    recorder = Recorder(record, seed, level) if record else None
+    # a fixed render_scale turns the automatic scaling off
+    target = RenderTarget(SCREEN.get_size(), scale=1.0 if render_scale is None else render_scale,
+                          auto=render_scale is None)
+
+    running = True
+    while running:
+        dt = CLOCK.tick(RENDER_TARGET_FPS)
+        # work of the previous frame, without the time tick() slept
+        target.record(CLOCK.get_rawtime())
+        events = 0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                if event.key == pygame.K_SPACE:
+                    events |= EV_JUMP
+                if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
+                    events |= EV_DASH
+                if event.key == pygame.K_p:
+                    events |= EV_PAUSE
+                if event.key == pygame.K_h:
+                    events |= EV_HITBOXES
+                if event.key == pygame.K_f:
+                    events |= EV_FIRE
+                if event.key == pygame.K_e:
+                    events |= EV_DIG
+                if event.key == pygame.K_q:
+                    events |= EV_PLACE
+                if event.key == pygame.K_l:
+                    # only changes what is drawn, so it is not part of the recorded input
+                    game.lighting = None if game.lighting else Lighting()
+        if not running:
+            break
+
+        inp = TickInput.from_keyboard(events)
+        game.step(inp, dt)
+        if recorder:
+            recorder.write(inp, dt, game)
+
+        game.draw(SCREEN, target)
         pygame.display.flip()
 
+    if recorder:
+        recorder.close()
+    game.close()
+    pygame.quit()
+    sys.exit()
+
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Terraria-like platformer")
+    parser.add_argument("--level", help="play a level file or a streamed level directory")
+    parser.add_argument("--record", metavar="PATH", help="record inputs to a session file (replay with replay.py)")
+    parser.add_argument("--export-level", metavar="PATH", help="write the demo world to a level file and exit")
+    parser.add_argument("--build-level", metavar="DIR", help="generate a long streamed demo level and exit")
+    parser.add_argument("--build-tiles", metavar="DIR", help="create a tile world (generated as it is explored) and exit")
+    parser.add_argument("--screens", type=int, default=200, help="width of --build-level or --build-tiles in screens")
+    parser.add_argument("--render-scale", type=float, metavar="S",
+                        help="draw the world at a fixed S (0 < S <= 1) times the window resolution "
+                             "(default: adjust automatically)")
+    parser.add_argument("--dark", action="store_true", help="start in darkness, lit by lanterns and glowing pickups (L toggles)")
+    args = parser.parse_args()
+    if args.render_scale is not None and not 0 < args.render_scale <= 1:
+        parser.error(f"--render-scale must be above 0 and at most 1, not {args.render_scale:g}")
+    if args.build_level:
+        build_demo_level(args.build_level, screens=args.screens)
+        sys.exit()
+    if args.build_tiles:
+        tiles = build_tile_world(args.build_tiles, screens=args.screens)
+        print(f"{tiles} tiles; play it with --level {args.build_tiles}")
+        sys.exit()
+    if args.export_level:
+        save_level(World(), args.export_level)
+        sys.exit()
+    main(args.level, args.record, args.render_scale, args.dark)
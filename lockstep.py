@@ -0,0 +1,534 @@
+# lockstep.py
+# Lockstep multiplayer for game.py: 2-8 players share one world and every
+# peer runs the whole simulation. Only per-tick inputs cross the network
+# (UDP on localhost), so all peers seed `random` alike and step with the
+# same fixed TICK_MS. A peer's own input is scheduled --delay ticks ahead;
+# missing remote input is predicted for up to --rollback ticks, and a wrong
+# prediction restores a snapshot and re-simulates. Run e.g.:
+#   python lockstep.py play --players 2 --index 0     (one window per player)
+#   python lockstep.py play --players 2 --index 1
+#   python lockstep.py test --players 4 --latency 40 --loss 0.05
+#
+# Packet, one per peer per frame: PKT_HEADER (sender, input count, tick of
+# the first input, inputs of the receiver held so far, send time, echoed
+# send time of the receiver, last settled checkpoint tick and checksum),
+# then that many (held u8, events u8) inputs. Inputs are repeated until the
+# receiver acknowledges them, so a lost packet costs no retransmission.
+import os
+import sys
+if sys.argv[1:2] != ["play"]:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# SDL otherwise turns SIGTERM into a quit event that headless peers never read
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+
+import argparse
+import copy
+import heapq
+import json
+import math
+import random
+import select
+import socket
+import struct
+import subprocess
+import time
+
+import pygame
+import game
+
+TICK_MS = 16  # the dt of every tick on every peer; a measured dt would differ between them
+MAX_PLAYERS = 8
+DEFAULT_PORT = 47000  # peer i listens on DEFAULT_PORT + i
+INPUT_DELAY = 2  # ticks between sampling local input and simulating it
+ROLLBACK = 8  # ticks a peer may simulate past the inputs it has
+SNAPSHOT_EVERY = 4  # predicted ticks per snapshot; a rollback re-simulates from the one before it
+SEND_WINDOW = 64  # most unacknowledged inputs repeated in one packet
+LINGER = 1.0  # seconds a finished headless peer keeps answering, so the others finish too
+PKT_HEADER = struct.Struct("<BBIIddII")
+PKT_INPUT = struct.Struct("<BB")
+
+
+class LockstepGame(game.Game):
+    """A Game with one player per peer; step() takes every player's input for the tick."""
+    def __init__(self, players, local=0, level=None):
+        if level and os.path.isdir(level) and not os.path.exists(os.path.join(level, game.TILE_META)):
+            raise ValueError("lockstep needs a level file: streamed chunks arrive on a loader thread")
+        super().__init__(level, background_streaming=False)
+        self.local = local
+        spawn = self.world.spawn_point
+        self.team = [self.player if i == local else game.Player(*spawn) for i in range(players)]
+
+    def players(self):
+        return tuple(self.team)
+
+    def step(self, inputs, dt=TICK_MS):
+        for player, inp in zip(self.team, inputs):
+            self.apply_actions(player, inp)
+        # one player pausing pauses the shared world for everyone
+        if any(inp.events & game.EV_PAUSE for inp in inputs):
+            self.paused = not self.paused
+        self.ticks += 1
+        if self.paused:
+            return
+
+        world = self.world
+        world.update(dt, [p.rect.center for p in self.team], self.team)
+        for player, inp in zip(self.team, inputs):
+            player.update(inp, dt, world)
+        self.cam.update(self.player.rect)
+        # chunks are paged by where every player is, never by this peer's camera, so all peers hold the same ones
+        world.stream_around([p.rect.center for p in self.team])
+        for player in self.team:
+            self.interact(player)
+        world.enemies = [e for e in world.enemies if e.alive]
+
+        # lives are shared: a fall costs one and only the fallen player respawns
+        for i, player in enumerate(self.team):
+            if player.rect.top > world.height + 300:
+                self.lives -= 1
+                self.team[i] = game.Player(*world.spawn_point)
+        if self.lives <= 0:
+            self.lives = 3
+            self.score = 0
+            self.close()
+            self.world = self.make_world()
+            self.team = [game.Player(*self.world.spawn_point) for _ in self.team]
+        self.player = self.team[self.local]
+
+    def snapshot(self):
+        # one deepcopy, so players keep pointing at the copied platforms they stand on
+        state = (self.world, self.team, self.cam, self.score, self.lives, self.paused, self.ticks)
+        return copy.deepcopy(state), random.getstate()
+
+    def restore(self, snap):
+        state, rng_state = snap
+        self.close()  # the mispredicted world is dropped for the snapshot's
+        self.world, self.team, self.cam, self.score, self.lives, self.paused, self.ticks = state
+        self.player = self.team[self.local]
+        random.setstate(rng_state)
+
+    def draw(self, surf, target=None):
+        super().draw(surf, target)
+        for i, p in enumerate(self.team):
+            if i != self.local:
+                x, y = self.view.to_screen(p.rect.centerx, p.rect.top)
+                label = game.FONT.render(f"P{i + 1}", True, game.UI_COL)
+                surf.blit(label, (int(x) - label.get_width() // 2, int(y) - 24))
+
+
+def start_lockstep(seed, players, local, level=None):
+    # every peer must start from the same seed for the worlds to agree
+    random.seed(seed)
+    return LockstepGame(players, local, level)
+
+
+class Peer:
+    """
+    One player's end of a lockstep session: owns the game, the UDP socket and
+    every player's known inputs. latency (ms) and loss (0..1) are applied to
+    outgoing packets, to try the netcode on one machine.
+    """
+    def __init__(self, g, index, players, base_port=DEFAULT_PORT, delay=INPUT_DELAY, rollback=ROLLBACK,
+                 latency=0.0, loss=0.0, seed=0):
+        self.game = g
+        self.index = index
+        self.delay = delay
+        self.rollback = rollback
+        self.latency = latency / 1000
+        self.loss = loss
+        self.net_rng = random.Random(seed * MAX_PLAYERS + index)  # simulated loss stays out of the simulation
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", base_port + index))
+        self.sock.setblocking(False)
+        self.addrs = {j: ("127.0.0.1", base_port + j) for j in range(players) if j != index}
+        # inputs[i][t] is player i's input for tick t, known without gaps from tick 0
+        self.inputs = [[] for _ in range(players)]
+        self.inputs[index] = [game.TickInput() for _ in range(delay)]
+        self.acked = dict.fromkeys(self.addrs, 0)  # peer -> how many of our inputs it has
+        self.echo = dict.fromkeys(self.addrs, 0.0)  # peer -> its last send time
+        self.echo_at = dict.fromkeys(self.addrs, 0.0)  # peer -> when that packet arrived
+        self.tick = 0  # ticks simulated
+        self.used = {}  # tick -> inputs it was simulated with, while any of them was predicted
+        self.snapshots = {}  # tick -> game state before that tick, taken on predicted ticks
+        self.mispredicted = math.inf  # first simulated tick whose prediction turned out wrong
+        self.checks = {}  # checkpoint tick -> our checksum after that many ticks
+        self.remote_checks = {}  # (peer, checkpoint tick) -> its checksum, until ours is settled
+        self.compared = dict.fromkeys(self.addrs, 0)  # peer -> last checkpoint compared with it
+        self.last_check = (0, 0)
+        self.outbox = []  # heap of (due, seq, data, addr) under simulated latency
+        self.seq = 0
+        self.rtt = None  # smoothed round trip, seconds
+        self.stats = dict.fromkeys(("bytes_sent", "bytes_received", "packets_sent", "packets_received", "rollbacks",
+                                    "resimulated", "max_rollback", "predicted", "stalls", "syncs", "checks",
+                                    "desyncs"), 0)
+        self.rtt_max = 0.0
+
+    def confirmed(self):
+        """Ticks for which every player's input is known."""
+        return min(len(known) for known in self.inputs)
+
+    def input_for(self, i, t):
+        known = self.inputs[i]
+        if t < len(known):
+            return known[t]
+        # predict: whatever was held stays held, no new presses
+        return game.TickInput(known[-1].held, 0) if known else game.TickInput()
+
+    def lag_ticks(self):
+        return math.ceil(self.rtt / 2 * 1000 / TICK_MS) if self.rtt else 0
+
+    def advance(self, sample):
+        """
+        Simulate the next tick, giving it sample() as the local input for
+        tick + delay. Returns False and leaves sample uncalled when this peer
+        has used up its rollback budget or is ahead of the slowest peer by
+        more than the network explains; that frame is spent waiting.
+        """
+        own = self.inputs[self.index]
+        remote = min((len(self.inputs[j]) for j in self.addrs), default=len(own) + 1)
+        if self.tick >= min(remote, len(own) + 1) + self.rollback:
+            self.stats["stalls"] += 1
+            return False
+        # a peer that started early or runs fast waits rather than living on predictions
+        if self.addrs and len(own) - remote > self.lag_ticks() + 1:
+            self.stats["syncs"] += 1
+            return False
+        own.append(sample())
+        self.simulate()
+        return True
+
+    def simulate(self):
+        t = self.tick
+        inputs = [self.input_for(i, t) for i in range(len(self.inputs))]
+        if t >= self.confirmed():
+            # a deepcopy costs several ticks of simulation, so they are spaced out
+            if not self.snapshots or t - max(self.snapshots) >= SNAPSHOT_EVERY:
+                self.snapshots[t] = self.game.snapshot()
+            self.used[t] = inputs
+            self.stats["predicted"] += 1
+        self.game.step(inputs, TICK_MS)
+        self.tick = t + 1
+        if self.tick % game.CHECKPOINT_TICKS == 0:
+            self.checks[self.tick] = self.game.checksum()
+
+    def resimulate(self):
+        """Go back to the last snapshot before the first mispredicted tick and simulate up to now again."""
+        t = max(k for k in self.snapshots if k <= self.mispredicted)
+        end = self.tick
+        self.mispredicted = math.inf
+        snap = self.snapshots.pop(t)
+        for k in range(t, end):
+            self.snapshots.pop(k, None)
+            self.used.pop(k, None)
+        self.game.restore(snap)
+        self.tick = t
+        while self.tick < end:
+            self.simulate()
+        self.stats["rollbacks"] += 1
+        self.stats["resimulated"] += end - t
+        self.stats["max_rollback"] = max(self.stats["max_rollback"], end - t)
+
+    def send(self, now):
+        own = self.inputs[self.index]
+        for j, addr in self.addrs.items():
+            first = self.acked[j]
+            chunk = own[first:first + SEND_WINDOW]
+            # the echo is shifted by how long we held it, so the peer measures only the network
+            echo = self.echo[j] + (now - self.echo_at[j]) if self.echo[j] else 0.0
+            data = PKT_HEADER.pack(self.index, len(chunk), first, len(self.inputs[j]), now, echo, *self.last_check)
+            data += b"".join(PKT_INPUT.pack(inp.held, inp.events) for inp in chunk)
+            self.stats["packets_sent"] += 1
+            self.stats["bytes_sent"] += len(data)
+            if self.loss and self.net_rng.random() < self.loss:
+                continue
+            if self.latency:
+                self.seq += 1
+                heapq.heappush(self.outbox, (now + self.latency, self.seq, data, addr))
+            else:
+                self.transmit(data, addr)
+
+    def transmit(self, data, addr):
+        try:
+            self.sock.sendto(data, addr)
+        except OSError:
+            pass  # that peer is not up (yet); the inputs go out again next frame
+
+    def next_due(self):
+        return self.outbox[0][0] if self.outbox else math.inf
+
+    def poll(self, now):
+        """Send what is due, take in every waiting packet and repair any misprediction."""
+        while self.outbox and self.outbox[0][0] <= now:
+            _, _, data, addr = heapq.heappop(self.outbox)
+            self.transmit(data, addr)
+        while True:
+            try:
+                data = self.sock.recv(2048)
+            except BlockingIOError:
+                break
+            except ConnectionRefusedError:
+                continue
+            self.receive(data, now)
+        if self.mispredicted < self.tick:
+            self.resimulate()
+        settled = min(self.confirmed(), self.tick)
+        for t in [t for t in self.used if t < settled]:
+            del self.used[t]
+        # keep only the snapshot a rollback to the oldest predicted tick would start from
+        base = max((k for k in self.snapshots if k <= min(self.used, default=-1)), default=None)
+        for k in [k for k in self.snapshots if base is None or k < base]:
+            del self.snapshots[k]
+        self.verify(settled)
+
+    def receive(self, data, now):
+        if len(data) < PKT_HEADER.size:
+            return
+        peer, count, first, ack, stamp, echo, check_tick, check_crc = PKT_HEADER.unpack_from(data)
+        if peer not in self.addrs or len(data) != PKT_HEADER.size + count * PKT_INPUT.size:
+            return
+        self.stats["packets_received"] += 1
+        self.stats["bytes_received"] += len(data)
+        self.acked[peer] = max(self.acked[peer], ack)
+        if stamp > self.echo[peer]:
+            self.echo[peer] = stamp
+            self.echo_at[peer] = now
+        if echo:
+            rtt = now - echo
+            self.rtt = rtt if self.rtt is None else self.rtt * 0.9 + rtt * 0.1
+            self.rtt_max = max(self.rtt_max, rtt)
+        if check_tick > self.compared[peer]:
+            self.remote_checks[peer, check_tick] = check_crc
+
+        known = self.inputs[peer]
+        start = len(known) - first
+        if start < 0:
+            return  # a gap: an earlier packet was lost, a later one repeats these inputs
+        for k in range(start, count):
+            held, events = PKT_INPUT.unpack_from(data, PKT_HEADER.size + k * PKT_INPUT.size)
+            t = first + k
+            used = self.used.get(t)
+            if used is not None and (used[peer].held != held or used[peer].events != events):
+                self.mispredicted = min(self.mispredicted, t)
+            known.append(game.TickInput(held, events))
+
+    def verify(self, settled):
+        """Compare checkpoints that can no longer be rolled back with the other peers'."""
+        for t in sorted(t for t in self.checks if t <= settled and t > self.last_check[0]):
+            self.last_check = (t, self.checks[t])
+        for key in [key for key in self.remote_checks if key[1] <= settled]:
+            crc = self.remote_checks.pop(key)
+            self.compared[key[0]] = max(self.compared[key[0]], key[1])
+            ours = self.checks.get(key[1])
+            if ours is not None:
+                self.stats["checks"] += 1
+                if ours != crc:
+                    self.stats["desyncs"] += 1
+
+    def report(self, seconds):
+        s = self.stats
+        return {
+            **s,
+            "peer": self.index,
+            "ticks": self.tick,
+            "seconds": round(seconds, 3),
+            "sent_bytes_per_s": round(s["bytes_sent"] / seconds, 1),
+            "received_bytes_per_s": round(s["bytes_received"] / seconds, 1),
+            "sent_packets_per_s": round(s["packets_sent"] / seconds, 1),
+            "rtt_ms": round(self.rtt * 1000, 2) if self.rtt else None,
+            "rtt_max_ms": round(self.rtt_max * 1000, 2),
+        }
+
+    def close(self):
+        self.sock.close()
+
+
+class Bot:
+    """Scripted input for a headless peer: walks about, jumps, dashes and fires now and then."""
+    MOVES = (0, game.HELD_BITS[pygame.K_LEFT], game.HELD_BITS[pygame.K_RIGHT],
+             game.HELD_BITS[pygame.K_RIGHT] | game.HELD_BITS[pygame.K_UP], game.HELD_BITS[pygame.K_DOWN])
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.held = 0
+        self.hold = 0
+
+    def __call__(self):
+        rng = self.rng
+        if self.hold <= 0:
+            self.held = rng.choice(self.MOVES)
+            self.hold = rng.randint(10, 90)
+        self.hold -= 1
+        events = 0
+        if rng.random() < 0.04:
+            events |= game.EV_JUMP
+        if rng.random() < 0.01:
+            events |= game.EV_DASH
+        if rng.random() < 0.05:
+            events |= game.EV_FIRE
+        if rng.random() < 0.02:
+            events |= game.EV_DIG if rng.random() < 0.5 else game.EV_PLACE
+        return game.TickInput(self.held, events)
+
+
+def peer_from_args(args, g):
+    return Peer(g, args.index, args.players, base_port=args.base_port, delay=args.delay, rollback=args.rollback,
+                latency=args.latency, loss=args.loss, seed=args.seed)
+
+
+def play(args):
+    g = start_lockstep(args.seed, args.players, args.index, args.level)
+    peer = peer_from_args(args, g)
+    pygame.display.set_caption(f"Lockstep - player {args.index + 1} of {args.players}")
+    t0 = time.perf_counter()
+    pending = 0
+    running = True
+    while running:
+        game.CLOCK.tick(1000 // TICK_MS)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                if event.key == pygame.K_SPACE:
+                    pending |= game.EV_JUMP
+                if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
+                    pending |= game.EV_DASH
+                if event.key == pygame.K_p:
+                    pending |= game.EV_PAUSE
+                if event.key == pygame.K_f:
+                    pending |= game.EV_FIRE
+                if event.key == pygame.K_e:
+                    pending |= game.EV_DIG
+                if event.key == pygame.K_q:
+                    pending |= game.EV_PLACE
+                if event.key == pygame.K_h:
+                    # only what this window shows, so it never goes over the network
+                    g.show_hitboxes = not g.show_hitboxes
+        if not running:
+            break
+
+        # presses made while waiting on the others go into the next tick that runs
+        if peer.advance(lambda: game.TickInput.from_keyboard(pending)):
+            pending = 0
+        now = time.perf_counter()
+        peer.send(now)
+        peer.poll(now)
+
+        g.draw(game.SCREEN)
+        r = peer.report(max(1e-3, now - t0))
+        net = game.FONT.render(f"Tick {peer.tick}  ahead {peer.tick - peer.confirmed()}  rtt {r['rtt_ms'] or 0:.1f}ms"
+                               f"  {r['sent_bytes_per_s'] / 1024:.1f} KB/s out  rollbacks {r['rollbacks']}"
+                               f"  desyncs {r['desyncs']}", True, game.UI_COL)
+        game.SCREEN.blit(net, (12, game.HEIGHT - 56))
+        pygame.display.flip()
+
+    peer.close()
+    g.close()
+    pygame.quit()
+    return 0
+
+
+def run(args):
+    """A headless peer played by a Bot for --ticks ticks; prints its stats and final checksum as JSON."""
+    g = start_lockstep(args.seed, args.players, args.index, args.level)
+    peer = peer_from_args(args, g)
+    bot = Bot(random.Random(args.seed * 31 + args.index))
+    frame = TICK_MS / 1000
+    t0 = time.perf_counter()
+    next_frame = t0
+    done_at = None
+    timed_out = False
+    while True:
+        now = time.perf_counter()
+        if now >= next_frame:
+            next_frame += frame
+            if peer.tick < args.ticks:
+                peer.advance(bot)
+            peer.send(now)
+        peer.poll(now)
+        if done_at is None and peer.tick >= args.ticks and peer.confirmed() >= args.ticks \
+                and all(a >= args.ticks for a in peer.acked.values()):
+            done_at = now
+            result = peer.report(now - t0)
+            result["checksum"] = f"{g.checksum():08x}"
+        if done_at is not None and now - done_at > LINGER:
+            break
+        if now - t0 > args.timeout:
+            timed_out = True
+            result = peer.report(now - t0)
+            result["checksum"] = None
+            break
+        select.select([peer.sock], [], [], max(0.0, min(next_frame, peer.next_due()) - time.perf_counter()))
+    result["timed_out"] = timed_out
+    print(json.dumps(result), flush=True)
+    peer.close()
+    g.close()
+    return 1 if timed_out else 0
+
+
+def test(args):
+    """Run --players headless peers as separate processes and check they end in the same state."""
+    cmd = [sys.executable, os.path.abspath(__file__), "run", "--players", str(args.players),
+           "--base-port", str(args.base_port), "--delay", str(args.delay), "--rollback", str(args.rollback),
+           "--latency", str(args.latency), "--loss", str(args.loss), "--seed", str(args.seed),
+           "--ticks", str(args.ticks), "--timeout", str(args.timeout)]
+    if args.level:
+        cmd += ["--level", args.level]
+    procs = [subprocess.Popen(cmd + ["--index", str(i)], stdout=subprocess.PIPE, text=True)
+             for i in range(args.players)]
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        lines = out.strip().splitlines()
+        results.append(json.loads(lines[-1]) if lines else {"checksum": None, "timed_out": True})
+
+    print(f"  {'peer':>4s} {'checksum':>9s} {'out B/s':>9s} {'in B/s':>9s} {'pkt/s':>7s} {'rtt ms':>7s} "
+          f"{'predict':>8s} {'rollbk':>7s} {'resim':>6s} {'stalls':>7s} {'syncs':>6s} {'checks':>7s} {'desync':>7s}")
+    for i, r in enumerate(results):
+        if "peer" not in r:
+            print(f"  {i:4d} did not report")
+            continue
+        print(f"  {r['peer']:4d} {r['checksum'] or '-':>9s} {r['sent_bytes_per_s']:9.0f} {r['received_bytes_per_s']:9.0f} "
+              f"{r['sent_packets_per_s']:7.1f} {r['rtt_ms'] or 0:7.2f} {r['predicted']:8d} {r['rollbacks']:7d} "
+              f"{r['resimulated']:6d} {r['stalls']:7d} {r['syncs']:6d} {r['checks']:7d} {r['desyncs']:7d}")
+    checksums = {r["checksum"] for r in results}
+    if None in checksums:
+        print("FAILED: a peer did not finish")
+        return 2
+    if len(checksums) > 1 or any(r["desyncs"] for r in results):
+        print("DESYNC: peers ended in different states")
+        return 1
+    print(f"OK: {args.players} peers agree after {args.ticks} ticks")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lockstep multiplayer for game.py over localhost UDP")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("play", "play one peer in a window"),
+                            ("run", "run one headless bot peer and print JSON stats"),
+                            ("test", "run every peer as a headless bot process and compare their states")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--players", type=int, default=2, choices=range(2, MAX_PLAYERS + 1), metavar="N")
+        if name != "test":
+            p.add_argument("--index", type=int, default=0, help="this peer's player number, from 0")
+        p.add_argument("--base-port", type=int, default=DEFAULT_PORT, help="peer i uses UDP port BASE + i")
+        p.add_argument("--delay", type=int, default=INPUT_DELAY, help="input delay in ticks")
+        p.add_argument("--rollback", type=int, default=ROLLBACK, help="most ticks simulated on predicted input")
+        p.add_argument("--latency", type=float, default=0.0, help="added one-way latency, ms")
+        p.add_argument("--loss", type=float, default=0.0, help="fraction of outgoing packets dropped")
+        p.add_argument("--seed", type=int, default=1, help="world seed; must be the same on every peer")
+        p.add_argument("--level", help="a level file or tile world (streamed level directories are not supported)")
+        if name != "play":
+            p.add_argument("--ticks", type=int, default=1200)
+            p.add_argument("--timeout", type=float, default=60.0, help="give up after this many seconds")
+    args = parser.parse_args()
+    if args.command != "test" and not 0 <= args.index < args.players:
+        parser.error("--index must be below --players")
+    return {"play": play, "run": run, "test": test}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
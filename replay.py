@@ -0,0 +1,35 @@
+# replay.py
+# Re-runs a session recorded with `python game.py --record FILE` headlessly
+# at full speed and checks the state checksums stored in the recording.
+# Exits non-zero if the simulation diverged.
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import sys
+
+import game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded game.py session")
+    parser.add_argument("recording")
+    parser.add_argument("--show-all", action="store_true", help="list every diverged checkpoint")
+    args = parser.parse_args()
+
+    ticks, seconds, divergences = game.replay_session(args.recording)
+    rate = ticks / seconds if seconds else float("inf")
+    print(f"{ticks} ticks in {seconds:.3f}s ({rate:.0f} ticks/s, {rate / 60:.1f}x real time)")
+    if not divergences:
+        print("OK: all checkpoints match")
+        return 0
+    shown = divergences if args.show_all else divergences[:1]
+    for tick, want, got in shown:
+        print(f"DIVERGED at tick {tick}: recorded {want:08x}, replayed {got:08x}")
+    print(f"{len(divergences)} diverged checkpoint(s)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
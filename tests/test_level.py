@@ -0,0 +1,44 @@
+import game
+
+
+def sample_world():
+    world = game.World(create_demo=False)
+    world.width = 4000
+    world.height = 1200
+    world.spawn_point = (64, 900)
+    world.platforms = [game.Platform(0, 1100, 4000, 100), game.Platform(300, 900, 120, 20)]
+    world.moving_platforms = [game.MovingPlatform(500, 800, 100, 20, path=[(500, 800), (700, 760)], speed=1.5)]
+    world.slopes = [game.Slope(900, 1000, 100, 100, "right"), game.Slope(1000, 1000, 100, 100, "left")]
+    world.terrains = [game.Terrain([(1200, 1100), (1400, 1000), (1600, 1060)])]
+    world.ladders = [game.Ladder(1800, 800, 30, 300)]
+    world.enemies = [game.Enemy(2000, 1064, patrol=(40, 160), speed=1.25)]
+    world.coins = [game.Coin(2200, 1050), game.Gem(2300, 1050, 12), game.Heart(2400, 1050)]
+    world.index_entities()
+    return world
+
+
+def test_level_file_round_trip(tmp_path):
+    world = sample_world()
+    path = tmp_path / "sample.lvl"
+    game.save_level(world, path)
+    loaded = game.load_level(path)
+    assert (loaded.width, loaded.height, loaded.spawn_point) == (4000, 1200, (64, 900))
+    assert game.world_records(loaded) == game.world_records(world)
+
+
+def test_export_skips_collected_and_dead():
+    world = sample_world()
+    world.coins[0].collected = True
+    world.enemies[0].alive = False
+    _, _, _, ents = game.unpack_level(game.pack_level(game.world_records(world)))
+    assert [c.kind for c in ents["coins"]] == ["gem", "heart"]
+    assert ents["enemies"] == []
+
+
+def test_unpack_rejects_other_files():
+    try:
+        game.unpack_level(b"NOPE" + bytes(64))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a buffer without the level magic was unpacked")
@@ -0,0 +1,64 @@
+from pygame import mixer
+
+import choice
+
+
+def sound():
+    return mixer.Sound(buffer=bytes(4096))
+
+
+def music(**kw):
+    mixer.init()  # choice opens the mixer only in start()
+    m = choice.Music(fade=0.0, **kw)
+    m.thread = True  # no loader thread: the tests hand "decoded" tracks to done themselves
+    return m
+
+
+def arrive(m, name):
+    m.done.append((name, sound(), 1.0))
+    m.poll()
+
+
+def test_track_not_ready_starts_on_poll_and_the_old_one_plays_until_then():
+    m = music()
+    arrive(m, "calm")
+    m.play("calm")
+    assert m.playing == "calm"
+    m.play("storm")
+    assert list(m.todo) == ["storm"]  # asked for at once, ahead of any prefetch
+    assert m.playing == "calm"
+    m.poll()
+    assert m.playing == "calm"  # nothing arrived yet
+    arrive(m, "storm")
+    assert m.playing == "storm"
+
+
+def test_evict_keeps_playing_wanted_and_upcoming_tracks():
+    m = music(keep=2)
+    arrive(m, "a")
+    m.play("a")
+    m.prefetch(["d", "e"])
+    for name in ("b", "c", "d", "e"):
+        arrive(m, name)
+    # over the limit, yet the one playing and both the next scenes may need stay
+    assert set(m.sounds) == {"a", "d", "e"}
+    m.play("b")  # evicted: asked for again and waited on, a plays on meanwhile
+    assert m.playing == "a"
+    arrive(m, "b")
+    assert m.playing == "b"
+    assert {"b", "d", "e"} <= set(m.sounds)
+    assert len(m.sounds) == 3
+
+
+def test_stats_count_preloaded_and_late_changes():
+    m = music()
+    m.prefetch(["a"])
+    arrive(m, "a")
+    m.play("a")
+    m.play("b")
+    arrive(m, "b")
+    m.play("")
+    assert m.playing is None
+    stats = m.stats()
+    assert (stats["preloaded"], stats["late"]) == (1, 1)
+    assert stats["load_ms"] == {"a": [1.0], "b": [1.0]}
@@ -0,0 +1,56 @@
+import random
+
+import game
+
+
+def edge_set(nav):
+    """Static edges as comparable tuples, by the entities they join."""
+    def name(node):
+        return node.kind if node.entity is None else (node.kind, node.entity.rect.topleft)
+    return {(name(node), name(edge.dst), edge.kind, edge.x0, len(edge.points))
+            for node in nav.nodes.values() if node.kind != "moving" for edge in node.edges}
+
+
+def test_streamed_graph_matches_a_fresh_build(tmp_path):
+    game.build_demo_level(tmp_path, screens=12, seed=3)
+    random.seed(1)
+    g = game.Game(str(tmp_path), background_streaming=False)
+    g.interact = lambda player: None
+    for t in range(1200):
+        if t % 100 == 99:
+            g.player.rect.x += 400  # on through the level faster than it runs
+        g.step(game.TickInput(4 | (1 if t % 200 < 5 else 0), game.EV_JUMP if t % 50 == 0 else 0), 16)
+    nav = g.world.nav
+    for _ in range(1000):
+        if not (nav.to_link or nav.linking or nav.to_relink):
+            break
+        nav.link_queued(game.NAV_LINK_FRAMES)
+    assert g.player.rect.x > 3 * game.CHUNK_SIZE  # chunks were dropped and loaded on the way
+    for node in nav.nodes.values():
+        for edge in node.all_edges():
+            assert edge.dst.id in nav.nodes, "edge onto a node that left"
+
+    fresh = game.Navigator(g.world)
+    fresh.build()
+    assert edge_set(nav) == edge_set(fresh)
+    g.close()
+
+
+def test_chunk_swap_keeps_unaffected_paths(tmp_path):
+    game.build_demo_level(tmp_path, screens=12, seed=3)
+    random.seed(1)
+    g = game.Game(str(tmp_path), background_streaming=False)
+    nav = g.world.nav
+    near = [nav.by_entity[p] for p in g.world.platforms if p.rect.right < game.CHUNK_SIZE // 2 and p.rect.height < 64]
+    start, goal = near[0], near[1]
+    key = (start.id, goal.id)
+    nav._store(key, nav.search(start, goal, start.left))
+    far = [p for p in g.world.platforms if p.rect.left >= game.CHUNK_SIZE]
+    assert far
+    g.world.platforms = [p for p in g.world.platforms if p not in far]
+    g.world.index_entities()
+    nav.update()
+    nav.link_queued()
+    assert all(node.entity not in far for node in nav.nodes.values())
+    assert key in nav.cache  # a chunk going elsewhere does not drop it
+    g.close()
@@ -0,0 +1,36 @@
+import pygame
+
+import game
+
+
+def test_collect_swap_removes_and_keeps_slots():
+    index = game.PickupIndex()
+    coins = [game.Coin(10 + i * 20, 10) for i in range(5)]  # all in one cell
+    index.rebuild(coins)
+    got = index.collect(pygame.Rect(25, 0, 10, 20))  # coin 1 only
+    assert got == [coins[1]] and coins[1].collected
+    assert index.count == 4
+    cell = index.cells[coins[0].cell]
+    assert coins[1] not in cell
+    # every pickup left knows where it sits, so the next removal is O(1) too
+    for slot, p in enumerate(cell):
+        assert p.slot == slot
+    index.remove(coins[4])
+    assert [p.slot for p in index.cells[coins[0].cell]] == [0, 1, 2]
+
+
+def test_empty_cells_are_dropped():
+    index = game.PickupIndex()
+    far = game.Coin(game.PICKUP_CELL * 10, 10)
+    index.rebuild([game.Coin(10, 10), far])
+    index.collect(pygame.Rect(far.pos.x - 1, 9, 2, 2))
+    assert len(index.cells) == 1
+    assert index.count == 1
+
+
+def test_rebuild_skips_collected():
+    coins = [game.Coin(10, 10), game.Gem(30, 10)]
+    coins[0].collected = True
+    index = game.PickupIndex()
+    index.rebuild(coins)
+    assert index.count == 1
@@ -0,0 +1,70 @@
+import game
+
+
+def flat_world(enemy):
+    world = game.World(create_demo=False)
+    world.platforms.append(game.Platform(0, game.WORLD_HEIGHT - 64, world.width, 64))
+    world.enemies.append(enemy)
+    world.index_entities()
+    return world
+
+
+def fire_at(world, enemy, from_x):
+    world.projectiles.spawn(from_x, enemy.rect.centery, 12.0, 0.0)
+    for _ in range(30):
+        world.projectiles.update(16, world)
+    return world.projectiles.hits
+
+
+def test_bullet_hits_enemy_in_its_patrol_box():
+    enemy = game.Enemy(300, game.WORLD_HEIGHT - 100, patrol=(0, 100))
+    world = flat_world(enemy)
+    assert fire_at(world, enemy, 200) == 1
+
+
+def test_bullet_hits_chasing_enemy_outside_its_patrol_box():
+    enemy = game.Enemy(300, game.WORLD_HEIGHT - 100, patrol=(0, 100))
+    world = flat_world(enemy)
+    world.enable_navigation()
+    enemy.rect.x = 1500
+    assert fire_at(world, enemy, 1400) == 1
+    assert not enemy.alive
+
+
+def test_bullet_stops_at_a_one_tile_wall_at_30_fps(tmp_path):
+    game.build_tile_world(str(tmp_path), screens=4, seed=1)
+    world = game.TileWorld(str(tmp_path), persist=False)
+    tiles = world.tiles
+    ty = 8
+    wall = 40
+    for tx in range(wall - 20, wall + 20):
+        for row in range(ty - 1, ty + 2):
+            tiles.set_tile(tx, row, game.TILE_AIR)
+    y = ty * game.TILE_SIZE + game.TILE_SIZE / 2
+    shots = world.projectiles
+
+    def survivors():
+        alive = 0
+        for start in range(40):
+            shots.spawn((wall - 18) * game.TILE_SIZE + start * 0.7, y, game.PROJECTILE_SPEED, 0.0)
+            for _ in range(16):
+                shots.update(33, world)
+            alive += shots.count
+            shots.count = 0
+        return alive
+
+    assert survivors() == 40  # the open row lets every bullet fly past where the wall goes
+    tiles.set_tile(wall, ty, game.TILE_STONE)
+    assert survivors() == 0
+
+
+def test_tile_sweep_walks_every_tile_of_a_diagonal():
+    tiles = game.TileMap(64 * game.TILE_SIZE, 64 * game.TILE_SIZE, seed=1)
+    for tx in range(64):
+        for ty in range(20):
+            tiles.set_tile(tx, ty, game.TILE_AIR)
+    tiles.set_tile(5, 4, game.TILE_DIRT)
+    s = game.TILE_SIZE
+    # passes only the corner of tile (5, 4): the endpoints are both in air
+    assert tiles.blocks(4.5 * s, 3.5 * s, 6.5 * s, 5.4 * s)
+    assert not tiles.blocks(4.5 * s, 3.5 * s, 5.9 * s, 3.9 * s)
@@ -0,0 +1,43 @@
+import pytest
+
+import choice
+
+
+def reveal_frames(script, fps, cps=45.0):
+    """Frames advance() takes to show the whole text at a fixed frame rate."""
+    progress, acc, frames = 0, 0.0, 0
+    while progress < len(script.text):
+        progress, acc = script.advance(progress, acc + 1.0 / fps, cps)
+        frames += 1
+    return frames
+
+
+@pytest.mark.parametrize("fps", [24, 30, 60, 144])
+def test_reveal_time_does_not_depend_on_frame_rate(fps):
+    script = choice.compile_script("The reactor hums. Anna, can you hear me? " * 20)
+    expected = script.reveal_time(45.0)
+    # finishing may take up to one frame past the exact time, never less
+    assert expected <= reveal_frames(script, fps) / fps < expected + 1.0 / fps + 1e-9
+
+
+def test_punctuation_pauses_and_speed_tags():
+    plain = choice.compile_script("abcd")
+    assert plain.reveal_time(10.0) == pytest.approx(0.4)
+    # the pause comes before the space after a full stop, so "3.5" reads without one
+    paused = choice.compile_script("ab. cd")
+    assert paused.reveal_time(10.0) == pytest.approx(0.6 + choice.PUNCT_PAUSES["."])
+    assert choice.compile_script("3.5").reveal_time(10.0) == pytest.approx(0.3)
+    fast = choice.compile_script("{speed=2}abcd{/speed}")
+    assert fast.text == "abcd"
+    assert fast.reveal_time(10.0) == pytest.approx(0.2)
+    waited = choice.compile_script("ab{pause=1.5}cd")
+    assert waited.reveal_time(10.0) == pytest.approx(1.9)
+
+
+def test_progress_at_inverts_reveal_time():
+    script = choice.compile_script("Captain, this is {b}serious{/b}. Please check it out!")
+    for end in range(len(script.text) + 1):
+        t = script.reveal_time(45.0, end=end)
+        assert script.progress_at(t + 1e-9, 45.0) >= end
+        if end:
+            assert script.progress_at(t - 1e-6, 45.0) < end
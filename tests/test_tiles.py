@@ -0,0 +1,34 @@
+import copy
+
+import pygame
+
+import game
+
+
+def solid_rect(tiles):
+    """A rect one tile wide around the topmost solid tile of column 3."""
+    ty = next(ty for ty in range(tiles.rows) if tiles.tile(3, ty) != game.TILE_AIR)
+    return pygame.Rect(3 * game.TILE_SIZE, ty * game.TILE_SIZE, game.TILE_SIZE, game.TILE_SIZE), ty
+
+
+def test_platforms_in_reuses_cached_platforms():
+    tiles = game.TileMap(40 * game.TILE_SIZE, 60 * game.TILE_SIZE, seed=3)
+    rect, _ = solid_rect(tiles)
+    first = tiles.platforms_in(rect)
+    assert first and all(p.rect.colliderect(rect) for p in first)
+    again = tiles.platforms_in(rect)
+    assert [id(p) for p in again] == [id(p) for p in first]
+
+
+def test_edit_and_copy_drop_cached_platforms():
+    tiles = game.TileMap(40 * game.TILE_SIZE, 60 * game.TILE_SIZE, seed=3)
+    rect, ty = solid_rect(tiles)
+    before = tiles.platforms_in(rect)
+    assert tiles.set_tile(3, ty, game.TILE_AIR)
+    after = tiles.platforms_in(rect)
+    assert not any(p in before for p in after)
+    assert not any(p.rect.colliderect(rect) for p in after)
+    # snapshots carry only tiles, and rebuild equal platforms on first use
+    clone = copy.deepcopy(tiles)
+    wide = rect.inflate(8 * game.TILE_SIZE, 4 * game.TILE_SIZE)
+    assert [p.rect for p in clone.platforms_in(wide)] == [p.rect for p in tiles.platforms_in(wide)]
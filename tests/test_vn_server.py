@@ -0,0 +1,40 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import vn_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_opens_no_window_mixer_or_threads():
+    code = ("import threading, pygame, vn_server, choice\n"
+            "assert not pygame.display.get_init() and not pygame.mixer.get_init()\n"
+            "assert threading.active_count() == 1 and choice.music is None\n")
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_session_plays_and_closes():
+    async def play():
+        server = vn_server.Server()
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        state = json.loads(await reader.readline())
+        assert state["scene"] == "INTRO"
+        writer.write(b'{"cmd": "choose", "key": "1"}\n')
+        state = json.loads(await reader.readline())
+        assert state["scene"] != "INTRO" and state["shown"] == 0
+        writer.close()
+        await writer.wait_closed()
+        for _ in range(100):
+            if not server.sessions:
+                break
+            await asyncio.sleep(0.01)
+        listener.close()
+        await listener.wait_closed()
+        return server.sessions
+
+    assert asyncio.run(play()) == 0
@@ -0,0 +1,195 @@
+# vn_server.py
+# Headless server hosting many independent Bastion One sessions in one
+# process. The scene graph (choice.SCENES and each scene's compiled script)
+# is shared; a session only holds its scene, when its text started typing,
+# its speed and its log. Typewriter progress is computed from the clock
+# when asked, so idle sessions cost no CPU. Run e.g.:
+#   python vn_server.py --port 8765
+#   python bench_server.py --sessions 5000
+#
+# Protocol: one JSON object per line each way. Every request gets one reply.
+#   {"cmd": "state"}                 -> the session state (also sent on connect)
+#   {"cmd": "choose", "key": "2"}    -> state after the choice; "1" restarts on an ending
+#   {"cmd": "skip"}                  -> state with the whole text shown
+#   {"cmd": "speed", "cps": 60}      -> state at the new text speed
+#   {"cmd": "log"}                   -> {"log": [texts of earlier scenes, oldest first]}
+#   {"cmd": "stats"}                 -> {"sessions": open, "started": total, "rss_kb": server memory}
+# A state is {"scene", "name", "text", "shown", "remaining_s", "choices": [[key, label], ...], "ending"}:
+# the client reveals text[:shown] and the rest over remaining_s seconds. An
+# ending has the single choice "1" that restarts the story.
+# Bad requests get {"error": "..."}.
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# SDL otherwise turns SIGTERM into a quit event that nothing here reads
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+
+import argparse
+import asyncio
+import json
+import resource
+import sys
+from collections import deque
+from time import monotonic
+
+import choice
+
+DEFAULT_PORT = 8765
+LOG_SIZE = 200  # scenes kept in a session's log, as in choice.message_log
+IDLE_TIMEOUT = 600.0  # seconds without a request before a session is closed
+
+
+def rss_kb():
+    """Current resident memory of this process, peak if /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Session:
+    """One player's place in the story."""
+    __slots__ = ("scene", "started", "cps", "log")
+
+    def __init__(self, now, cps=choice.chars_per_second):
+        self.cps = cps
+        self.log = deque(maxlen=LOG_SIZE)  # scene ids; their text is in the shared graph
+        self.scene = None
+        self.go_to("INTRO", now)
+
+    def go_to(self, scene_id, now):
+        if self.scene is not None:
+            self.log.append(self.scene.id)
+        self.scene = choice.SCENES.get(scene_id, choice.SCENES["NOT_FOUND"])
+        self.started = now
+
+    def elapsed(self, now):
+        return max(0.0, now - self.started)
+
+    def choose(self, key, now):
+        """Follow the choice with this key, like a key press in choice.run; False if there is none."""
+        for label, k, nid in self.scene.choices:
+            if k == key:
+                self.go_to(nid, now)
+                return True
+        if not self.scene.choices and key == "1":
+            self.go_to("INTRO", now)
+            return True
+        return False
+
+    def skip(self, now):
+        # back-date the start so the whole text counts as revealed
+        self.started = now - self.scene.script().reveal_time(self.cps)
+
+    def set_speed(self, cps, now):
+        # keep the visible text where it is: re-time the start for the new speed
+        script = self.scene.script()
+        shown = script.progress_at(self.elapsed(now), self.cps)
+        self.cps = cps
+        self.started = now - script.reveal_time(cps, end=shown)
+
+    def state(self, now):
+        script = self.scene.script()
+        elapsed = self.elapsed(now)
+        return {
+            "scene": self.scene.id,
+            "name": self.scene.name or "Narrator",
+            "text": script.text,
+            "shown": script.progress_at(elapsed, self.cps),
+            "remaining_s": round(max(0.0, script.reveal_time(self.cps) - elapsed), 3),
+            "choices": [[key, label] for label, key, _ in self.scene.choices] or [["1", "Restart (1)"]],
+            "ending": not self.scene.choices,
+        }
+
+
+class Server:
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.sessions = 0
+        self.started = 0
+
+    def handle(self, session, request, now):
+        cmd = request.get("cmd")
+        if cmd == "state":
+            pass
+        elif cmd == "choose":
+            if not session.choose(str(request.get("key")), now):
+                return {"error": f"no choice {request.get('key')!r} in {session.scene.id}"}
+        elif cmd == "skip":
+            session.skip(now)
+        elif cmd == "speed":
+            try:
+                cps = float(request["cps"])
+            except (KeyError, TypeError, ValueError):
+                return {"error": "speed needs a numeric cps"}
+            session.set_speed(min(750.0, max(5.0, cps)), now)
+        elif cmd == "log":
+            return {"log": [choice.SCENES.get(sid, choice.SCENES["NOT_FOUND"]).script().text
+                            for sid in session.log]}
+        elif cmd == "stats":
+            return {"sessions": self.sessions, "started": self.started, "rss_kb": rss_kb()}
+        else:
+            return {"error": f"unknown cmd {cmd!r}"}
+        return session.state(now)
+
+    async def serve_client(self, reader, writer):
+        session = Session(monotonic())
+        self.sessions += 1
+        self.started += 1
+        try:
+            writer.write(json.dumps(session.state(monotonic())).encode() + b"\n")
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    reply = self.handle(session, request, monotonic()) if isinstance(request, dict) else None
+                except ValueError:
+                    reply = None
+                if reply is None:
+                    reply = {"error": "expected one JSON object per line"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass  # the client went first
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        # a deep backlog so a burst of thousands of connects is not refused
+        return await asyncio.start_server(self.serve_client, host, port, backlog=4096)
+
+
+async def serve(host, port, idle_timeout):
+    server = await Server(idle_timeout).start(host, port)
+    addr = server.sockets[0].getsockname()
+    print(f"Serving Bastion One on {addr[0]}:{addr[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session Bastion One server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())